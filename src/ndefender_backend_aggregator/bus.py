@@ -3,44 +3,373 @@
 from __future__ import annotations
 
 import asyncio
-from collections.abc import Iterable
+import time
+from collections.abc import Callable, Iterable
+from typing import Any, cast
 
 from .models import EventEnvelope
 
+WakeKey = tuple[str | None, str | None]
+ContactKey = tuple[str, str, str | int]
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITY_NAMES = ("high", "normal", "low")
+
+# Operator-facing acknowledgements and alerts: delivered first, and never
+# overwritten by telemetry because each lane has its own ring.
+HIGH_PRIORITY_TYPES = frozenset(
+    {
+        "COMMAND_ACK",
+        "SUBSCRIPTION_ACK",
+        "CONTACT_NEW",
+        "RF_CONTACT_NEW",
+        "CONTACT_LOST",
+        "RF_CONTACT_LOST",
+    }
+)
+# A LOST in the high lane overtakes that contact's older updates still
+# pending in the normal lane; they are skipped so a stale update cannot
+# bring a lost contact back.
+LOST_SUPERSEDES = {"CONTACT_LOST": "CONTACT_UPDATE", "RF_CONTACT_LOST": "RF_CONTACT_UPDATE"}
+# Periodic full-state streams where only the latest value matters.
+LOW_PRIORITY_TYPES = frozenset({"ESP32_TELEMETRY", "SYSTEM_UPDATE"})
+
+
+def event_priority(event_type: str) -> int:
+    if event_type in HIGH_PRIORITY_TYPES:
+        return PRIORITY_HIGH
+    if event_type in LOW_PRIORITY_TYPES:
+        return PRIORITY_LOW
+    return PRIORITY_NORMAL
+
+
+def _contact_key(event_type: str, event: EventEnvelope) -> ContactKey | None:
+    item = event.data.get("id")
+    return (event_type, event.source, item) if isinstance(item, str | int) else None
+
+
+def _topic_set(values: Iterable[str] | str | None) -> frozenset[str] | None:
+    if values is None:
+        return None
+    if isinstance(values, str):
+        return frozenset((values,))
+    return frozenset(values)
+
+
+class _Lane:
+    """Ring of the last ``capacity`` events of one priority class."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.head = 0
+        self.ring: list[EventEnvelope | None] = [None] * capacity
+        self.published_at = [0.0] * capacity
+        # seq of the newest event overwritten so far; anything at or below it
+        # can no longer be replayed from this lane.
+        self.evicted_seq = 0
+        # Position of the newest event per (type, source), for conflation.
+        self.latest: dict[tuple[str, str], int] = {}
+
+    def append(self, event: EventEnvelope, now: float) -> None:
+        slot = self.head % self.capacity
+        previous = self.ring[slot]
+        if previous is not None and previous.seq is not None:
+            self.evicted_seq = previous.seq
+        self.ring[slot] = event
+        self.published_at[slot] = now
+        self.latest[(event.type, event.source)] = self.head
+        self.head += 1
+
+    def read(self, position: int) -> EventEnvelope:
+        return cast(EventEnvelope, self.ring[position % self.capacity])
+
+
+class Subscription:
+    """Read cursors into the EventBus lanes.
+
+    Pending high-priority events are always returned before normal ones, and
+    normal before low. Only events matching ``types``, ``sources`` and
+    ``predicate`` (each optional) are returned; the rest are skipped at read
+    time. With ``conflate``, a low-priority event is skipped when a newer one
+    with the same ``(type, source)`` is already pending. A subscriber that
+    falls more than ``max_queue_size`` events behind in a lane is lapped: its
+    cursor jumps to the oldest retained event and ``missed`` grows by the
+    number of slots it skipped. Once a contact's ``*_LOST`` is returned,
+    its older pending ``*_UPDATE`` events are skipped and counted as
+    conflated.
+    """
+
+    def __init__(
+        self,
+        bus: EventBus,
+        cursors: list[int],
+        name: str,
+        *,
+        types: frozenset[str] | None = None,
+        sources: frozenset[str] | None = None,
+        predicate: Callable[[EventEnvelope], bool] | None = None,
+        conflate: bool = False,
+    ) -> None:
+        self._bus = bus
+        self.name = name
+        self.cursors = cursors
+        self.missed = 0
+        self.conflated = 0
+        self.consumed = 0
+        self.high_water = 0
+        self.max_lag_ms = 0.0
+        self.types = types
+        self.sources = sources
+        self.predicate = predicate
+        self.conflate = conflate
+        self._filtered = types is not None or sources is not None or predicate is not None
+        self._ready = 0
+        # Contact key -> seq of the LOST already returned for it.
+        self._lost: dict[ContactKey, int] = {}
+        self.wake_keys: tuple[WakeKey, ...] = tuple(
+            (event_type, source)
+            for event_type in (types or (None,))
+            for source in (sources or (None,))
+        )
+
+    def matches(self, event: EventEnvelope) -> bool:
+        if self.types is not None and event.type not in self.types:
+            return False
+        if self.sources is not None and event.source not in self.sources:
+            return False
+        return self.predicate is None or self.predicate(event)
+
+    def qsize(self) -> int:
+        """Upper bound on pending events (unread slots from the next match on)."""
+        self._skip()
+        return self._depth()
+
+    def empty(self) -> bool:
+        return not self._skip()
+
+    def get_nowait(self) -> EventEnvelope:
+        if not self._skip():
+            raise asyncio.QueueEmpty
+        return self._take()
+
+    async def get(self) -> EventEnvelope:
+        while not self._skip():
+            await self._bus.wait(self.wake_keys)
+        return self._take()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "types": sorted(self.types) if self.types is not None else None,
+            "sources": sorted(self.sources) if self.sources is not None else None,
+            "depth": self._depth(),
+            "high_water": self.high_water,
+            "consumed": self.consumed,
+            "dropped": self.missed,
+            "conflated": self.conflated,
+            "max_lag_ms": round(self.max_lag_ms, 3),
+        }
+
+    def _depth(self) -> int:
+        """Unread retained slots, counted without moving the cursors.
+
+        Unlike ``qsize`` this includes events the subscriber will skip, so
+        reading it (for metrics) never changes what the subscriber receives.
+        """
+        return sum(
+            min(lane.head - cursor, lane.capacity)
+            for lane, cursor in zip(self._bus.lanes, self.cursors, strict=True)
+        )
+
+    def _take(self) -> EventEnvelope:
+        index = self._ready
+        lane = self._bus.lanes[index]
+        cursor = self.cursors[index]
+        slot = cursor % lane.capacity
+        depth = lane.head - cursor
+        self.high_water = max(self.high_water, depth)
+        lag_ms = (time.monotonic() - lane.published_at[slot]) * 1000
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        self.cursors[index] = cursor + 1
+        self.consumed += 1
+        event = cast(EventEnvelope, lane.ring[slot])
+        if event.type in LOST_SUPERSEDES:
+            key = _contact_key(LOST_SUPERSEDES[event.type], event)
+            if key is not None:
+                self._lost[key] = event.seq or 0
+        return event
+
+    def _superseded(self, event: EventEnvelope) -> bool:
+        key = _contact_key(event.type, event)
+        lost_seq = self._lost.get(key) if key is not None else None
+        return lost_seq is not None and (event.seq or 0) < lost_seq
+
+    def _skip(self) -> bool:
+        """Advance past skipped events; True if one is ready in ``self._ready``."""
+        for index, lane in enumerate(self._bus.lanes):
+            cursor = self.cursors[index]
+            head = lane.head
+            if cursor >= head:
+                continue
+            oldest = head - lane.capacity
+            if cursor < oldest:
+                self.missed += oldest - cursor
+                cursor = oldest
+            conflate = self.conflate and index == PRIORITY_LOW
+            stale = index == PRIORITY_NORMAL and bool(self._lost)
+            if not self._filtered and not conflate and not stale:
+                self.cursors[index] = cursor
+                self._ready = index
+                return True
+            while cursor < head:
+                event = lane.read(cursor)
+                if self._filtered and not self.matches(event):
+                    cursor += 1
+                elif (conflate and lane.latest[(event.type, event.source)] > cursor) or (
+                    stale and self._superseded(event)
+                ):
+                    self.conflated += 1
+                    cursor += 1
+                else:
+                    self.cursors[index] = cursor
+                    self._ready = index
+                    return True
+            self.cursors[index] = cursor
+            if stale:
+                # Every normal event older than the LOSTs has been read.
+                self._lost.clear()
+        return False
+
 
 class EventBus:
+    """Broadcast bus backed by one ring per priority lane.
+
+    Each lane keeps the last ``max_queue_size`` events of its priority class.
+    Every published envelope gets the next global ``seq`` (starting at 1);
+    the rings double as the replay window for resuming WebSocket clients.
+
+    ``publish`` writes one slot and resolves at most four wakeup futures
+    keyed by ``(type, source)`` with wildcards, independent of the number of
+    subscribers, so only subscribers interested in the event are woken.
+    """
+
     def __init__(self, max_queue_size: int = 1000) -> None:
         if max_queue_size < 1:
             raise ValueError("max_queue_size must be >= 1")
-        self._max_queue_size = max_queue_size
-        self._subscribers: set[asyncio.Queue[EventEnvelope]] = set()
-        self._lock = asyncio.Lock()
+        self.capacity = max_queue_size
+        self.head = 0
+        self.lanes = tuple(_Lane(max_queue_size) for _ in PRIORITY_NAMES)
+        self._published_at = [0.0] * max_queue_size
+        self._waiters: dict[WakeKey, asyncio.Future[None]] = {}
+        self._subscribers: set[Subscription] = set()
+        self._subscriber_count = 0
 
-    async def subscribe(self) -> asyncio.Queue[EventEnvelope]:
-        queue: asyncio.Queue[EventEnvelope] = asyncio.Queue(maxsize=self._max_queue_size)
-        async with self._lock:
-            self._subscribers.add(queue)
-        return queue
+    async def subscribe(
+        self,
+        types: Iterable[str] | str | None = None,
+        sources: Iterable[str] | str | None = None,
+        predicate: Callable[[EventEnvelope], bool] | None = None,
+        name: str | None = None,
+        conflate: bool = False,
+    ) -> Subscription:
+        self._subscriber_count += 1
+        subscription = Subscription(
+            self,
+            [lane.head for lane in self.lanes],
+            name or f"subscriber-{self._subscriber_count}",
+            types=_topic_set(types),
+            sources=_topic_set(sources),
+            predicate=predicate,
+            conflate=conflate,
+        )
+        self._subscribers.add(subscription)
+        return subscription
 
-    async def unsubscribe(self, queue: asyncio.Queue[EventEnvelope]) -> None:
-        async with self._lock:
-            self._subscribers.discard(queue)
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
 
     async def publish(self, event: EventEnvelope) -> None:
-        subscribers = await self._snapshot_subscribers()
-        for queue in subscribers:
-            self._enqueue(queue, event)
-
-    async def _snapshot_subscribers(self) -> Iterable[asyncio.Queue[EventEnvelope]]:
-        async with self._lock:
-            return list(self._subscribers)
-
-    def _enqueue(self, queue: asyncio.Queue[EventEnvelope], event: EventEnvelope) -> None:
-        try:
-            queue.put_nowait(event)
-        except asyncio.QueueFull:
-            try:
-                _ = queue.get_nowait()
-            except asyncio.QueueEmpty:
-                return
-            queue.put_nowait(event)
+        self.publish_nowait(event)
+
+    def publish_nowait(self, event: EventEnvelope) -> None:
+        now = time.monotonic()
+        event.seq = self.head + 1
+        self.lanes[event_priority(event.type)].append(event, now)
+        self._published_at[self.head % self.capacity] = now
+        self.head += 1
+        if not self._waiters:
+            return
+        for key in (
+            (event.type, event.source),
+            (event.type, None),
+            (None, event.source),
+            (None, None),
+        ):
+            waiter = self._waiters.pop(key, None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+
+    @property
+    def replay_floor(self) -> int:
+        """Highest ``seq`` that can no longer be replayed (0 if none evicted)."""
+        return max(lane.evicted_seq for lane in self.lanes)
+
+    def events_since(self, seq: int) -> list[EventEnvelope] | None:
+        """Return retained events with a sequence number above ``seq``, in order.
+
+        ``None`` means the gap can no longer be replayed: an event after
+        ``seq`` was evicted from its lane, or ``seq`` is ahead of this bus
+        (for example after a restart).
+        """
+        if seq < self.replay_floor or seq > self.head:
+            return None
+        events: list[EventEnvelope] = []
+        for lane in self.lanes:
+            for position in range(max(0, lane.head - lane.capacity), lane.head):
+                event = lane.read(position)
+                if event.seq is not None and event.seq > seq:
+                    events.append(event)
+        events.sort(key=lambda event: event.seq or 0)
+        return events
+
+    def stats(self) -> dict[str, Any]:
+        """Publish totals and per-subscriber depth, drops and lag.
+
+        ``publish_rate_hz`` is measured over the last ``max_queue_size`` publishes.
+        """
+        retained = min(self.head, self.capacity)
+        rate = 0.0
+        if retained > 1:
+            newest = self._published_at[(self.head - 1) % self.capacity]
+            oldest = self._published_at[(self.head - retained) % self.capacity]
+            if newest > oldest:
+                rate = (retained - 1) / (newest - oldest)
+        subscribers = sorted(self._subscribers, key=lambda item: item.name)
+        return {
+            "capacity": self.capacity,
+            "published": self.head,
+            "publish_rate_hz": round(rate, 3),
+            "lanes": {
+                name: {"published": lane.head, "evicted_seq": lane.evicted_seq}
+                for name, lane in zip(PRIORITY_NAMES, self.lanes, strict=True)
+            },
+            "subscribers": [subscription.stats() for subscription in subscribers],
+        }
+
+    async def wait(self, keys: Iterable[WakeKey] = ((None, None),)) -> None:
+        """Wait for a publish routed to any of ``keys``; waiters share futures per key."""
+        futures = [self._waiter(key) for key in keys]
+        if len(futures) == 1:
+            # shield() keeps a cancelled waiter from cancelling the shared future.
+            await asyncio.shield(futures[0])
+            return
+        await asyncio.wait(futures, return_when=asyncio.FIRST_COMPLETED)
+
+    def _waiter(self, key: WakeKey) -> asyncio.Future[None]:
+        future = self._waiters.get(key)
+        if future is None or future.done():
+            future = asyncio.get_running_loop().create_future()
+            self._waiters[key] = future
+        return future
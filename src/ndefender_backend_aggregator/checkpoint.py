@@ -0,0 +1,172 @@
+"""Durable on-disk checkpoints of canonical state for warm restarts."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import suppress
+from pathlib import Path
+from typing import Any
+
+from pydantic import ValidationError
+
+from .config import CheckpointConfig
+from .contacts import ContactStore
+from .state import StateStore
+
+LOGGER = logging.getLogger(__name__)
+
+CHECKPOINT_FORMAT = 1
+
+
+class StateCheckpointer:
+    """Periodically persist StateStore (and contact tables) to a single file.
+
+    Writes go to a temporary file that is fsynced and renamed over the
+    checkpoint, so a crash leaves either the old or the new checkpoint. At most
+    one write happens per ``min_interval_ms``, and only when the state changed.
+    """
+
+    def __init__(
+        self,
+        config: CheckpointConfig,
+        state_store: StateStore,
+        contact_store: ContactStore | None = None,
+    ) -> None:
+        self._config = config
+        self._path = Path(config.path)
+        self._state_store = state_store
+        self._contact_store = contact_store
+        self._task: asyncio.Task[None] | None = None
+        self._written_version: int | None = None
+
+    async def load(self) -> bool:
+        """Restore state from the checkpoint; returns whether one was applied."""
+        if not self._config.enabled:
+            return False
+        try:
+            payload = await asyncio.to_thread(self._read)
+        except (OSError, ValueError) as exc:
+            LOGGER.warning("checkpoint load failed: %s", exc)
+            return False
+        parsed = self._parse(payload) if payload is not None else None
+        if parsed is None:
+            return False
+        age_s, sections, contacts = parsed
+        # The store is still cold here; keep a copy to fall back to.
+        _, cold = await self._state_store.versioned_state()
+        known = set(self._state_store.section_versions())
+        try:
+            async with self._state_store.transaction() as txn:
+                for name, value in sections.items():
+                    if name in known:
+                        txn.update_section(name, value)
+            if self._contact_store and contacts is not None:
+                await self._contact_store.restore_state(
+                    contacts, max_age_ms=self._config.contact_max_age_seconds * 1000
+                )
+        except (TypeError, KeyError, AttributeError, ValueError, ValidationError) as exc:
+            LOGGER.warning("checkpoint restore failed, starting cold: %s", exc)
+            async with self._state_store.transaction() as txn:
+                for name in known:
+                    txn.update_section(name, cold[name])
+            return False
+        self._written_version = self._state_store.version
+        LOGGER.info("restored checkpoint from %s (age_s=%.0f)", self._path, age_s)
+        return True
+
+    async def start(self) -> None:
+        if not self._config.enabled or self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+            await self.write()
+
+    async def write(self) -> bool:
+        """Write a checkpoint now if the state changed since the last one."""
+        version, state = await self._state_store.versioned_state()
+        if version == self._written_version:
+            return False
+        payload: dict[str, Any] = {
+            "format": CHECKPOINT_FORMAT,
+            "saved_at_ms": int(time.time() * 1000),
+            "version": version,
+            "state": {
+                name: value
+                for name, value in state.items()
+                if name not in {"timestamp_ms", "overall_ok"}
+            },
+        }
+        if self._contact_store:
+            payload["contacts"] = await self._contact_store.export_state()
+        try:
+            await asyncio.to_thread(self._write_atomic, payload)
+        except (OSError, TypeError, ValueError) as exc:
+            LOGGER.warning("checkpoint write failed: %s", exc)
+            return False
+        self._written_version = version
+        return True
+
+    async def _run(self) -> None:
+        interval_s = self._config.min_interval_ms / 1000
+        dirty = self._state_store.subscribe_dirty()
+        try:
+            while True:
+                await dirty.wait()
+                await asyncio.sleep(interval_s)
+                dirty.clear()
+                await self.write()
+        finally:
+            self._state_store.unsubscribe_dirty(dirty)
+
+    def _parse(
+        self, payload: dict[str, Any]
+    ) -> tuple[float, dict[str, Any], dict[str, Any] | None] | None:
+        """Return ``(age_s, sections, contacts)`` for a usable checkpoint, else None."""
+        try:
+            saved_at_ms = int(payload.get("saved_at_ms") or 0)
+        except (TypeError, ValueError):
+            saved_at_ms = 0
+        age_s = (int(time.time() * 1000) - saved_at_ms) / 1000
+        if payload.get("format") != CHECKPOINT_FORMAT or age_s > self._config.max_age_seconds:
+            LOGGER.info("ignoring checkpoint (format=%s age_s=%.0f)", payload.get("format"), age_s)
+            return None
+        sections = payload.get("state") or {}
+        contacts = payload.get("contacts")
+        if not isinstance(sections, dict) or not isinstance(contacts, dict | None):
+            LOGGER.warning("ignoring malformed checkpoint %s", self._path)
+            return None
+        return age_s, sections, contacts
+
+    def _read(self) -> dict[str, Any] | None:
+        if not self._path.exists():
+            return None
+        with self._path.open("r", encoding="utf-8") as handle:
+            data = json.load(handle)
+        if not isinstance(data, dict):
+            raise ValueError(f"Checkpoint must be a mapping: {self._path}")
+        return data
+
+    def _write_atomic(self, payload: dict[str, Any]) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_name(f"{self._path.name}.tmp")
+        data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        with tmp_path.open("wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, self._path)
+        dir_fd = os.open(self._path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
@@ -5,7 +5,7 @@ from __future__ import annotations
 import os
 from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 
 import yaml
 from pydantic import BaseModel, ConfigDict, Field
@@ -97,6 +97,60 @@ class FeaturesConfig(BaseModel):
     enable_esp32: bool
 
 
+class CheckpointConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool
+    path: str
+    min_interval_ms: int = Field(ge=1000)
+    max_age_seconds: int = Field(ge=0)
+    contact_max_age_seconds: int = Field(ge=0)
+
+
+class HistoryTierConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    step_ms: int = Field(ge=100)
+    retention_seconds: int = Field(ge=1)
+
+
+class HistoryConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool
+    fields: list[str]
+    tiers: list[HistoryTierConfig] = Field(min_length=1)
+
+
+class JournalConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool
+    directory: str
+    segment_max_bytes: int = Field(ge=4096)
+    segment_max_age_s: int = Field(ge=1)
+    flush_interval_ms: int = Field(ge=10)
+    fsync_policy: Literal["batch", "interval", "never"]
+    fsync_interval_ms: int = Field(ge=0)
+    max_bytes_per_s: int = Field(ge=1024)
+    max_total_mb: int = Field(ge=1)
+
+
+class WebSocketConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    send_queue_size: int = Field(ge=1)
+    slow_consumer_policy: Literal["conflate", "drop", "disconnect"]
+    conflate_types: list[str]
+    conflate_max_hz: float = Field(ge=0)
+    heartbeat_interval_s: float = Field(gt=0)
+    heartbeat_timeout_s: float = Field(ge=0)
+    max_connections: int = Field(ge=0)
+    max_connections_per_ip: int = Field(ge=0)
+    connect_rate_per_s: float = Field(ge=0)
+    connect_burst: int = Field(ge=1)
+
+
 class AppConfig(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
@@ -110,6 +164,10 @@ class AppConfig(BaseModel):
     cors: CorsConfig
     rate_limits: RateLimitConfig
     features: FeaturesConfig
+    checkpoint: CheckpointConfig
+    history: HistoryConfig
+    journal: JournalConfig
+    websocket: WebSocketConfig
 
 
 def _repo_root() -> Path:
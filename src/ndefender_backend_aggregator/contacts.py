@@ -43,8 +43,7 @@ class ContactStore:
                     self._remoteid.pop(contact_id, None)
                     contacts = self._merged_contacts()
                     replay = dict(self._replay)
-                await self._state_store.update_section("contacts", contacts)
-                await self._state_store.update_section("replay", replay)
+                await self._write_state(contacts, replay)
                 return
         async with self._lock:
             if event_type == "CONTACT_LOST":
@@ -61,8 +60,7 @@ class ContactStore:
                 self._remoteid[contact_id] = contact
             contacts = self._merged_contacts()
             replay = dict(self._replay)
-        await self._state_store.update_section("contacts", contacts)
-        await self._state_store.update_section("replay", replay)
+        await self._write_state(contacts, replay)
 
     async def update_rf(self, event_type: str, data: dict[str, Any], timestamp_ms: int) -> None:
         contact_id = data.get("id") or f"rf:{data.get('freq_hz', 'unknown')}"
@@ -82,8 +80,7 @@ class ContactStore:
                 self._rf[contact_id] = contact
             contacts = self._merged_contacts()
             replay = dict(self._replay)
-        await self._state_store.update_section("contacts", contacts)
-        await self._state_store.update_section("replay", replay)
+        await self._write_state(contacts, replay)
 
     async def update_fpv(self, telemetry: dict[str, Any], timestamp_ms: int) -> None:
         vrx_list = telemetry.get("vrx") or []
@@ -116,8 +113,7 @@ class ContactStore:
                 self._fpv = {contact_id: contact}
             contacts = self._merged_contacts()
             replay = dict(self._replay)
-        await self._state_store.update_section("contacts", contacts)
-        await self._state_store.update_section("replay", replay)
+        await self._write_state(contacts, replay)
 
     async def update_replay(self, data: dict[str, Any]) -> None:
         state = str(data.get("state") or "").lower()
@@ -126,8 +122,67 @@ class ContactStore:
             self._replay = {"active": active, "source": "remoteid" if active else "none"}
             contacts = self._merged_contacts()
             replay = dict(self._replay)
-        await self._state_store.update_section("contacts", contacts)
-        await self._state_store.update_section("replay", replay)
+        await self._write_state(contacts, replay)
+
+    async def export_state(self) -> dict[str, Any]:
+        """Return the contact tables with RemoteID TTL deadlines, for checkpoints."""
+        async with self._lock:
+            return {
+                "remoteid": [
+                    {
+                        "contact": dict(contact),
+                        "expires_ms": self._normalize_ts(contact.get("last_seen_ts") or 0)
+                        + self._remoteid_ttl_ms,
+                    }
+                    for contact in self._remoteid.values()
+                ],
+                "rf": [dict(contact) for contact in self._rf.values()],
+                "fpv": [dict(contact) for contact in self._fpv.values()],
+                "replay": dict(self._replay),
+            }
+
+    async def restore_state(self, data: dict[str, Any], max_age_ms: int | None = None) -> None:
+        """Reload contact tables from ``export_state`` output, dropping expired contacts.
+
+        RemoteID contacts carry their own expiry; RF and FPV contacts last seen
+        more than ``max_age_ms`` ago are dropped (kept if None or during
+        replay). A malformed checkpoint raises and leaves the tables unchanged.
+        """
+        now_ms = int(time.time() * 1000)
+        replay = data.get("replay")
+        async with self._lock:
+            replay_state = dict(self._replay)
+            if isinstance(replay, dict):
+                replay_state = {
+                    "active": bool(replay.get("active")),
+                    "source": str(replay.get("source") or "none"),
+                }
+            replay_active = bool(replay_state.get("active"))
+            remoteid = {
+                entry["contact"]["id"]: entry["contact"]
+                for entry in data.get("remoteid") or []
+                if entry.get("contact", {}).get("id")
+                and (replay_active or int(entry.get("expires_ms") or 0) > now_ms)
+            }
+            oldest_ms = None if replay_active or max_age_ms is None else now_ms - max_age_ms
+            rf = {
+                c["id"]: c
+                for c in data.get("rf") or []
+                if c.get("id") and self._seen_since(c, oldest_ms)
+            }
+            fpv = {
+                c["id"]: c
+                for c in data.get("fpv") or []
+                if c.get("id") and self._seen_since(c, oldest_ms)
+            }
+            previous = (self._replay, self._remoteid, self._rf, self._fpv)
+            self._replay, self._remoteid, self._rf, self._fpv = replay_state, remoteid, rf, fpv
+            try:
+                contacts = self._merged_contacts()
+            except (TypeError, KeyError, AttributeError, ValueError):
+                self._replay, self._remoteid, self._rf, self._fpv = previous
+                raise
+        await self._write_state(contacts, dict(replay_state))
 
     async def replay_active(self) -> bool:
         async with self._lock:
@@ -137,6 +192,16 @@ class ContactStore:
         async with self._lock:
             return len(self._remoteid)
 
+    async def _write_state(self, contacts: list[dict[str, Any]], replay: dict[str, Any]) -> None:
+        async with self._state_store.transaction() as txn:
+            txn.update_section("contacts", contacts)
+            txn.update_section("replay", replay)
+
+    def _seen_since(self, contact: dict[str, Any], oldest_ms: int | None) -> bool:
+        if oldest_ms is None:
+            return True
+        return self._normalize_ts(contact.get("last_seen_ts") or 0) >= oldest_ms
+
     def _merged_contacts(self) -> list[dict[str, Any]]:
         merged = [*self._remoteid.values(), *self._rf.values(), *self._fpv.values()]
         if not self._replay.get("active"):
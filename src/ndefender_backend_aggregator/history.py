@@ -0,0 +1,207 @@
+"""Fixed-memory, multi-resolution history of numeric status fields."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from array import array
+from contextlib import suppress
+from typing import Any
+
+from .config import HistoryConfig, HistoryTierConfig
+from .state import StateChange, StateStore
+from .status_schema import derive_fpv
+
+
+class _Tier:
+    """Ring of per-bucket sums and counts at one resolution."""
+
+    def __init__(self, step_ms: int, size: int) -> None:
+        self.step_ms = step_ms
+        self.size = size
+        self.sums = array("d", bytes(8 * size))
+        self.counts = array("L", bytes(array("L").itemsize * size))
+        self.head: int | None = None
+
+    @property
+    def retention_ms(self) -> int:
+        return self.step_ms * self.size
+
+    def add(self, timestamp_ms: int, value: float) -> None:
+        bucket = timestamp_ms // self.step_ms
+        if self.head is None:
+            self.head = bucket
+        elif bucket > self.head:
+            self._clear(self.head + 1, bucket)
+            self.head = bucket
+        elif bucket <= self.head - self.size:
+            return
+        slot = bucket % self.size
+        self.sums[slot] += value
+        self.counts[slot] += 1
+
+    def window(self, first: int, last: int) -> tuple[array, array]:
+        """Return sums and counts for buckets ``first..last`` (inclusive) in order."""
+        sums = array("d")
+        counts = array("L")
+        for start, stop in self._slot_ranges(first, last):
+            sums.extend(self.sums[start:stop])
+            counts.extend(self.counts[start:stop])
+        return sums, counts
+
+    def _clear(self, first: int, last: int) -> None:
+        first = max(first, last - self.size + 1)
+        for start, stop in self._slot_ranges(first, last):
+            width = stop - start
+            self.sums[start:stop] = array("d", bytes(8 * width))
+            self.counts[start:stop] = array("L", bytes(self.counts.itemsize * width))
+
+    def _slot_ranges(self, first: int, last: int) -> list[tuple[int, int]]:
+        if last < first:
+            return []
+        start = first % self.size
+        stop = last % self.size + 1
+        if start < stop:
+            return [(start, stop)]
+        return [(start, self.size), (0, stop)]
+
+
+class _Series:
+    def __init__(self, tiers: list[HistoryTierConfig]) -> None:
+        self.tiers = [
+            _Tier(tier.step_ms, max(1, tier.retention_seconds * 1000 // tier.step_ms))
+            for tier in sorted(tiers, key=lambda item: item.step_ms)
+        ]
+
+    def add(self, timestamp_ms: int, value: float) -> None:
+        for tier in self.tiers:
+            tier.add(timestamp_ms, value)
+
+    def query(
+        self,
+        start_ms: int,
+        end_ms: int,
+        step_ms: int | None,
+    ) -> tuple[int, list[list[float]]]:
+        tier = self._pick_tier(start_ms, step_ms)
+        factor = max(1, (step_ms or tier.step_ms) // tier.step_ms)
+        out_step = tier.step_ms * factor
+        if tier.head is None:
+            return out_step, []
+        oldest = tier.head - tier.size + 1
+        first = max(start_ms // tier.step_ms, oldest)
+        first -= first % factor
+        last = min(end_ms // tier.step_ms, tier.head)
+        if last < first:
+            return out_step, []
+        retained = max(first, oldest)
+        sums, counts = tier.window(retained, last)
+        # Left-pad so every output bucket spans exactly ``factor`` tier buckets.
+        pad = retained - first
+        if pad:
+            sums = array("d", bytes(8 * pad)) + sums
+            counts = array("L", bytes(counts.itemsize * pad)) + counts
+        points: list[list[float]] = []
+        for offset in range(0, len(sums), factor):
+            count = sum(counts[offset : offset + factor])
+            if count:
+                bucket_ms = (first + offset) * tier.step_ms
+                points.append([bucket_ms, sum(sums[offset : offset + factor]) / count])
+        return out_step, points
+
+    def _pick_tier(self, start_ms: int, step_ms: int | None) -> _Tier:
+        now_ms = int(time.time() * 1000)
+        covering = [tier for tier in self.tiers if now_ms - tier.retention_ms <= start_ms]
+        if not covering:
+            return self.tiers[-1]
+        if step_ms is None:
+            return covering[0]
+        fitting = [tier for tier in covering if tier.step_ms <= step_ms]
+        return fitting[-1] if fitting else covering[0]
+
+
+class HistoryStore:
+    """Record configured numeric fields from StateStore commits into ring buffers.
+
+    Each field keeps one ring per configured tier (for example 1 s for 10 min,
+    10 s for 6 h, 1 min for 7 d), so memory is fixed at startup. Samples
+    landing in the same bucket are averaged.
+    """
+
+    def __init__(self, config: HistoryConfig, state_store: StateStore) -> None:
+        self._config = config
+        self._state_store = state_store
+        self._series: dict[str, _Series] = {path: _Series(config.tiers) for path in config.fields}
+        self._paths: dict[str, list[tuple[str, list[str]]]] = {}
+        for path in config.fields:
+            section, _, field = path.partition(".")
+            self._paths.setdefault(section, []).append((path, field.split(".")))
+        self._fpv: Any = None
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def fields(self) -> list[str]:
+        return list(self._series)
+
+    async def start(self) -> None:
+        if not self._config.enabled or self._task or not self._series:
+            return
+        sections = set(self._paths)
+        if "fpv" in sections:
+            sections.add("vrx")
+        queue = self._state_store.subscribe_changes(sections)
+        self._task = asyncio.create_task(self._run(queue))
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def record(self, path: str, timestamp_ms: int, value: Any) -> None:
+        series = self._series.get(path)
+        if series is None or isinstance(value, bool) or not isinstance(value, int | float):
+            return
+        series.add(timestamp_ms, float(value))
+
+    def query(
+        self,
+        path: str,
+        start_ms: int,
+        end_ms: int,
+        step_ms: int | None = None,
+    ) -> dict[str, Any]:
+        series = self._series.get(path)
+        if series is None:
+            raise KeyError(f"Untracked history field: {path}")
+        step, points = series.query(start_ms, end_ms, step_ms)
+        return {"field": path, "from": start_ms, "to": end_ms, "step_ms": step, "points": points}
+
+    async def _run(self, queue: asyncio.Queue[StateChange]) -> None:
+        try:
+            while True:
+                self.apply_change(await queue.get())
+        finally:
+            self._state_store.unsubscribe_changes(queue)
+
+    def apply_change(self, change: StateChange) -> None:
+        sections = dict(change.sections)
+        if "fpv" in sections:
+            self._fpv = sections["fpv"]
+        if "vrx" in sections and "fpv" in self._paths:
+            sections["fpv"] = derive_fpv(sections["vrx"], self._fpv)
+        for name, section in sections.items():
+            for path, keys in self._paths.get(name, ()):
+                self.record(path, change.timestamp_ms, _lookup(section, keys))
+
+
+def _lookup(value: Any, keys: list[str]) -> Any:
+    for key in keys:
+        if isinstance(value, dict):
+            value = value.get(key)
+        elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        else:
+            return None
+    return value
@@ -108,27 +108,28 @@ class AntsdrIngestor(Ingestor):
             timestamp_ms *= 1000
         data = payload.get("data") or {}
         self._last_event_ms = timestamp_ms
-        await self._state_store.update_section(
-            "rf",
-            {
-                "last_event_type": event_type,
-                "last_event": data,
-                "last_timestamp_ms": timestamp_ms,
-                "scan_active": True,
-                "status": "ok",
-                "last_error": None,
-            },
-        )
-        await self._state_store.update_section(
-            "antsdr",
-            {
-                "timestamp_ms": timestamp_ms,
-                "connected": True,
-                "uri": self._load_antsdr_uri(),
-                "temperature_c": data.get("temperature_c"),
-                "last_error": None,
-            },
-        )
+        async with self._state_store.transaction() as txn:
+            txn.update_section(
+                "rf",
+                {
+                    "last_event_type": event_type,
+                    "last_event": data,
+                    "last_timestamp_ms": timestamp_ms,
+                    "scan_active": True,
+                    "status": "ok",
+                    "last_error": None,
+                },
+            )
+            txn.update_section(
+                "antsdr",
+                {
+                    "timestamp_ms": timestamp_ms,
+                    "connected": True,
+                    "uri": self._load_antsdr_uri(),
+                    "temperature_c": data.get("temperature_c"),
+                    "last_error": None,
+                },
+            )
         if self._contact_store and event_type:
             await self._contact_store.update_rf(str(event_type), data, timestamp_ms)
         envelope = EventEnvelope(
@@ -156,53 +157,55 @@ class AntsdrIngestor(Ingestor):
                     if reachable is False:
                         reason = "antsdr_unreachable"
                         status = "offline"
-                await self._state_store.update_section(
-                    "rf",
-                    {
-                        "last_event_type": "RF_SCAN_OFFLINE",
-                        "last_event": {"reason": reason},
-                        "last_timestamp_ms": now_ms,
-                        "scan_active": False,
-                        "status": status,
-                        "last_error": reason,
-                    },
-                )
-                await self._state_store.update_section(
-                    "antsdr",
-                    {
-                        "timestamp_ms": now_ms,
-                        "connected": False,
-                        "uri": self._load_antsdr_uri(),
-                        "temperature_c": None,
-                        "last_error": reason,
-                    },
-                )
+                async with self._state_store.transaction() as txn:
+                    txn.update_section(
+                        "rf",
+                        {
+                            "last_event_type": "RF_SCAN_OFFLINE",
+                            "last_event": {"reason": reason},
+                            "last_timestamp_ms": now_ms,
+                            "scan_active": False,
+                            "status": status,
+                            "last_error": reason,
+                        },
+                    )
+                    txn.update_section(
+                        "antsdr",
+                        {
+                            "timestamp_ms": now_ms,
+                            "connected": False,
+                            "uri": self._load_antsdr_uri(),
+                            "temperature_c": None,
+                            "last_error": reason,
+                        },
+                    )
                 continue
             if self._is_stale(self._last_event_ms):
-                await self._state_store.update_section(
-                    "rf",
-                    {
-                        "last_event_type": "RF_SCAN_STALE",
-                        "last_event": {
-                            "reason": "no_recent_rf_events",
-                            "last_seen_ms": self._last_event_ms,
+                async with self._state_store.transaction() as txn:
+                    txn.update_section(
+                        "rf",
+                        {
+                            "last_event_type": "RF_SCAN_STALE",
+                            "last_event": {
+                                "reason": "no_recent_rf_events",
+                                "last_seen_ms": self._last_event_ms,
+                            },
+                            "last_timestamp_ms": now_ms,
+                            "scan_active": False,
+                            "status": "degraded",
+                            "last_error": "no_recent_rf_events",
                         },
-                        "last_timestamp_ms": now_ms,
-                        "scan_active": False,
-                        "status": "degraded",
-                        "last_error": "no_recent_rf_events",
-                    },
-                )
-                await self._state_store.update_section(
-                    "antsdr",
-                    {
-                        "timestamp_ms": now_ms,
-                        "connected": False,
-                        "uri": self._load_antsdr_uri(),
-                        "temperature_c": None,
-                        "last_error": "no_recent_rf_events",
-                    },
-                )
+                    )
+                    txn.update_section(
+                        "antsdr",
+                        {
+                            "timestamp_ms": now_ms,
+                            "connected": False,
+                            "uri": self._load_antsdr_uri(),
+                            "temperature_c": None,
+                            "last_error": "no_recent_rf_events",
+                        },
+                    )
 
     @staticmethod
     def _normalize_type(event_type: Any) -> str:
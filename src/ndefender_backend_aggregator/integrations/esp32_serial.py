@@ -215,46 +215,47 @@ class Esp32Ingestor(Ingestor):
                 sys_payload = {}
             sys_payload.setdefault("status", "CONNECTED")
             sys_payload.pop("last_error", None)
-            await self._state_store.update_section(
-                "vrx",
-                {
-                    "selected": payload.get("sel"),
-                    "vrx": payload.get("vrx", []),
-                    "led": payload.get("led", {}),
-                    "sys": sys_payload,
-                },
-            )
-            await self._state_store.update_section("video", payload.get("video", {}))
             interval_ms = None
             if self._last_telemetry_ms:
                 interval_ms = max(0, event_ts_ms - self._last_telemetry_ms)
             self._last_telemetry_ms = event_ts_ms
             self._reported_status = "CONNECTED"
             self._reported_error = None
-            await self._state_store.update_section(
-                "esp32",
-                {
-                    "timestamp_ms": event_ts_ms,
-                    "connected": True,
-                    "last_seen_ms": event_ts_ms,
-                    "rtt_ms": None,
-                    "fw_version": payload.get("fw_version"),
-                    "heartbeat": {
-                        "ok": True,
-                        "interval_ms": interval_ms,
-                        "last_heartbeat_ms": event_ts_ms,
+            async with self._state_store.transaction() as txn:
+                txn.update_section(
+                    "vrx",
+                    {
+                        "selected": payload.get("sel"),
+                        "vrx": payload.get("vrx", []),
+                        "led": payload.get("led", {}),
+                        "sys": sys_payload,
                     },
-                    "capabilities": {
-                        "buttons": False,
-                        "leds": True,
-                        "buzzer": False,
-                        "vrx": True,
-                        "video_switch": True,
-                        "config": False,
+                )
+                txn.update_section("video", payload.get("video", {}))
+                txn.update_section(
+                    "esp32",
+                    {
+                        "timestamp_ms": event_ts_ms,
+                        "connected": True,
+                        "last_seen_ms": event_ts_ms,
+                        "rtt_ms": None,
+                        "fw_version": payload.get("fw_version"),
+                        "heartbeat": {
+                            "ok": True,
+                            "interval_ms": interval_ms,
+                            "last_heartbeat_ms": event_ts_ms,
+                        },
+                        "capabilities": {
+                            "buttons": False,
+                            "leds": True,
+                            "buzzer": False,
+                            "vrx": True,
+                            "video_switch": True,
+                            "config": False,
+                        },
+                        "last_error": None,
                     },
-                    "last_error": None,
-                },
-            )
+                )
             if self._contact_store:
                 await self._contact_store.update_fpv(payload, payload_ts_ms)
             await self._event_bus.publish(
@@ -317,53 +318,48 @@ class Esp32Ingestor(Ingestor):
             return
         self._reported_status = "CONNECTED"
         self._reported_error = None
-        await self._update_vrx_sys("CONNECTED", None)
-        await self._state_store.update_section(
-            "esp32",
-            {
-                "timestamp_ms": int(time.time() * 1000),
-                "connected": True,
-                "last_seen_ms": self._last_telemetry_ms,
-                "rtt_ms": None,
-                "fw_version": None,
-                "heartbeat": None,
-                "capabilities": None,
-                "last_error": None,
-            },
-        )
+        await self._write_link_state("CONNECTED", None)
 
     async def _report_disconnected(self, error: str | None) -> None:
         if self._reported_status == "DISCONNECTED" and self._reported_error == error:
             return
         self._reported_status = "DISCONNECTED"
         self._reported_error = error
-        await self._update_vrx_sys("DISCONNECTED", error)
-        await self._state_store.update_section(
-            "esp32",
-            {
-                "timestamp_ms": int(time.time() * 1000),
-                "connected": False,
-                "last_seen_ms": self._last_telemetry_ms,
-                "rtt_ms": None,
-                "fw_version": None,
-                "heartbeat": None,
-                "capabilities": None,
-                "last_error": error,
-            },
-        )
+        await self._write_link_state("DISCONNECTED", error)
 
-    async def _update_vrx_sys(self, status: str, error: str | None) -> None:
-        snapshot = await self._state_store.snapshot()
-        current = snapshot.model_dump()
-        vrx = dict(current.get("vrx") or {})
-        sys_payload = dict(vrx.get("sys") or {})
-        sys_payload["status"] = status
-        if error:
-            sys_payload["last_error"] = error
-        elif "last_error" in sys_payload:
-            sys_payload.pop("last_error", None)
-        vrx["sys"] = sys_payload
-        await self._state_store.update_section("vrx", vrx)
+    async def _write_link_state(self, status: str, error: str | None) -> None:
+        async with self._state_store.transaction() as txn:
+            txn.modify_section("vrx", self._vrx_sys_updater(status, error))
+            txn.update_section(
+                "esp32",
+                {
+                    "timestamp_ms": int(time.time() * 1000),
+                    "connected": status == "CONNECTED",
+                    "last_seen_ms": self._last_telemetry_ms,
+                    "rtt_ms": None,
+                    "fw_version": None,
+                    "heartbeat": None,
+                    "capabilities": None,
+                    "last_error": error,
+                },
+            )
+
+    @staticmethod
+    def _vrx_sys_updater(status: str, error: str | None) -> Callable[[Any], dict[str, Any]]:
+        def apply(vrx: Any) -> dict[str, Any]:
+            vrx = vrx if isinstance(vrx, dict) else {}
+            sys_payload = vrx.get("sys")
+            if not isinstance(sys_payload, dict):
+                sys_payload = {}
+            sys_payload["status"] = status
+            if error:
+                sys_payload["last_error"] = error
+            else:
+                sys_payload.pop("last_error", None)
+            vrx["sys"] = sys_payload
+            return vrx
+
+        return apply
 
     async def _write_json(self, payload: dict[str, Any]) -> None:
         if not self._serial:
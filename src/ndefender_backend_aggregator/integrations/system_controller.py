@@ -87,7 +87,6 @@ class SystemControllerIngestor(Ingestor):
         response = await self._client.get("/api/v1/status")
         response.raise_for_status()
         payload = response.json() or {}
-        await self._state_store.update_section("system", payload.get("system") or {})
         power_payload = payload.get("power") or payload.get("ups") or {}
         if not self._power_has_data(power_payload):
             local_ups = await self._read_local_ups()
@@ -95,11 +94,13 @@ class SystemControllerIngestor(Ingestor):
                 power_payload = local_ups
             elif not power_payload:
                 power_payload = {"status": "offline", "last_error": self._last_ups_error or "ups_unavailable"}
-        await self._state_store.update_section("power", power_payload)
-        await self._state_store.update_section("services", payload.get("services") or [])
-        await self._state_store.update_section("network", payload.get("network") or {})
-        await self._state_store.update_section("gps", payload.get("gps") or {})
-        await self._state_store.update_section("audio", payload.get("audio") or {})
+        async with self._state_store.transaction() as txn:
+            txn.update_section("system", payload.get("system") or {})
+            txn.update_section("power", power_payload)
+            txn.update_section("services", payload.get("services") or [])
+            txn.update_section("network", payload.get("network") or {})
+            txn.update_section("gps", payload.get("gps") or {})
+            txn.update_section("audio", payload.get("audio") or {})
 
         now_ms = int(time.time() * 1000)
         self._last_success_ms = now_ms
@@ -114,21 +115,22 @@ class SystemControllerIngestor(Ingestor):
 
     async def _mark_offline(self, error: str) -> None:
         offline = {"status": "offline", "last_error": error}
-        await self._state_store.update_section("system", offline)
         power_payload = await self._read_local_ups()
         if power_payload is None:
             power_payload = {"status": "offline", "last_error": self._last_ups_error or error}
-        await self._state_store.update_section("power", power_payload)
-        await self._state_store.update_section("network", {"connected": False})
-        await self._state_store.update_section(
-            "gps",
-            {
-                "timestamp_ms": int(time.time() * 1000),
-                "fix": "NO_FIX",
-                "last_error": error,
-            },
-        )
-        await self._state_store.update_section("audio", offline)
+        async with self._state_store.transaction() as txn:
+            txn.update_section("system", offline)
+            txn.update_section("power", power_payload)
+            txn.update_section("network", {"connected": False})
+            txn.update_section(
+                "gps",
+                {
+                    "timestamp_ms": int(time.time() * 1000),
+                    "fix": "NO_FIX",
+                    "last_error": error,
+                },
+            )
+            txn.update_section("audio", offline)
 
     def _power_has_data(self, payload: dict[str, object]) -> bool:
         for key in ("pack_voltage_v", "current_a", "input_vbus_v", "input_power_w", "soc_percent"):
@@ -0,0 +1,298 @@
+"""Append-only on-disk journal of bus events in rotated segment files."""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from .bus import PRIORITY_HIGH, EventBus, Subscription, event_priority
+from .config import JournalConfig
+from .models import EventEnvelope
+
+LOGGER = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".jsonl"
+INDEX_SUFFIX = ".idx"
+# One index entry per this many segment bytes keeps indexes tiny while
+# bounding how much a range read has to scan before its start.
+INDEX_INTERVAL_BYTES = 64 * 1024
+
+
+class _Segment:
+    def __init__(self, path: Path, first_ms: int, number: int) -> None:
+        self.path = path
+        self.first_ms = first_ms
+        self.number = number
+        self.size = path.stat().st_size if path.exists() else 0
+        self.index: list[tuple[int, int]] = []
+
+    @property
+    def index_path(self) -> Path:
+        return self.path.with_suffix(INDEX_SUFFIX)
+
+    def load_index(self) -> None:
+        entries: list[tuple[int, int]] = []
+        with suppress(FileNotFoundError), self.index_path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                journal_ms, _, offset = line.strip().partition(" ")
+                if journal_ms.isdigit() and offset.isdigit():
+                    entries.append((int(journal_ms), int(offset)))
+        self.index = entries
+
+    def offset_for(self, start_ms: int) -> int:
+        """Byte offset of the last indexed record before ``start_ms``.
+
+        A batch shares one ``journal_ms`` and may span several index
+        entries, so seeking to an entry at ``start_ms`` would skip the
+        batch's earlier records.
+        """
+        position = max(0, bisect.bisect_left(self.index, (start_ms,)) - 1)
+        return self.index[position][1] if self.index else 0
+
+
+class _SegmentWriter:
+    """Blocking segment I/O; every method runs on a worker thread."""
+
+    def __init__(self, config: JournalConfig) -> None:
+        self._config = config
+        self._directory = Path(config.directory)
+        self.segments: list[_Segment] = []
+        self._handle: BinaryIO | None = None
+        self._index_handle: Any = None
+        self._opened_at = 0.0
+        self._last_index_offset = -INDEX_INTERVAL_BYTES
+        self._last_fsync = 0.0
+
+    def recover(self) -> None:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        for path in self._directory.glob(f"segment-*{SEGMENT_SUFFIX}"):
+            first_ms, _, number = path.stem.removeprefix("segment-").partition("-")
+            if not (first_ms.isdigit() and number.isdigit()):
+                continue
+            segment = _Segment(path, int(first_ms), int(number))
+            segment.load_index()
+            self.segments.append(segment)
+        self.segments.sort(key=lambda segment: segment.number)
+
+    def append(self, records: list[tuple[int, bytes]]) -> None:
+        for journal_ms, line in records:
+            segment = self._current(journal_ms, len(line))
+            handle = self._handle
+            if handle is None:
+                return
+            if segment.size - self._last_index_offset >= INDEX_INTERVAL_BYTES:
+                segment.index.append((journal_ms, segment.size))
+                self._index_handle.write(f"{journal_ms} {segment.size}\n")
+                self._last_index_offset = segment.size
+            handle.write(line)
+            segment.size += len(line)
+        self._flush()
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._flush(force_fsync=True)
+            self._handle.close()
+            self._index_handle.close()
+            self._handle = None
+            self._index_handle = None
+
+    def read_range(
+        self,
+        start_ms: int,
+        end_ms: int,
+        limit: int,
+        types: frozenset[str] | None,
+    ) -> list[dict[str, Any]]:
+        if self._handle is not None:
+            self._handle.flush()
+        results: list[dict[str, Any]] = []
+        for position, segment in enumerate(self.segments):
+            following = self.segments[position + 1] if position + 1 < len(self.segments) else None
+            # A segment holds records from its first_ms up to the next one's.
+            if segment.first_ms > end_ms or (following and following.first_ms < start_ms):
+                continue
+            with suppress(FileNotFoundError), segment.path.open("rb") as handle:
+                handle.seek(segment.offset_for(start_ms))
+                for raw in handle:
+                    try:
+                        record = json.loads(raw)
+                    except ValueError:
+                        continue  # torn tail after a crash
+                    journal_ms = record.get("t", 0)
+                    if journal_ms > end_ms:
+                        break
+                    event = record.get("e") or {}
+                    if journal_ms < start_ms or (types and event.get("type") not in types):
+                        continue
+                    results.append({"journal_ms": journal_ms, **event})
+                    if len(results) >= limit:
+                        return results
+        return results
+
+    def _current(self, journal_ms: int, incoming: int) -> _Segment:
+        segment = self.segments[-1] if self._handle is not None else None
+        expired = time.monotonic() - self._opened_at >= self._config.segment_max_age_s
+        too_big = segment is not None and segment.size + incoming > self._config.segment_max_bytes
+        if segment is None or ((expired or too_big) and segment.size > 0):
+            segment = self._rotate(journal_ms)
+        return segment
+
+    def _rotate(self, journal_ms: int) -> _Segment:
+        self.close()
+        number = self.segments[-1].number + 1 if self.segments else 1
+        name = f"segment-{journal_ms:013d}-{number:06d}{SEGMENT_SUFFIX}"
+        segment = _Segment(self._directory / name, journal_ms, number)
+        self._handle = segment.path.open("ab")
+        self._index_handle = segment.index_path.open("a", encoding="utf-8")
+        self._opened_at = time.monotonic()
+        self._last_index_offset = -INDEX_INTERVAL_BYTES
+        self.segments.append(segment)
+        self._enforce_retention()
+        return segment
+
+    def _flush(self, force_fsync: bool = False) -> None:
+        if self._handle is None:
+            return
+        self._handle.flush()
+        self._index_handle.flush()
+        policy = self._config.fsync_policy
+        now = time.monotonic()
+        due = now - self._last_fsync >= self._config.fsync_interval_ms / 1000
+        if policy == "never":
+            return
+        if policy == "batch" or due or force_fsync:
+            os.fsync(self._handle.fileno())
+            self._last_fsync = now
+
+    def _enforce_retention(self) -> None:
+        budget = self._config.max_total_mb * 1024 * 1024
+        total = sum(segment.size for segment in self.segments)
+        while total > budget and len(self.segments) > 1:
+            oldest = self.segments.pop(0)
+            total -= oldest.size
+            for path in (oldest.path, oldest.index_path):
+                with suppress(FileNotFoundError):
+                    path.unlink()
+
+
+class EventJournal:
+    """Bus consumer that appends every envelope to rotated segment files.
+
+    Events are batched for ``flush_interval_ms`` and written by a worker
+    thread as one group commit, fsynced per ``fsync_policy``. Segments rotate
+    by size and age, the oldest are deleted beyond ``max_total_mb``, and
+    writes are capped at ``max_bytes_per_s``: over budget, everything but
+    high-priority events (ACKs and contact alerts) is dropped and counted.
+    Each segment has a sparse ``.idx`` of ``journal_ms offset`` pairs so
+    time-range reads seek close to their start.
+    """
+
+    def __init__(self, config: JournalConfig, event_bus: EventBus) -> None:
+        self._config = config
+        self._event_bus = event_bus
+        self._writer = _SegmentWriter(config)
+        self._subscription: Subscription | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._tokens = float(config.max_bytes_per_s)
+        self._refilled_at = time.monotonic()
+        self._io_lock = asyncio.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.bytes_written = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._config.enabled
+
+    async def start(self) -> None:
+        if not self._config.enabled or self._task:
+            return
+        await asyncio.to_thread(self._writer.recover)
+        self._subscription = await self._event_bus.subscribe(name="journal")
+        self._task = asyncio.create_task(self._run(self._subscription))
+
+    async def stop(self) -> None:
+        if self._task is None or self._subscription is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        await self._write(self._drain(self._subscription, []))
+        await self._event_bus.unsubscribe(self._subscription)
+        self._subscription = None
+        async with self._io_lock:
+            await asyncio.to_thread(self._writer.close)
+
+    async def read_range(
+        self,
+        start_ms: int,
+        end_ms: int,
+        limit: int = 1000,
+        types: frozenset[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Return journaled envelopes written between ``start_ms`` and ``end_ms``."""
+        async with self._io_lock:
+            return await asyncio.to_thread(self._writer.read_range, start_ms, end_ms, limit, types)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self._config.enabled,
+            "written": self.written,
+            "dropped": self.dropped,
+            "bytes_written": self.bytes_written,
+            "segments": len(self._writer.segments),
+        }
+
+    async def _run(self, subscription: Subscription) -> None:
+        interval_s = self._config.flush_interval_ms / 1000
+        while True:
+            batch = [await subscription.get()]
+            await asyncio.sleep(interval_s)
+            # Shielded so cancellation in stop() never abandons a batch mid-write.
+            await asyncio.shield(self._write(self._drain(subscription, batch)))
+
+    @staticmethod
+    def _drain(subscription: Subscription, batch: list[EventEnvelope]) -> list[EventEnvelope]:
+        while not subscription.empty():
+            batch.append(subscription.get_nowait())
+        return batch
+
+    async def _write(self, batch: list[EventEnvelope]) -> None:
+        # Subscriptions drain by priority; the journal keeps publish order.
+        batch.sort(key=lambda event: event.seq or 0)
+        records = self._admit(batch)
+        if not records:
+            return
+        try:
+            async with self._io_lock:
+                await asyncio.to_thread(self._writer.append, records)
+        except OSError as exc:
+            LOGGER.warning("journal write failed: %s", exc)
+            self.dropped += len(records)
+            return
+        self.written += len(records)
+        self.bytes_written += sum(len(line) for _, line in records)
+
+    def _admit(self, batch: list[EventEnvelope]) -> list[tuple[int, bytes]]:
+        now = time.monotonic()
+        rate = self._config.max_bytes_per_s
+        self._tokens = min(float(rate), self._tokens + (now - self._refilled_at) * rate)
+        self._refilled_at = now
+        journal_ms = int(time.time() * 1000)
+        records: list[tuple[int, bytes]] = []
+        for event in batch:
+            line = b'{"t":%d,"e":%s}\n' % (journal_ms, event.encoded().encode("utf-8"))
+            if len(line) > self._tokens and event_priority(event.type) != PRIORITY_HIGH:
+                self.dropped += 1
+                continue
+            self._tokens -= len(line)
+            records.append((journal_ms, line))
+        return records
@@ -12,24 +12,48 @@ from typing import Any
 
 import httpcore
 import httpx
-from fastapi import Body, Depends, FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi import (
+    Body,
+    Depends,
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
+from . import ws_codecs
 from .bus import EventBus
+from .checkpoint import StateCheckpointer
 from .commands import CommandRequest, CommandRouter, Esp32CommandHandler, SystemCommandHandler
 from .config import get_config
 from .contacts import ContactStore
+from .history import HistoryStore
 from .integrations.esp32_serial import Esp32Ingestor
+from .journal import EventJournal
 from .logging import configure_logging
-from .models import EventEnvelope, StatusSnapshot
+from .models import EventEnvelope, StatusSnapshot, WsSyncMessage
+from .patches import make_patch
 from .rate_limit import command_rate_limit, dangerous_rate_limit
 from .runtime import build_default_orchestrator
+from .sse import event_stream
 from .state import StateStore
-from .ws import WebSocketManager
+from .status_schema import fill_status_snapshot
+from .ws import AdmissionControl, WebSocketManager, parse_client_frame
 
 logger = logging.getLogger("ndefender-backend-aggregator")
 
+STATUS_CHANGES_MAX_TIMEOUT_MS = 60000
+HISTORY_DEFAULT_WINDOW_MS = 10 * 60 * 1000
+JOURNAL_MAX_LIMIT = 10000
+# How long a ?sync=1 WebSocket waits for the client's sync message.
+WS_SYNC_TIMEOUT_S = 5.0
+
 
 class CommandAck:
     def __init__(self, command: str, accepted: bool, detail: str | None = None) -> None:
@@ -62,9 +86,14 @@ def require_confirm(body: CommandBody) -> None:
         raise HTTPException(status_code=400, detail="confirm_required")
 
 
+# Set by the Cloudflare tunnel and other proxies, which connect from loopback.
+PROXY_HEADERS = ("cf-connecting-ip", "x-forwarded-for", "forwarded")
+
+
 def require_local(request: Request) -> None:
     host = request.client.host if request.client else ""
-    if host not in {"127.0.0.1", "::1"}:
+    proxied = any(name in request.headers for name in PROXY_HEADERS)
+    if host not in {"127.0.0.1", "::1"} or proxied:
         raise HTTPException(status_code=403, detail="local_only")
 
 
@@ -103,9 +132,28 @@ def _register_read_routes(app: FastAPI, state_store: StateStore) -> None:
     async def health() -> dict[str, Any]:
         return {"status": "ok", "timestamp_ms": int(time.time() * 1000)}
 
-    @app.get("/api/v1/status")
-    async def status() -> StatusSnapshot:
-        return await state_store.snapshot()
+    @app.get("/api/v1/status", response_model=StatusSnapshot)
+    async def status() -> Response:
+        snapshot = await state_store.snapshot()
+        return Response(content=snapshot.model_dump_json(), media_type="application/json")
+
+    @app.get("/api/v1/status/changes")
+    async def status_changes(
+        since: int = Query(0, ge=0),
+        timeout_ms: int = Query(25000, ge=0, le=STATUS_CHANGES_MAX_TIMEOUT_MS),
+        sections: str | None = None,
+    ) -> dict[str, Any]:
+        names = [name for name in sections.split(",") if name] if sections else None
+        try:
+            await state_store.wait_for_change(since, timeout_ms / 1000, names)
+            version, changed = await state_store.changes_since(since, names)
+        except KeyError as exc:
+            raise HTTPException(status_code=400, detail="unknown_section") from exc
+        return {
+            "version": version,
+            "timestamp_ms": int(time.time() * 1000),
+            "sections": changed,
+        }
 
     @app.get("/api/v1/contacts")
     async def contacts() -> dict[str, Any]:
@@ -163,6 +211,83 @@ def _register_read_routes(app: FastAPI, state_store: StateStore) -> None:
         return snapshot.audio
 
 
+def _register_history_routes(app: FastAPI, history: HistoryStore) -> None:
+    @app.get("/api/v1/history/{section}/{field}")
+    async def history_series(
+        section: str,
+        field: str,
+        start_ms: int | None = Query(None, alias="from", ge=0),
+        end_ms: int | None = Query(None, alias="to", ge=0),
+        step: int | None = Query(None, ge=1),
+    ) -> dict[str, Any]:
+        end = end_ms if end_ms is not None else int(time.time() * 1000)
+        start = start_ms if start_ms is not None else end - HISTORY_DEFAULT_WINDOW_MS
+        try:
+            return history.query(f"{section}.{field}", start, end, step)
+        except KeyError as exc:
+            raise HTTPException(status_code=404, detail="history_field_not_tracked") from exc
+
+
+def _register_journal_routes(app: FastAPI, journal: EventJournal) -> None:
+    @app.get("/api/v1/journal")
+    async def journal_events(
+        start_ms: int | None = Query(None, alias="from", ge=0),
+        end_ms: int | None = Query(None, alias="to", ge=0),
+        limit: int = Query(1000, ge=1, le=JOURNAL_MAX_LIMIT),
+        types: str | None = None,
+    ) -> dict[str, Any]:
+        if not journal.enabled:
+            raise HTTPException(status_code=404, detail="journal_disabled")
+        end = end_ms if end_ms is not None else int(time.time() * 1000)
+        start = start_ms if start_ms is not None else end - HISTORY_DEFAULT_WINDOW_MS
+        wanted = frozenset(name for name in types.split(",") if name) if types else None
+        events = await journal.read_range(start, end, limit, wanted)
+        return {"from": start, "to": end, "events": events}
+
+
+def _register_event_stream_routes(app: FastAPI, event_bus: EventBus) -> None:
+    @app.get("/api/v1/events")
+    async def event_stream_endpoint(
+        request: Request,
+        types: str | None = None,
+        sources: str | None = None,
+        last_event_id: str | None = None,
+    ) -> StreamingResponse:
+        # EventSource sends Last-Event-ID on reconnect; the query parameter
+        # lets a first connection resume too.
+        resume = request.headers.get("last-event-id") or last_event_id or ""
+        stream = event_stream(
+            event_bus,
+            types=frozenset(name for name in types.split(",") if name) if types else None,
+            sources=frozenset(name for name in sources.split(",") if name) if sources else None,
+            last_event_id=int(resume) if resume.isdigit() else None,
+        )
+        return StreamingResponse(
+            stream,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+
+def _register_metrics_routes(
+    app: FastAPI,
+    event_bus: EventBus,
+    ws_manager: WebSocketManager,
+) -> None:
+    @app.get("/api/v1/metrics/bus")
+    async def bus_metrics() -> dict[str, Any]:
+        return {"timestamp_ms": int(time.time() * 1000), **event_bus.stats()}
+
+    @app.get("/api/v1/metrics/ws")
+    async def ws_metrics() -> dict[str, Any]:
+        return {"timestamp_ms": int(time.time() * 1000), **ws_manager.stats()}
+
+    @app.get("/api/v1/ws/clients")
+    async def ws_clients(request: Request) -> dict[str, Any]:
+        require_local(request)
+        return {"timestamp_ms": int(time.time() * 1000), "clients": ws_manager.clients()}
+
+
 def _register_command_routes(app: FastAPI, config, command_router: CommandRouter) -> None:
     async def dispatch_command(
         command: str,
@@ -696,52 +821,103 @@ def _register_ws_routes(app: FastAPI, ws_manager: WebSocketManager) -> None:
         if not origin_allowed(websocket.headers.get("origin")):
             await websocket.close(code=1008)
             return
-        await ws_manager.connect(websocket)
-        heartbeat_task: asyncio.Task[None] | None = None
+        state_patches = websocket.query_params.get("state_patches", "").lower() in {"1", "true"}
+        resume_param = websocket.query_params.get("resume_from", "")
+        resume_from = int(resume_param) if resume_param.isdigit() else None
+        wants_sync = websocket.query_params.get("sync", "").lower() in {"1", "true"}
+        subprotocol = ws_codecs.negotiate(websocket.scope.get("subprotocols", ()))
+        if not await ws_manager.connect(websocket, subprotocol=subprotocol):
+            return
         try:
-            now_ms = int(time.time() * 1000)
-            hello = EventEnvelope(
-                type="HELLO",
-                timestamp_ms=now_ms,
-                source="aggregator",
-                data={"timestamp_ms": now_ms},
+            encoding = ws_codecs.encoding_for(subprotocol)
+            sync = await _receive_sync(websocket, encoding) if wants_sync else None
+            await ws_manager.send_preamble(
+                websocket,
+                state_patches=state_patches,
+                resume_from=resume_from,
+                sync=sync,
             )
-            await websocket.send_json(hello.model_dump())
-            await ws_manager.send_system_update(websocket)
-
-            async def heartbeat_loop() -> None:
-                while True:
-                    ts = int(time.time() * 1000)
-                    envelope = EventEnvelope(
-                        type="HEARTBEAT",
-                        timestamp_ms=ts,
-                        source="aggregator",
-                        data={"timestamp_ms": ts},
-                    )
-                    await websocket.send_json(envelope.model_dump())
-                    await asyncio.sleep(2)
-
-            heartbeat_task = asyncio.create_task(heartbeat_loop())
             while True:
-                await websocket.receive_text()
+                await ws_manager.handle_control(websocket, await _receive_frame(websocket))
         except WebSocketDisconnect:
             pass
         finally:
-            if heartbeat_task:
-                heartbeat_task.cancel()
-                with suppress(asyncio.CancelledError):
-                    await heartbeat_task
             await ws_manager.disconnect(websocket)
 
 
+async def _receive_frame(websocket: WebSocket) -> str | bytes:
+    """Next client frame as text or bytes; binary encodings send binary frames."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    text = message.get("text")
+    return text if text is not None else message.get("bytes") or b""
+
+
+async def _receive_sync(websocket: WebSocket, encoding: str) -> WsSyncMessage | None:
+    """Read the client's sync message; None (full snapshot) if absent or invalid."""
+    try:
+        frame = await asyncio.wait_for(_receive_frame(websocket), WS_SYNC_TIMEOUT_S)
+        return parse_client_frame(WsSyncMessage, encoding, frame)
+    except (TimeoutError, ValueError):
+        return None
+
+
 async def _forward_events(event_bus: EventBus, ws_manager: WebSocketManager) -> None:
-    queue = await event_bus.subscribe()
+    subscription = await event_bus.subscribe(name="ws_forwarder", conflate=True)
     try:
         while True:
-            event = await queue.get()
-            await ws_manager.broadcast(event.model_dump())
+            event = await subscription.get()
+            await ws_manager.broadcast(event)
     finally:
-        await event_bus.unsubscribe(queue)
+        await event_bus.unsubscribe(subscription)
+
+
+def _canonical_state(raw: dict[str, Any]) -> dict[str, Any]:
+    filled = fill_status_snapshot(raw)
+    filled.pop("timestamp_ms", None)
+    return filled
+
+
+async def _stream_state_patches(state_store: StateStore, ws_manager: WebSocketManager) -> None:
+    """Broadcast a STATE_PATCH per state commit that changes the snapshot.
+
+    ``base_version`` is the version of the last emitted patch: commits in
+    between left the snapshot unchanged, so a client at any version from
+    ``base_version`` up to ``version - 1`` can apply the patch. While no
+    client wants patches the diff is skipped and rebuilt on demand.
+    """
+    queue = state_store.subscribe_changes()
+    try:
+        version, raw = await state_store.versioned_state()
+        previous: dict[str, Any] | None = None
+        emitted = version
+        while True:
+            change = await queue.get()
+            if change.version <= version:
+                continue
+            if not ws_manager.wants_state_patches():
+                raw.update(change.sections)
+                version, previous = change.version, None
+                continue
+            if previous is None:
+                previous, emitted = _canonical_state(raw), version
+            raw.update(change.sections)
+            current = _canonical_state(raw)
+            ops = make_patch(previous, current)
+            version, previous = change.version, current
+            if not ops:
+                continue
+            envelope = EventEnvelope(
+                type="STATE_PATCH",
+                timestamp_ms=change.timestamp_ms,
+                source="aggregator",
+                data={"base_version": emitted, "version": version, "patch": ops},
+            )
+            emitted = version
+            await ws_manager.broadcast_state_patch(version, envelope)
+    finally:
+        state_store.unsubscribe_changes(queue)
 
 
 def _register_routes(
@@ -763,8 +939,26 @@ def create_app() -> FastAPI:
 
     state_store = StateStore()
     event_bus = EventBus()
-    ws_manager = WebSocketManager(state_store)
+    ws_manager = WebSocketManager(
+        state_store,
+        event_bus,
+        send_queue_size=config.websocket.send_queue_size,
+        slow_consumer_policy=config.websocket.slow_consumer_policy,
+        conflate_types=config.websocket.conflate_types,
+        conflate_max_hz=config.websocket.conflate_max_hz,
+        heartbeat_interval_s=config.websocket.heartbeat_interval_s,
+        heartbeat_timeout_s=config.websocket.heartbeat_timeout_s,
+        admission=AdmissionControl(
+            max_connections=config.websocket.max_connections,
+            max_connections_per_ip=config.websocket.max_connections_per_ip,
+            connect_rate_per_s=config.websocket.connect_rate_per_s,
+            connect_burst=config.websocket.connect_burst,
+        ),
+    )
     contact_store = ContactStore(state_store)
+    checkpointer = StateCheckpointer(config.checkpoint, state_store, contact_store)
+    history = HistoryStore(config.history, state_store)
+    journal = EventJournal(config.journal, event_bus)
     orchestrator = build_default_orchestrator(config, state_store, event_bus, contact_store)
     command_router = CommandRouter()
     esp32_ingestor = next(
@@ -777,13 +971,22 @@ def create_app() -> FastAPI:
 
     @asynccontextmanager
     async def lifespan(app: FastAPI):
+        await checkpointer.load()
+        await journal.start()
         await orchestrator.start()
+        await checkpointer.start()
+        await history.start()
+        await ws_manager.start()
         forward_task = asyncio.create_task(_forward_events(event_bus, ws_manager))
+        patch_task = asyncio.create_task(_stream_state_patches(state_store, ws_manager))
         yield
-        forward_task.cancel()
-        with suppress(asyncio.CancelledError):
-            await forward_task
-        await orchestrator.stop()
+        for task in (forward_task, patch_task):
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        # Consumers stop first; the journal after the producers so it drains them.
+        for component in (ws_manager, history, orchestrator, journal, checkpointer):
+            await component.stop()
         clients = list(app.state.http_clients.values())
         for client in clients:
             await client.aclose()
@@ -809,6 +1012,9 @@ def create_app() -> FastAPI:
     app.state.ws_manager = ws_manager
     app.state.runtime = orchestrator
     app.state.contact_store = contact_store
+    app.state.checkpointer = checkpointer
+    app.state.history = history
+    app.state.journal = journal
     app.state.command_router = command_router
     app.state.http_clients = {
         "system": httpx.AsyncClient(
@@ -826,6 +1032,10 @@ def create_app() -> FastAPI:
     }
 
     _register_routes(app, state_store, ws_manager, config, command_router)
+    _register_history_routes(app, history)
+    _register_journal_routes(app, journal)
+    _register_event_stream_routes(app, event_bus)
+    _register_metrics_routes(app, event_bus, ws_manager)
     return app
 
 
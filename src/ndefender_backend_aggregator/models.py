@@ -2,9 +2,11 @@
 
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, Literal
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
+
+from . import ws_codecs
 
 
 class StatusSnapshot(BaseModel):
@@ -36,3 +38,52 @@ class EventEnvelope(BaseModel):
     timestamp_ms: int = Field(ge=0)
     source: str
     data: dict[str, Any]
+    seq: int | None = None
+
+    _encoded: tuple[int | None, str] | None = PrivateAttr(default=None)
+    _frames: dict[str, tuple[int | None, bytes]] = PrivateAttr(default_factory=dict)
+
+    def encoded(self) -> str:
+        """Compact JSON text, serialized once and shared by every consumer.
+
+        The cache is keyed by ``seq`` because the bus assigns it at publish.
+        """
+        cached = self._encoded
+        if cached is None or cached[0] != self.seq:
+            cached = (self.seq, self.model_dump_json())
+            self._encoded = cached
+        return cached[1]
+
+    def encoded_frame(self, encoding: str = ws_codecs.JSON) -> str | bytes:
+        """This envelope as a WebSocket frame payload, cached per encoding."""
+        if encoding == ws_codecs.JSON:
+            return self.encoded()
+        cached = self._frames.get(encoding)
+        if cached is None or cached[0] != self.seq:
+            cached = (self.seq, ws_codecs.encode(encoding, self.model_dump(mode="json")))
+            self._frames[encoding] = cached
+        return cached[1]
+
+
+class WsControlMessage(BaseModel):
+    """Client-to-server message on the WebSocket control channel."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    action: Literal["subscribe", "unsubscribe", "reset", "throttle", "pong"]
+    id: str | int | None = None
+    types: list[str] = Field(default_factory=list)
+    sources: list[str] = Field(default_factory=list)
+    contact_types: list[str] = Field(default_factory=list)
+    max_hz: float | None = Field(default=None, ge=0)
+
+
+class WsSyncMessage(BaseModel):
+    """First client message on a ``?sync=1`` WebSocket: what the client already has."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    action: Literal["sync"]
+    state_version: int | None = None
+    section_hashes: dict[str, str] = Field(default_factory=dict)
+    contact_revs: dict[str, str] = Field(default_factory=dict)
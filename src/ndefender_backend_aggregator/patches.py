@@ -0,0 +1,87 @@
+"""Minimal RFC 6902 JSON Patch generation and application."""
+
+from __future__ import annotations
+
+import copy
+from typing import Any
+
+
+def escape_pointer_token(token: Any) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape_pointer_token(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(old: Any, new: Any, path: str = "") -> list[dict[str, Any]]:
+    """Return the operations that turn ``old`` into ``new``.
+
+    Mappings are diffed key by key and lists index by index, so a single
+    changed field yields a single ``replace``. Only ``add``, ``remove`` and
+    ``replace`` are emitted.
+    """
+    ops: list[dict[str, Any]] = []
+    _diff(old, new, path, ops)
+    return ops
+
+
+def _diff(old: Any, new: Any, path: str, ops: list[dict[str, Any]]) -> None:
+    if type(old) is type(new) and old == new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{escape_pointer_token(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{escape_pointer_token(key)}"
+            if key in old:
+                _diff(old[key], value, child, ops)
+            else:
+                ops.append({"op": "add", "path": child, "value": value})
+        return
+    if isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        for index in range(common):
+            _diff(old[index], new[index], f"{path}/{index}", ops)
+        for index in range(common, len(new)):
+            ops.append({"op": "add", "path": f"{path}/{index}", "value": new[index]})
+        for index in reversed(range(common, len(old))):
+            ops.append({"op": "remove", "path": f"{path}/{index}"})
+        return
+    ops.append({"op": "replace", "path": path, "value": new})
+
+
+def apply_patch(document: Any, ops: list[dict[str, Any]]) -> Any:
+    """Apply ``add``/``remove``/``replace`` operations to a copy of ``document``."""
+    result = copy.deepcopy(document)
+    for op in ops:
+        path = op["path"]
+        if path == "":
+            if op["op"] == "remove":
+                raise ValueError("cannot remove the document root")
+            result = copy.deepcopy(op["value"])
+            continue
+        tokens = [_unescape_pointer_token(token) for token in path.split("/")[1:]]
+        parent = result
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+        kind = op["op"]
+        if isinstance(parent, list):
+            index = len(parent) if last == "-" else int(last)
+            if kind == "add":
+                parent.insert(index, copy.deepcopy(op["value"]))
+            elif kind == "remove":
+                del parent[index]
+            elif kind == "replace":
+                parent[index] = copy.deepcopy(op["value"])
+            else:
+                raise ValueError(f"Unsupported patch op: {kind}")
+        elif kind in {"add", "replace"}:
+            parent[last] = copy.deepcopy(op["value"])
+        elif kind == "remove":
+            del parent[last]
+        else:
+            raise ValueError(f"Unsupported patch op: {kind}")
+    return result
@@ -30,6 +30,32 @@ class RateLimiter:
             bucket.append(now)
 
 
+class TokenBucket:
+    """Allow bursts of ``burst`` and a sustained ``rate_per_s``."""
+
+    def __init__(self, rate_per_s: float, burst: int) -> None:
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def try_acquire(self, now: float | None = None) -> bool:
+        self.refill(time.monotonic() if now is None else now)
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(float(self.burst), self.tokens + elapsed * self.rate_per_s)
+        self.updated = now
+
+    def full(self, now: float) -> bool:
+        self.refill(now)
+        return self.tokens >= self.burst
+
+
 _rate_limiter = RateLimiter()
 
 
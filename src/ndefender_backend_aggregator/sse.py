@@ -0,0 +1,63 @@
+"""Server-Sent Events stream of bus events for read-only consumers."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+
+from .bus import EventBus
+from .models import EventEnvelope
+from .ws import resync_required
+
+# Comment frames keep proxies and the Cloudflare tunnel from closing idle streams.
+SSE_KEEPALIVE_S = 15.0
+# Reconnect delay suggested to EventSource clients.
+SSE_RETRY_MS = 2000
+
+
+def format_event(envelope: EventEnvelope) -> str:
+    """One SSE frame; ``data`` is the envelope's shared, cached JSON encoding."""
+    if envelope.seq is None:
+        return f"event: {envelope.type}\ndata: {envelope.encoded()}\n\n"
+    return f"id: {envelope.seq}\nevent: {envelope.type}\ndata: {envelope.encoded()}\n\n"
+
+
+async def event_stream(
+    event_bus: EventBus,
+    types: frozenset[str] | None = None,
+    sources: frozenset[str] | None = None,
+    last_event_id: int | None = None,
+    keepalive_s: float = SSE_KEEPALIVE_S,
+) -> AsyncIterator[str]:
+    """Yield SSE frames for matching bus events, resuming after ``last_event_id``.
+
+    The stream reads its own bus subscription, so filtering and conflation of
+    low-priority events happen in the bus exactly as for the WebSocket
+    forwarder. If the resume point is no longer retained, a single
+    ``RESYNC_REQUIRED`` frame is sent and live delivery continues.
+    """
+    subscription = await event_bus.subscribe(
+        types=types,
+        sources=sources,
+        name="sse",
+        conflate=True,
+    )
+    # Taken before the first yield, so the replay ends exactly where the
+    # subscription begins.
+    replay = event_bus.events_since(last_event_id) if last_event_id is not None else []
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        if replay is None and last_event_id is not None:
+            yield format_event(resync_required(event_bus, last_event_id))
+        for event in replay or ():
+            if subscription.matches(event):
+                yield format_event(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), keepalive_s)
+            except TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_event(event)
+    finally:
+        await event_bus.unsubscribe(subscription)
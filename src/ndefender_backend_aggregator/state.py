@@ -4,18 +4,98 @@ from __future__ import annotations
 
 import asyncio
 import copy
+import hashlib
+import json
+import os
 import time
+from collections.abc import AsyncIterator, Callable, Iterable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from typing import Any
 
 from .models import StatusSnapshot
 from .status_schema import fill_status_snapshot
 
+_UPDATE = "update"
+_PATCH = "patch"
+_MODIFY = "modify"
+
+# Sections whose filled value is derived from other sections by fill_status_snapshot.
+_DERIVED_SECTIONS: dict[str, tuple[str, ...]] = {"vrx": ("fpv",)}
+# Diffed per contact by StateDigest.contact_revs rather than hashed whole.
+CONTACTS_SECTION = "contacts"
+
+
+def content_hash(value: Any) -> str:
+    """Short stable hash of a JSON-compatible value, independent of key order."""
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=8).hexdigest()
+
+
+@dataclass(frozen=True)
+class StateChange:
+    """Sections written by one commit, keyed by name.
+
+    Section values are shared with the store and must be treated as read-only.
+    """
+
+    version: int
+    timestamp_ms: int
+    sections: dict[str, Any]
+
+
+@dataclass(frozen=True)
+class StateDigest:
+    """Filled state at ``version`` with a hash per section and per contact.
+
+    ``section_hashes`` covers every section except contacts, which are keyed
+    by id in ``contact_revs`` so they can be diffed one by one.
+    """
+
+    version: int
+    snapshot: dict[str, Any]
+    section_hashes: dict[str, str]
+    contact_revs: dict[str, str]
+
+
+class StateTransaction:
+    """Writes staged against a StateStore and committed together."""
+
+    def __init__(self, store: StateStore) -> None:
+        self._store = store
+        self._ops: list[tuple[str, str, Any]] = []
+
+    def update_section(self, name: str, data: Any) -> None:
+        self._stage(_UPDATE, name, data)
+
+    def patch_section(self, name: str, fields: dict[str, Any]) -> None:
+        self._stage(_PATCH, name, fields)
+
+    def modify_section(self, name: str, fn: Callable[[Any], Any]) -> None:
+        self._stage(_MODIFY, name, fn)
+
+    def _stage(self, op: str, name: str, arg: Any) -> None:
+        self._store._check_section(name)
+        self._ops.append((op, name, arg))
+
+
+def strict_validation_enabled() -> bool:
+    """Whether snapshots are re-validated (``NDEFENDER_STRICT_STATE=1``)."""
+    return os.getenv("NDEFENDER_STRICT_STATE", "").lower() in {"1", "true", "yes"}
+
 
 class StateStore:
     """Thread-safe state container for subsystem snapshots."""
 
-    def __init__(self) -> None:
+    def __init__(self, strict_validation: bool | None = None) -> None:
+        if strict_validation is None:
+            strict_validation = strict_validation_enabled()
+        self._strict_validation = strict_validation
         self._lock = asyncio.Lock()
+        self._version = 0
+        self._listeners: dict[asyncio.Queue[StateChange], frozenset[str] | None] = {}
+        self._dirty_flags: set[asyncio.Event] = set()
+        self._waiters: dict[str | None, asyncio.Future[None]] = {}
         self._state: dict[str, Any] = fill_status_snapshot(
             {
                 "timestamp_ms": int(time.time() * 1000),
@@ -36,16 +116,262 @@ class StateStore:
                 "replay": {"active": False, "source": "none"},
             }
         )
+        self._section_versions: dict[str, int] = {
+            name: 0 for name in self._state if name not in {"timestamp_ms", "overall_ok"}
+        }
+        # Hashes are recomputed only when their section version moves.
+        self._section_hashes: dict[str, tuple[int, str]] = {}
+        self._contact_revs: tuple[int, dict[str, str]] | None = None
 
-    async def update_section(self, name: str, data: dict[str, Any]) -> None:
-        async with self._lock:
-            if name not in self._state:
-                raise KeyError(f"Unknown state section: {name}")
-            self._state[name] = data
+    @property
+    def version(self) -> int:
+        """Monotonic counter bumped once per committed write."""
+        return self._version
+
+    async def update_section(self, name: str, data: Any) -> None:
+        self._check_section(name)
+        await self._commit([(_UPDATE, name, data)])
+
+    async def patch_section(self, name: str, fields: dict[str, Any]) -> None:
+        """Merge ``fields`` into a mapping section without touching other keys."""
+        self._check_section(name)
+        await self._commit([(_PATCH, name, fields)])
+
+    async def modify_section(self, name: str, fn: Callable[[Any], Any]) -> None:
+        """Replace a section with ``fn(current)`` atomically.
+
+        ``fn`` receives a deep copy of the current section, so it may mutate it
+        in place and return it. It must be synchronous: it runs under the lock.
+        """
+        self._check_section(name)
+        await self._commit([(_MODIFY, name, fn)])
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[StateTransaction]:
+        """Stage writes to several sections and commit them as one version.
+
+        Nothing is applied if the block raises or if any staged write fails.
+        """
+        txn = StateTransaction(self)
+        yield txn
+        if txn._ops:
+            await self._commit(txn._ops)
 
     async def snapshot(self) -> StatusSnapshot:
+        _, snapshot = await self.versioned_snapshot()
+        return snapshot
+
+    async def versioned_snapshot(self) -> tuple[int, StatusSnapshot]:
+        """Return the filled snapshot and the version it was taken at.
+
+        Sections are always replaced on write, never mutated in place, so a
+        shallow copy is a consistent view; nested values are shared with the
+        store and must be treated as read-only.
+        """
         async with self._lock:
-            snapshot = copy.deepcopy(self._state)
+            version, snapshot = self._version, dict(self._state)
         snapshot["timestamp_ms"] = int(time.time() * 1000)
         filled = fill_status_snapshot(snapshot)
-        return StatusSnapshot.model_validate(filled)
+        if self._strict_validation:
+            return version, StatusSnapshot.model_validate(filled)
+        # The state is produced internally and filled to the schema already, so
+        # the read path skips validation; strict mode (tests, debugging) keeps it.
+        return version, StatusSnapshot.model_construct(**filled)
+
+    async def versioned_state(self) -> tuple[int, dict[str, Any]]:
+        """Return a private copy of the raw (unfilled) state and its version."""
+        async with self._lock:
+            return self._version, copy.deepcopy(self._state)
+
+    async def digest(self) -> StateDigest:
+        """Return the filled state with per-section hashes and per-contact revisions."""
+        async with self._lock:
+            version, raw = self._version, dict(self._state)
+            section_versions = dict(self._section_versions)
+        raw["timestamp_ms"] = int(time.time() * 1000)
+        filled = fill_status_snapshot(raw)
+        hashes: dict[str, str] = {}
+        for name, section_version in section_versions.items():
+            if name == CONTACTS_SECTION:
+                continue
+            cached = self._section_hashes.get(name)
+            if cached is None or cached[0] != section_version:
+                cached = (section_version, content_hash(filled[name]))
+                self._section_hashes[name] = cached
+            hashes[name] = cached[1]
+        revs = self._contact_revs
+        contacts_version = section_versions[CONTACTS_SECTION]
+        if revs is None or revs[0] != contacts_version:
+            revs = (
+                contacts_version,
+                {
+                    str(contact.get("id")): content_hash(contact)
+                    for contact in filled[CONTACTS_SECTION]
+                    if isinstance(contact, dict)
+                },
+            )
+            self._contact_revs = revs
+        return StateDigest(version, filled, hashes, dict(revs[1]))
+
+    def section_versions(self) -> dict[str, int]:
+        """Version of the last commit that changed each section."""
+        return dict(self._section_versions)
+
+    async def wait_for_change(
+        self,
+        since: int,
+        timeout_s: float,
+        sections: Iterable[str] | None = None,
+    ) -> bool:
+        """Wait until a section (any if None) changes after version ``since``.
+
+        Waiters park on one shared future per section, so a commit only wakes
+        the waiters interested in the sections it touched.
+        """
+        names = self._resolve_sections(sections)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.0, timeout_s)
+        while True:
+            if self._changed_since(since, names):
+                return True
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            keys: list[str | None] = [None] if names is None else list(names)
+            futures = [self._waiter(key) for key in keys]
+            await asyncio.wait(futures, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+
+    async def changes_since(
+        self,
+        since: int,
+        sections: Iterable[str] | None = None,
+    ) -> tuple[int, dict[str, Any]]:
+        """Return the current version and the filled snapshot trimmed to the
+        sections changed after ``since``.
+
+        ``since=0``, or a ``since`` ahead of the store (for example after a
+        restart), returns every requested section.
+        """
+        names = self._resolve_sections(sections)
+        async with self._lock:
+            version = self._version
+            wanted = names if names is not None else frozenset(self._section_versions)
+            resync = since <= 0 or since > version
+            changed = [name for name in wanted if resync or self._section_versions[name] > since]
+            raw = dict(self._state) if changed else None
+        if raw is None:
+            return version, {}
+        raw["timestamp_ms"] = int(time.time() * 1000)
+        filled = fill_status_snapshot(raw)
+        return version, {name: filled[name] for name in sorted(changed)}
+
+    def subscribe_changes(
+        self,
+        sections: Iterable[str] | None = None,
+    ) -> asyncio.Queue[StateChange]:
+        """Receive a StateChange per commit touching ``sections`` (all if None).
+
+        Changes are filtered down to the requested sections. The queue is
+        unbounded, so consumers must keep up.
+        """
+        wanted: frozenset[str] | None = None
+        if sections is not None:
+            wanted = frozenset(sections)
+            for name in wanted:
+                self._check_section(name)
+        queue: asyncio.Queue[StateChange] = asyncio.Queue()
+        self._listeners[queue] = wanted
+        return queue
+
+    def unsubscribe_changes(self, queue: asyncio.Queue[StateChange]) -> None:
+        self._listeners.pop(queue, None)
+
+    def subscribe_dirty(self) -> asyncio.Event:
+        """Return an Event set by every commit; the consumer clears it.
+
+        Unlike ``subscribe_changes`` nothing accumulates while the consumer
+        is busy, which suits periodic writers that only need "changed".
+        """
+        flag = asyncio.Event()
+        self._dirty_flags.add(flag)
+        return flag
+
+    def unsubscribe_dirty(self, flag: asyncio.Event) -> None:
+        self._dirty_flags.discard(flag)
+
+    async def _commit(self, ops: list[tuple[str, str, Any]]) -> None:
+        async with self._lock:
+            staged: dict[str, Any] = {}
+            for op, name, arg in ops:
+                current = staged[name] if name in staged else self._state[name]
+                staged[name] = self._apply(op, name, current, arg)
+            self._state.update(staged)
+            self._version += 1
+            self._bump_sections(staged)
+            self._notify(self._version, staged)
+
+    def _bump_sections(self, staged: dict[str, Any]) -> None:
+        touched = set(staged)
+        for name in staged:
+            touched.update(_DERIVED_SECTIONS.get(name, ()))
+        for name in touched:
+            self._section_versions[name] = self._version
+            self._wake(name)
+        self._wake(None)
+
+    def _wake(self, key: str | None) -> None:
+        future = self._waiters.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    def _waiter(self, key: str | None) -> asyncio.Future[None]:
+        future = self._waiters.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters[key] = future
+        return future
+
+    def _changed_since(self, since: int, names: frozenset[str] | None) -> bool:
+        if since <= 0 or since > self._version:
+            return True
+        if names is None:
+            return self._version > since
+        return any(self._section_versions[name] > since for name in names)
+
+    def _resolve_sections(self, sections: Iterable[str] | None) -> frozenset[str] | None:
+        if sections is None:
+            return None
+        names = frozenset(sections)
+        for name in names:
+            if name not in self._section_versions:
+                raise KeyError(f"Unknown state section: {name}")
+        return names
+
+    def _notify(self, version: int, staged: dict[str, Any]) -> None:
+        for flag in self._dirty_flags:
+            flag.set()
+        if not self._listeners:
+            return
+        timestamp_ms = int(time.time() * 1000)
+        full = StateChange(version=version, timestamp_ms=timestamp_ms, sections=staged)
+        for queue, wanted in self._listeners.items():
+            if wanted is None:
+                queue.put_nowait(full)
+                continue
+            sections = {name: value for name, value in staged.items() if name in wanted}
+            if sections:
+                queue.put_nowait(StateChange(version, timestamp_ms, sections))
+
+    @staticmethod
+    def _apply(op: str, name: str, current: Any, arg: Any) -> Any:
+        if op == _UPDATE:
+            return arg
+        if op == _PATCH:
+            if not isinstance(current, dict):
+                raise TypeError(f"State section is not a mapping: {name}")
+            return {**current, **arg}
+        return arg(copy.deepcopy(current))
+
+    def _check_section(self, name: str) -> None:
+        if name not in self._state:
+            raise KeyError(f"Unknown state section: {name}")
@@ -224,6 +224,13 @@ def fill_status_snapshot(snapshot: dict[str, Any]) -> dict[str, Any]:
     return filled
 
 
+def derive_fpv(vrx: Any, fpv: Any = None) -> dict[str, Any]:
+    """Fill the fpv section from raw vrx/fpv sections, as fill_status_snapshot does."""
+    snapshot = {"vrx": vrx, "fpv": _merge_section(fpv, _default_fpv())}
+    _mirror_vrx_to_fpv(snapshot)
+    return snapshot["fpv"]
+
+
 def _mirror_vrx_to_fpv(snapshot: dict[str, Any]) -> None:
     vrx = snapshot.get("vrx")
     fpv = snapshot.get("fpv")
@@ -3,41 +3,989 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any
+import logging
+import time
+from collections import deque
+from collections.abc import Iterable
+from contextlib import suppress
+from typing import Any, TypeVar
 
 from fastapi import WebSocket
+from pydantic import BaseModel, ValidationError
 
-from .models import EventEnvelope
-from .state import StateStore
+from . import ws_codecs
+from .bus import HIGH_PRIORITY_TYPES, PRIORITY_HIGH, PRIORITY_LOW, EventBus, event_priority
+from .models import EventEnvelope, StatusSnapshot, WsControlMessage, WsSyncMessage
+from .rate_limit import TokenBucket
+from .state import CONTACTS_SECTION, StateDigest, StateStore
+
+LOGGER = logging.getLogger(__name__)
+
+SLOW_CONSUMER_POLICIES = ("conflate", "drop", "disconnect")
+# RFC 6455 "Try Again Later": the server shed this client under load.
+CLOSE_SLOW_CONSUMER = 1013
+# Application close code for a client that stopped answering heartbeats.
+CLOSE_HEARTBEAT_TIMEOUT = 4408
+# Connection refused at admission: over capacity (retry later) or connecting
+# too fast (application code mirroring HTTP 429).
+CLOSE_OVER_CAPACITY = 1013
+CLOSE_RATE_LIMITED = 4429
+# Idle per-address connect buckets are pruned beyond this many entries.
+ADMISSION_BUCKETS_SIZE = 4096
+LOOPBACK_HOSTS = frozenset({"127.0.0.1", "::1"})
+
+_ModelT = TypeVar("_ModelT", bound=BaseModel)
+# Contact type carried by each contact event, for ``contact_types`` filters.
+CONTACT_EVENT_TYPES = {
+    "CONTACT_NEW": "REMOTE_ID",
+    "CONTACT_UPDATE": "REMOTE_ID",
+    "CONTACT_LOST": "REMOTE_ID",
+    "RF_CONTACT_NEW": "RF",
+    "RF_CONTACT_UPDATE": "RF",
+    "RF_CONTACT_LOST": "RF",
+}
+# Bounds the per-connection decision cache against unbounded source names.
+FILTER_CACHE_SIZE = 1024
+# Per-key send times kept by a throttle before expired ones are pruned.
+THROTTLE_KEYS_SIZE = 1024
+# A cached preamble snapshot is reused for this long while the state version
+# is unchanged, so a reconnect storm shares one build without clients
+# receiving a stale ``timestamp_ms``.
+SNAPSHOT_CACHE_MAX_AGE_S = 1.0
+
+ThrottleKey = tuple[str, str, Any]
+
+
+def resync_required(bus: EventBus, resume_from: int) -> EventEnvelope:
+    """Tell a resuming client that events after ``resume_from`` are gone."""
+    return EventEnvelope(
+        type="RESYNC_REQUIRED",
+        timestamp_ms=int(time.time() * 1000),
+        source="aggregator",
+        data={
+            "resume_from": resume_from,
+            "oldest_seq": bus.replay_floor + 1,
+            "latest_seq": bus.head,
+        },
+    )
+
+
+def client_host(websocket: WebSocket) -> str:
+    """Remote address; behind the local Cloudflare tunnel, the visitor's address."""
+    peer = websocket.client.host if websocket.client else "unknown"
+    if peer in LOOPBACK_HOSTS:
+        forwarded = websocket.headers.get("cf-connecting-ip")
+        if forwarded:
+            return forwarded
+    return peer
+
+
+def parse_client_frame(model: type[_ModelT], encoding: str, data: str | bytes) -> _ModelT:
+    """Validate a client frame: JSON text, or bytes in the negotiated encoding.
+
+    Binary frames on a JSON connection are read as UTF-8 JSON. Raises
+    ValueError (including pydantic's ValidationError) for bad input.
+    """
+    if isinstance(data, str) or encoding == ws_codecs.JSON:
+        return model.model_validate_json(data)
+    return model.model_validate(ws_codecs.decode(encoding, data))
+
+
+class AdmissionControl:
+    """Connection caps and a per-address connect rate for WebSocket clients.
+
+    ``max_connections`` and ``max_connections_per_ip`` bound open sockets
+    and ``connect_rate_per_s``/``connect_burst`` bound how fast one address
+    may (re)connect; 0 disables each limit. ``check`` reserves the slots
+    without awaiting, so concurrent handshakes cannot overshoot the caps;
+    every admitted client must be ``release``d. Rejections are counted by
+    reason.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 0,
+        max_connections_per_ip: int = 0,
+        connect_rate_per_s: float = 0.0,
+        connect_burst: int = 1,
+    ) -> None:
+        self.max_connections = max_connections
+        self.max_connections_per_ip = max_connections_per_ip
+        self.connect_rate_per_s = connect_rate_per_s
+        self.connect_burst = max(1, connect_burst)
+        self.open = 0
+        self.per_ip: dict[str, int] = {}
+        self.rejected = {"server_full": 0, "ip_limit": 0, "rate_limited": 0}
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def check(self, host: str) -> str | None:
+        """Admit ``host`` and reserve its slots, or return the rejection reason."""
+        reason = None
+        # Rate last: a client turned away for capacity keeps its tokens.
+        if self.max_connections and self.open >= self.max_connections:
+            reason = "server_full"
+        elif self.max_connections_per_ip and (
+            self.per_ip.get(host, 0) >= self.max_connections_per_ip
+        ):
+            reason = "ip_limit"
+        elif self.connect_rate_per_s > 0 and not self._bucket(host).try_acquire():
+            reason = "rate_limited"
+        if reason is not None:
+            self.rejected[reason] += 1
+            return reason
+        self.open += 1
+        self.per_ip[host] = self.per_ip.get(host, 0) + 1
+        return None
+
+    def release(self, host: str) -> None:
+        self.open = max(0, self.open - 1)
+        remaining = self.per_ip.get(host, 0) - 1
+        if remaining > 0:
+            self.per_ip[host] = remaining
+        else:
+            self.per_ip.pop(host, None)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "max_connections": self.max_connections,
+            "max_connections_per_ip": self.max_connections_per_ip,
+            "connect_rate_per_s": self.connect_rate_per_s,
+            "connect_burst": self.connect_burst,
+            "open": self.open,
+            "addresses": len(self.per_ip),
+            "busiest_address_connections": max(self.per_ip.values(), default=0),
+            "rejected": dict(self.rejected),
+        }
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            if len(self._buckets) >= ADMISSION_BUCKETS_SIZE:
+                now = time.monotonic()
+                self._buckets = {
+                    key: value for key, value in self._buckets.items() if not value.full(now)
+                }
+            bucket = TokenBucket(self.connect_rate_per_s, self.connect_burst)
+            self._buckets[host] = bucket
+        return bucket
+
+
+class _PatchCursor:
+    """Per-connection position in the state patch stream."""
+
+    def __init__(self) -> None:
+        self.version: int | None = None
+        self.pending: list[tuple[int, EventEnvelope]] = []
+
+
+class _Dimension:
+    """Allowed values for one filter field: ``include`` (None is any) minus ``exclude``."""
+
+    def __init__(self) -> None:
+        self.include: set[str] | None = None
+        self.exclude: set[str] = set()
+
+    def subscribe(self, values: list[str]) -> None:
+        if self.include is None:
+            self.include = set()
+        self.include.update(values)
+        self.exclude.difference_update(values)
+
+    def unsubscribe(self, values: list[str]) -> None:
+        if self.include is None:
+            self.exclude.update(values)
+        else:
+            self.include.difference_update(values)
+
+    def compile(self) -> tuple[frozenset[str] | None, frozenset[str]]:
+        include = frozenset(self.include) if self.include is not None else None
+        return include, frozenset(self.exclude)
+
+    def describe(self) -> dict[str, list[str] | None]:
+        return {
+            "include": sorted(self.include) if self.include is not None else None,
+            "exclude": sorted(self.exclude),
+        }
+
+
+def _allowed(value: str, rule: tuple[frozenset[str] | None, frozenset[str]]) -> bool:
+    include, exclude = rule
+    return (include is None or value in include) and value not in exclude
+
+
+class _ClientFilter:
+    """Event filter requested by one client over the control channel.
+
+    Rules are compiled into frozensets whenever they change, and each
+    ``(type, source)`` verdict is cached, so a broadcast to a client that
+    filtered the event out costs one dict lookup. ``contact_types`` only
+    constrains contact events; other events pass on type and source alone.
+    """
+
+    def __init__(self) -> None:
+        self.types = _Dimension()
+        self.sources = _Dimension()
+        self.contact_types = _Dimension()
+        self.active = False
+        self._verdicts: dict[tuple[str, str], bool] = {}
+        self._compile()
+
+    def apply(self, message: WsControlMessage) -> None:
+        if message.action == "reset":
+            self.types = _Dimension()
+            self.sources = _Dimension()
+            self.contact_types = _Dimension()
+        for dimension, values in (
+            (self.types, message.types),
+            (self.sources, message.sources),
+            (self.contact_types, message.contact_types),
+        ):
+            if not values:
+                continue
+            if message.action == "unsubscribe":
+                dimension.unsubscribe(values)
+            else:
+                dimension.subscribe(values)
+        self._compile()
+
+    def matches(self, event: EventEnvelope) -> bool:
+        key = (event.type, event.source)
+        verdict = self._verdicts.get(key)
+        if verdict is None:
+            types, sources, contact_types = self._compiled
+            contact_type = CONTACT_EVENT_TYPES.get(event.type)
+            verdict = (
+                _allowed(event.type, types)
+                and _allowed(event.source, sources)
+                and (contact_type is None or _allowed(contact_type, contact_types))
+            )
+            if len(self._verdicts) >= FILTER_CACHE_SIZE:
+                self._verdicts.clear()
+            self._verdicts[key] = verdict
+        return verdict
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "types": self.types.describe(),
+            "sources": self.sources.describe(),
+            "contact_types": self.contact_types.describe(),
+        }
+
+    def _compile(self) -> None:
+        self._compiled = (
+            self.types.compile(),
+            self.sources.compile(),
+            self.contact_types.compile(),
+        )
+        self.active = any(include is not None or exclude for include, exclude in self._compiled)
+        self._verdicts.clear()
+
+
+class _Throttle:
+    """Latest-value conflation of selected event types at up to ``max_hz`` per key.
+
+    Keys are ``(type, source, data["id"])``, so each contact (or stream
+    without an id) is limited on its own. The first event for an idle key is
+    sent immediately; later ones within the interval replace each other and
+    the newest is flushed when the interval ends.
+    """
+
+    def __init__(self, types: frozenset[str] = frozenset(), max_hz: float = 0.0) -> None:
+        self.types = types
+        self.max_hz = max_hz
+        self.interval = 1 / max_hz if max_hz > 0 else 0.0
+        self.pending: dict[ThrottleKey, EventEnvelope] = {}
+        self.last_sent: dict[ThrottleKey, float] = {}
+        self.timer: asyncio.TimerHandle | None = None
+
+    def cancel(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def prune(self, now: float) -> None:
+        if len(self.last_sent) < THROTTLE_KEYS_SIZE:
+            return
+        self.last_sent = {
+            key: sent_at
+            for key, sent_at in self.last_sent.items()
+            if key in self.pending or now - sent_at < self.interval
+        }
+
+    def describe(self) -> dict[str, Any]:
+        return {"types": sorted(self.types), "max_hz": self.max_hz}
+
+
+def _frame_error(exc: ValueError) -> str:
+    if not isinstance(exc, ValidationError):
+        return str(exc)
+    error = exc.errors()[0]
+    location = ".".join(str(part) for part in error["loc"])
+    return f"{location}: {error['msg']}" if location else error["msg"]
+
+
+def _throttle_key(event: EventEnvelope) -> ThrottleKey:
+    item = event.data.get("id")
+    return (event.type, event.source, item if isinstance(item, str | int) else None)
+
+
+class _Connection:
+    """Outbound queue, writer task and delivery stats for one client."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        encoding: str = ws_codecs.JSON,
+        host: str = "unknown",
+    ) -> None:
+        self.websocket = websocket
+        self.encoding = encoding
+        self.host = host
+        self.origin = websocket.headers.get("origin")
+        # HELLO, snapshot and replay: sent first, never dropped or conflated
+        # and not counted against ``send_queue_size``.
+        self.preamble: deque[tuple[EventEnvelope, float]] = deque()
+        # High-priority envelopes (ACKs, contact alerts) jump the live queue.
+        self.urgent: deque[tuple[EventEnvelope, float]] = deque()
+        self.queue: deque[tuple[EventEnvelope, float]] = deque()
+        self.wakeup = asyncio.Event()
+        self.writer: asyncio.Task[None] | None = None
+        # Live broadcasts are held back until the preamble has been queued.
+        self.live = False
+        self.closed = False
+        self.close_code = CLOSE_SLOW_CONSUMER
+        # Monotonic time of the last pong; None until the client opts in.
+        self.last_pong: float | None = None
+        self.patch_cursor: _PatchCursor | None = None
+        self.filter = _ClientFilter()
+        self.throttle = _Throttle()
+        # Last ``seq`` covered by the preamble replay; live broadcasts at or
+        # below it were already queued. Priority lanes reorder live delivery,
+        # so this is not advanced by broadcasts.
+        self.replayed_seq = 0
+        self.connected_at_ms = int(time.time() * 1000)
+        self.sent = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.high_water = 0
+        self.max_lag_ms = 0.0
+
+    def queued(self) -> int:
+        return len(self.preamble) + len(self.urgent) + len(self.queue)
+
+    def next_entry(self) -> tuple[EventEnvelope, float] | None:
+        for lane in (self.preamble, self.urgent, self.queue):
+            if lane:
+                return lane.popleft()
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        client = self.websocket.client
+        return {
+            "client": f"{client.host}:{client.port}" if client else None,
+            "address": self.host,
+            "origin": self.origin,
+            "encoding": self.encoding,
+            "connected_at_ms": self.connected_at_ms,
+            "queued": self.queued(),
+            "high_water": self.high_water,
+            "sent": self.sent,
+            "bytes_sent": self.bytes_sent,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+            "throttle_hz": self.throttle.max_hz,
+            "max_lag_ms": round(self.max_lag_ms, 3),
+            "subscription": self.filter.describe(),
+        }
 
 
 class WebSocketManager:
-    def __init__(self, state_store: StateStore) -> None:
+    """Fan out envelopes to clients through per-connection bounded queues.
+
+    Each connection has its own writer task, so a slow client never delays
+    the others or the bus consumer. When a queue reaches ``send_queue_size``
+    the ``slow_consumer_policy`` applies: ``conflate`` replaces a queued
+    low-priority envelope with the same type and source (falling back to
+    ``drop``), ``drop`` discards the oldest queued envelope that is not high
+    priority, and ``disconnect`` closes the client with code 1013.
+    High-priority envelopes (ACKs and contact alerts) are never dropped and
+    go to a separate lane the writer drains before the bounded queue; a
+    contact's queued updates move with its NEW/LOST so per-contact order is
+    kept. The connect preamble is queued apart and exempt from the policy.
+
+    ``conflate_types`` are additionally throttled per connection to
+    ``conflate_max_hz`` (0 disables); clients may request a lower rate.
+
+    Concurrent connects share one pre-encoded SYSTEM_UPDATE (and HELLO) per
+    state version, so a reconnect storm costs a single snapshot build.
+
+    A single ticker started by ``start`` queues one shared HEARTBEAT to every
+    live connection each ``heartbeat_interval_s``. Clients that answer with
+    a ``pong`` control message are closed with 4408 once no pong has arrived
+    for ``heartbeat_timeout_s`` (0 disables reaping).
+    """
+
+    def __init__(
+        self,
+        state_store: StateStore,
+        event_bus: EventBus | None = None,
+        send_queue_size: int = 256,
+        slow_consumer_policy: str = "conflate",
+        *,
+        conflate_types: Iterable[str] = (),
+        conflate_max_hz: float = 0.0,
+        heartbeat_interval_s: float = 2.0,
+        heartbeat_timeout_s: float = 0.0,
+        admission: AdmissionControl | None = None,
+    ) -> None:
+        if send_queue_size < 1:
+            raise ValueError("send_queue_size must be >= 1")
+        if slow_consumer_policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {slow_consumer_policy}")
+        if conflate_max_hz < 0:
+            raise ValueError("conflate_max_hz must be >= 0")
+        if heartbeat_interval_s <= 0:
+            raise ValueError("heartbeat_interval_s must be > 0")
         self._state_store = state_store
-        self._connections: set[WebSocket] = set()
-        self._lock = asyncio.Lock()
+        self._event_bus = event_bus
+        self._send_queue_size = send_queue_size
+        self._policy = slow_consumer_policy
+        self._conflate_types = frozenset(conflate_types) - HIGH_PRIORITY_TYPES
+        self._conflate_max_hz = conflate_max_hz
+        self._heartbeat_interval_s = heartbeat_interval_s
+        self._heartbeat_timeout_s = heartbeat_timeout_s
+        self._heartbeat_task: asyncio.Task[None] | None = None
+        self._connections: dict[WebSocket, _Connection] = {}
+        self.admission = admission or AdmissionControl()
+        # (state version, built at, SYSTEM_UPDATE) and the build in flight.
+        self._snapshot: tuple[int, float, EventEnvelope] | None = None
+        self._snapshot_task: asyncio.Task[tuple[int, EventEnvelope]] | None = None
+        self._hello: tuple[EventEnvelope, int | None, EventEnvelope] | None = None
+        self.evicted = 0
+        self.reaped = 0
+        self.snapshot_builds = 0
+        self.snapshot_hits = 0
 
-    async def connect(self, websocket: WebSocket) -> None:
-        await websocket.accept()
-        async with self._lock:
-            self._connections.add(websocket)
+    async def start(self) -> None:
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self) -> None:
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._heartbeat_task
+            self._heartbeat_task = None
+
+    async def connect(self, websocket: WebSocket, subprotocol: str | None = None) -> bool:
+        """Accept ``websocket``; a negotiated ``subprotocol`` selects the frame encoding.
+
+        Without one the client gets JSON text frames. Returns False if
+        admission control refused the client: it is closed right after the
+        handshake with 1013 (over capacity) or 4429 (connecting too fast)
+        and the reason, before any task or snapshot is spent on it.
+        """
+        host = client_host(websocket)
+        reason = self.admission.check(host)
+        if reason is not None:
+            await websocket.accept(subprotocol=subprotocol)
+            code = CLOSE_RATE_LIMITED if reason == "rate_limited" else CLOSE_OVER_CAPACITY
+            with suppress(Exception):
+                await websocket.close(code=code, reason=reason)
+            return False
+        registered = False
+        try:
+            await websocket.accept(subprotocol=subprotocol)
+            connection = _Connection(websocket, ws_codecs.encoding_for(subprotocol), host)
+            connection.throttle = _Throttle(self._conflate_types, self._conflate_max_hz)
+            connection.writer = asyncio.create_task(self._write_loop(connection))
+            self._connections[websocket] = connection
+            registered = True
+        finally:
+            # From here on _forget releases the slot.
+            if not registered:
+                self.admission.release(host)
+        return True
 
     async def disconnect(self, websocket: WebSocket) -> None:
-        async with self._lock:
-            self._connections.discard(websocket)
+        connection = self._connections.get(websocket)
+        if connection is None:
+            return
+        self._forget(connection)
+        connection.closed = True
+        connection.throttle.cancel()
+        writer = connection.writer
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+            with suppress(asyncio.CancelledError):
+                await writer
+
+    async def broadcast(self, event: EventEnvelope) -> None:
+        """Queue ``event`` for every live connection; never waits on a socket."""
+        seq = event.seq
+        for connection in list(self._connections.values()):
+            if not connection.live:
+                continue
+            if seq is not None and seq <= connection.replayed_seq:
+                continue
+            if connection.filter.active and not connection.filter.matches(event):
+                continue
+            throttle = connection.throttle
+            if throttle.interval:
+                if event.type in throttle.types:
+                    self._throttle(connection, event)
+                    continue
+                if throttle.pending and event.type in CONTACT_EVENT_TYPES:
+                    self._flush_contact(connection, event)
+            self._enqueue(connection, event)
+
+    async def send(self, websocket: WebSocket, envelope: EventEnvelope) -> None:
+        """Queue an envelope for one connection (for example a heartbeat)."""
+        connection = self._connections.get(websocket)
+        if connection is not None:
+            self._enqueue(connection, envelope)
+
+    async def handle_control(self, websocket: WebSocket, frame: str | bytes) -> None:
+        """Apply a control message and queue a SUBSCRIPTION_ACK.
 
-    async def broadcast(self, message: dict[str, Any]) -> None:
-        async with self._lock:
-            connections = list(self._connections)
-        for websocket in connections:
-            await websocket.send_json(message)
+        ``frame`` is JSON text or a binary frame in the connection's
+        encoding. Invalid messages are answered with ``ok: false`` and leave
+        the connection's filter unchanged.
+        """
+        connection = self._connections.get(websocket)
+        if connection is None:
+            return
+        try:
+            message = parse_client_frame(WsControlMessage, connection.encoding, frame)
+        except ValueError as exc:
+            data: dict[str, Any] = {
+                "id": None,
+                "action": None,
+                "ok": False,
+                "error": _frame_error(exc),
+            }
+        else:
+            if message.action == "pong":
+                connection.last_pong = time.monotonic()
+                return
+            if message.action == "throttle":
+                self._configure_throttle(connection, message)
+            else:
+                connection.filter.apply(message)
+            data = {
+                "id": message.id,
+                "action": message.action,
+                "ok": True,
+                "filter": connection.filter.describe(),
+                "throttle": connection.throttle.describe(),
+            }
+        ack = EventEnvelope(
+            type="SUBSCRIPTION_ACK",
+            timestamp_ms=int(time.time() * 1000),
+            source="aggregator",
+            data=data,
+        )
+        self._enqueue(connection, ack)
+
+    async def send_preamble(
+        self,
+        websocket: WebSocket,
+        state_patches: bool = False,
+        resume_from: int | None = None,
+        sync: WsSyncMessage | None = None,
+    ) -> None:
+        """Send HELLO and a SYSTEM_UPDATE snapshot at a known state version.
+
+        With ``sync`` the snapshot is replaced by STATE_SYNC: only the sections
+        whose hash differs from the client's, and a contact diff.
+
+        With ``state_patches`` the connection then receives every STATE_PATCH
+        newer than that version; patches committed meanwhile are buffered.
+        With ``resume_from`` the bus events after that ``seq`` are replayed
+        before live delivery resumes; if they are no longer retained the
+        client gets RESYNC_REQUIRED followed by the snapshot. Without it, bus
+        events published while the preamble was prepared follow the snapshot.
+        """
+        connection = self._connections.get(websocket)
+        if connection is None:
+            return
+        bus = self._event_bus
+        start_seq = bus.head if bus is not None else 0
+        if state_patches:
+            connection.patch_cursor = _PatchCursor()
+        # Patches above this version are buffered from here on, so the
+        # snapshot must be at least this new.
+        floor = self._state_store.version
+        if sync is not None:
+            digest = await self._state_store.digest()
+            version, system_update = digest.version, self._state_sync(digest, sync)
+        else:
+            version, system_update = await self._cached_system_update()
+            while version < floor:
+                version, system_update = await self._cached_system_update()
+        event_seq = start_seq if bus is not None else None
+        hello = self._cached_hello(version, system_update, event_seq)
+        # Everything below is queued without awaiting, so no live broadcast
+        # can interleave with the preamble.
+        self._enqueue(connection, hello, preamble=True)
+        resumed = False
+        if bus is not None and resume_from is not None:
+            resumed = self._replay(connection, bus, resume_from)
+            if not resumed:
+                resync = resync_required(bus, resume_from)
+                self._enqueue(connection, resync, preamble=True)
+        if state_patches or not resumed:
+            self._enqueue(connection, system_update, preamble=True)
+        if bus is not None and resume_from is None:
+            self._replay(connection, bus, start_seq)
+        cursor = connection.patch_cursor
+        if cursor is not None:
+            for patch_version, envelope in cursor.pending:
+                if patch_version > version:
+                    self._enqueue(connection, envelope, preamble=True)
+                    version = patch_version
+            cursor.pending.clear()
+            cursor.version = version
+        connection.live = True
 
     async def send_system_update(self, websocket: WebSocket) -> None:
-        snapshot = await self._state_store.snapshot()
-        envelope = EventEnvelope(
+        _, system_update = await self._cached_system_update()
+        await self.send(websocket, system_update)
+
+    def wants_state_patches(self) -> bool:
+        """Whether any connection opted into STATE_PATCH delivery."""
+        return any(connection.patch_cursor is not None for connection in self._connections.values())
+
+    async def broadcast_state_patch(self, version: int, envelope: EventEnvelope) -> None:
+        for connection in list(self._connections.values()):
+            cursor = connection.patch_cursor
+            if cursor is None:
+                continue
+            if cursor.version is None:
+                cursor.pending.append((version, envelope))
+                continue
+            if version <= cursor.version:
+                continue
+            cursor.version = version
+            self._enqueue(connection, envelope)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "connections": len(self._connections),
+            "send_queue_size": self._send_queue_size,
+            "slow_consumer_policy": self._policy,
+            "evicted": self.evicted,
+            "reaped": self.reaped,
+            "admission": self.admission.stats(),
+            "snapshot_builds": self.snapshot_builds,
+            "snapshot_hits": self.snapshot_hits,
+        }
+
+    def clients(self) -> list[dict[str, Any]]:
+        """Per-connection delivery stats, oldest connection first."""
+        return [connection.stats() for connection in self._connections.values()]
+
+    async def _cached_system_update(self) -> tuple[int, EventEnvelope]:
+        """SYSTEM_UPDATE for the current state version, built once and shared."""
+        cached = self._snapshot
+        if (
+            cached is not None
+            and cached[0] == self._state_store.version
+            and time.monotonic() - cached[1] < SNAPSHOT_CACHE_MAX_AGE_S
+        ):
+            self.snapshot_hits += 1
+            return cached[0], cached[2]
+        task = self._snapshot_task
+        if task is None:
+            task = asyncio.create_task(self._build_system_update())
+            self._snapshot_task = task
+        else:
+            self.snapshot_hits += 1
+        # Shielded so one cancelled connect does not fail the others waiting.
+        return await asyncio.shield(task)
+
+    async def _build_system_update(self) -> tuple[int, EventEnvelope]:
+        try:
+            version, snapshot = await self._state_store.versioned_snapshot()
+            system_update = self._system_update(snapshot)
+            system_update.encoded()
+            self._snapshot = (version, time.monotonic(), system_update)
+            self.snapshot_builds += 1
+            return version, system_update
+        finally:
+            self._snapshot_task = None
+
+    def _cached_hello(
+        self,
+        version: int,
+        system_update: EventEnvelope,
+        event_seq: int | None,
+    ) -> EventEnvelope:
+        """HELLO shared by connects served the same snapshot at the same bus head."""
+        cached = self._hello
+        if cached is not None and cached[0] is system_update and cached[1] == event_seq:
+            return cached[2]
+        now_ms = int(time.time() * 1000)
+        hello = EventEnvelope(
+            type="HELLO",
+            timestamp_ms=now_ms,
+            source="aggregator",
+            data={"timestamp_ms": now_ms, "state_version": version, "event_seq": event_seq},
+        )
+        self._hello = (system_update, event_seq, hello)
+        return hello
+
+    def _enqueue(
+        self,
+        connection: _Connection,
+        envelope: EventEnvelope,
+        preamble: bool = False,
+    ) -> None:
+        if connection.closed:
+            return
+        if preamble:
+            connection.preamble.append((envelope, time.monotonic()))
+        else:
+            full = len(connection.urgent) + len(connection.queue) >= self._send_queue_size
+            if full and not self._make_room(connection, envelope):
+                return
+            if event_priority(envelope.type) == PRIORITY_HIGH:
+                self._promote_contact(connection, envelope)
+                connection.urgent.append((envelope, time.monotonic()))
+            else:
+                connection.queue.append((envelope, time.monotonic()))
+        connection.high_water = max(connection.high_water, connection.queued())
+        connection.wakeup.set()
+
+    def _make_room(self, connection: _Connection, envelope: EventEnvelope) -> bool:
+        """Apply the slow-consumer policy; False if ``envelope`` must not be queued."""
+        queue = connection.queue
+        priority = event_priority(envelope.type)
+        if self._policy == "disconnect":
+            self._evict(connection)
+            return False
+        if self._policy == "conflate" and priority == PRIORITY_LOW:
+            for index, (queued, enqueued_at) in enumerate(queue):
+                if queued.type == envelope.type and queued.source == envelope.source:
+                    queue[index] = (envelope, enqueued_at)
+                    connection.conflated += 1
+                    connection.wakeup.set()
+                    return False
+        if queue:
+            queue.popleft()
+            connection.dropped += 1
+            return True
+        if priority == PRIORITY_HIGH:
+            return True
+        connection.dropped += 1
+        return False
+
+    def _promote_contact(self, connection: _Connection, envelope: EventEnvelope) -> None:
+        """Move a contact's queued updates ahead of its NEW/LOST so order is kept."""
+        item = _throttle_key(envelope)[2]
+        if item is None or envelope.type not in CONTACT_EVENT_TYPES:
+            return
+        queue = connection.queue
+        same = [
+            entry
+            for entry in queue
+            if entry[0].source == envelope.source and entry[0].data.get("id") == item
+        ]
+        for entry in same:
+            queue.remove(entry)
+        connection.urgent.extend(same)
+
+    def _configure_throttle(self, connection: _Connection, message: WsControlMessage) -> None:
+        """Replace the connection's throttle; the server rate is a ceiling."""
+        cap = self._conflate_max_hz
+        max_hz = message.max_hz if message.max_hz is not None else cap
+        if cap > 0 and (max_hz == 0 or max_hz > cap):
+            max_hz = cap
+        types = frozenset(message.types) if message.types else self._conflate_types
+        previous = connection.throttle
+        previous.cancel()
+        connection.throttle = _Throttle(types - HIGH_PRIORITY_TYPES, max_hz)
+        for event in previous.pending.values():
+            self._enqueue(connection, event)
+
+    def _throttle(self, connection: _Connection, event: EventEnvelope) -> None:
+        throttle = connection.throttle
+        key = _throttle_key(event)
+        if key in throttle.pending:
+            throttle.pending[key] = event
+            connection.conflated += 1
+            return
+        now = time.monotonic()
+        sent_at = throttle.last_sent.get(key)
+        if sent_at is None or now - sent_at >= throttle.interval:
+            throttle.prune(now)
+            throttle.last_sent[key] = now
+            self._enqueue(connection, event)
+            return
+        throttle.pending[key] = event
+        if throttle.timer is None:
+            delay = sent_at + throttle.interval - now
+            throttle.timer = asyncio.get_running_loop().call_later(
+                delay, self._flush_throttled, connection
+            )
+
+    def _flush_throttled(self, connection: _Connection) -> None:
+        throttle = connection.throttle
+        throttle.timer = None
+        if connection.closed:
+            return
+        now = time.monotonic()
+        next_due: float | None = None
+        for key, event in list(throttle.pending.items()):
+            due = throttle.last_sent.get(key, now) + throttle.interval
+            if due <= now:
+                del throttle.pending[key]
+                throttle.last_sent[key] = now
+                self._enqueue(connection, event)
+            elif next_due is None or due < next_due:
+                next_due = due
+        if next_due is not None:
+            throttle.timer = asyncio.get_running_loop().call_later(
+                next_due - now, self._flush_throttled, connection
+            )
+
+    def _flush_contact(self, connection: _Connection, event: EventEnvelope) -> None:
+        """Send a contact's held update before its NEW/LOST so order is kept."""
+        throttle = connection.throttle
+        item = _throttle_key(event)[2]
+        if item is None:
+            return
+        now = time.monotonic()
+        for key in [key for key in throttle.pending if key[1:] == (event.source, item)]:
+            throttle.last_sent[key] = now
+            self._enqueue(connection, throttle.pending.pop(key))
+
+    def _evict(self, connection: _Connection, code: int = CLOSE_SLOW_CONSUMER) -> None:
+        connection.closed = True
+        connection.close_code = code
+        connection.throttle.cancel()
+        connection.preamble.clear()
+        connection.urgent.clear()
+        connection.queue.clear()
+        self._forget(connection)
+        if code == CLOSE_HEARTBEAT_TIMEOUT:
+            self.reaped += 1
+        else:
+            self.evicted += 1
+        connection.wakeup.set()
+
+    def _forget(self, connection: _Connection) -> None:
+        if self._connections.pop(connection.websocket, None) is not None:
+            self.admission.release(connection.host)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._heartbeat_interval_s)
+            now = time.monotonic()
+            timestamp_ms = int(time.time() * 1000)
+            # One envelope per tick, so it is encoded once per encoding.
+            heartbeat = EventEnvelope(
+                type="HEARTBEAT",
+                timestamp_ms=timestamp_ms,
+                source="aggregator",
+                data={"timestamp_ms": timestamp_ms},
+            )
+            timeout = self._heartbeat_timeout_s
+            for connection in list(self._connections.values()):
+                if not connection.live:
+                    continue
+                last_pong = connection.last_pong
+                if timeout and last_pong is not None and now - last_pong > timeout:
+                    LOGGER.info("reaping websocket client without pong for %.1fs", now - last_pong)
+                    self._evict(connection, CLOSE_HEARTBEAT_TIMEOUT)
+                    continue
+                self._enqueue(connection, heartbeat)
+
+    async def _write_loop(self, connection: _Connection) -> None:
+        websocket = connection.websocket
+        try:
+            while not connection.closed:
+                entry = connection.next_entry()
+                if entry is None:
+                    connection.wakeup.clear()
+                    await connection.wakeup.wait()
+                    continue
+                envelope, enqueued_at = entry
+                frame = envelope.encoded_frame(connection.encoding)
+                if isinstance(frame, bytes):
+                    await websocket.send_bytes(frame)
+                    size = len(frame)
+                else:
+                    await websocket.send_text(frame)
+                    # isascii() is a flag check; only non-ASCII text is re-encoded.
+                    size = len(frame) if frame.isascii() else len(frame.encode("utf-8"))
+                lag_ms = (time.monotonic() - enqueued_at) * 1000
+                connection.max_lag_ms = max(connection.max_lag_ms, lag_ms)
+                connection.sent += 1
+                connection.bytes_sent += size
+            # Only an eviction ends the loop without cancellation.
+            with suppress(Exception):
+                await websocket.close(code=connection.close_code)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            # Any send failure ends this client only.
+            LOGGER.debug("websocket send failed: %s", exc)
+            connection.closed = True
+            self._forget(connection)
+
+    def _replay(self, connection: _Connection, bus: EventBus, resume_from: int) -> bool:
+        events = bus.events_since(resume_from)
+        if events is None:
+            return False
+        for event in events:
+            self._enqueue(connection, event, preamble=True)
+        connection.replayed_seq = bus.head
+        return True
+
+    @staticmethod
+    def _state_sync(digest: StateDigest, sync: WsSyncMessage) -> EventEnvelope:
+        snapshot = digest.snapshot
+        changed = {
+            name: digest_hash
+            for name, digest_hash in digest.section_hashes.items()
+            if sync.section_hashes.get(name) != digest_hash
+        }
+        contacts = {
+            str(contact.get("id")): contact
+            for contact in snapshot[CONTACTS_SECTION]
+            if isinstance(contact, dict)
+        }
+        upserted = {
+            contact_id: rev
+            for contact_id, rev in digest.contact_revs.items()
+            if sync.contact_revs.get(contact_id) != rev
+        }
+        return EventEnvelope(
+            type="STATE_SYNC",
+            timestamp_ms=snapshot["timestamp_ms"],
+            source="aggregator",
+            data={
+                "state_version": digest.version,
+                "base_version": sync.state_version,
+                "timestamp_ms": snapshot["timestamp_ms"],
+                "overall_ok": snapshot.get("overall_ok", True),
+                "sections": {name: snapshot[name] for name in changed},
+                "section_hashes": changed,
+                "contacts": {
+                    "upsert": [contacts[contact_id] for contact_id in upserted],
+                    "remove": sorted(set(sync.contact_revs) - set(contacts)),
+                    "revs": upserted,
+                },
+            },
+        )
+
+    @staticmethod
+    def _system_update(snapshot: StatusSnapshot) -> EventEnvelope:
+        return EventEnvelope(
             type="SYSTEM_UPDATE",
             timestamp_ms=snapshot.timestamp_ms,
             source="aggregator",
             data=snapshot.model_dump(),
         )
-        await websocket.send_json(envelope.model_dump())
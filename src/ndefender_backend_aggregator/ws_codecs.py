@@ -0,0 +1,86 @@
+"""Wire encodings for WebSocket frames, negotiated as subprotocols."""
+
+from __future__ import annotations
+
+import importlib
+from collections.abc import Callable, Iterable
+from typing import Any
+
+JSON = "json"
+# Subprotocol name -> module providing ``dumps``; both are optional extras
+# (``pip install .[binary]``) and are imported on first use.
+BINARY_ENCODINGS = {"msgpack": "msgpack", "cbor": "cbor2"}
+ENCODINGS = (JSON, *BINARY_ENCODINGS)
+
+Codec = tuple[Callable[[Any], bytes], Callable[[bytes], Any]]
+
+_codecs: dict[str, Codec | None] = {}
+
+
+def _binary_codec(encoding: str) -> Codec | None:
+    """``(dumps, loads)`` for a binary encoding, or None if not installed."""
+    if encoding not in _codecs:
+        try:
+            module = importlib.import_module(BINARY_ENCODINGS[encoding])
+        except ImportError:
+            _codecs[encoding] = None
+        else:
+            if encoding == "msgpack":
+                _codecs[encoding] = (
+                    lambda value: module.packb(value, use_bin_type=True),
+                    lambda data: module.unpackb(data, raw=False),
+                )
+            else:
+                _codecs[encoding] = (module.dumps, module.loads)
+    return _codecs[encoding]
+
+
+def available_encodings() -> list[str]:
+    """Encodings this process can serve, JSON first."""
+    return [encoding for encoding in ENCODINGS if is_available(encoding)]
+
+
+def is_available(encoding: str) -> bool:
+    if encoding == JSON:
+        return True
+    return encoding in BINARY_ENCODINGS and _binary_codec(encoding) is not None
+
+
+def negotiate(offered: Iterable[str]) -> str | None:
+    """Pick the first subprotocol the client offered that can be served.
+
+    Names match case-insensitively, but the offered token is returned as
+    sent because RFC 6455 requires echoing one of the client's values; use
+    ``encoding_for`` to map it to an encoding. ``None`` means the client
+    offered none we support; the connection then falls back to JSON text
+    frames without echoing a subprotocol.
+    """
+    for name in offered:
+        if is_available(encoding_for(name)):
+            return name
+    return None
+
+
+def encoding_for(subprotocol: str | None) -> str:
+    """Encoding selected by a negotiated subprotocol; JSON when there is none."""
+    return subprotocol.strip().lower() if subprotocol else JSON
+
+
+def encode(encoding: str, value: Any) -> bytes:
+    codec = _binary_codec(encoding) if encoding in BINARY_ENCODINGS else None
+    if codec is None:
+        raise ValueError(f"Unsupported WebSocket encoding: {encoding}")
+    return codec[0](value)
+
+
+def decode(encoding: str, data: bytes) -> Any:
+    """Parse a binary frame sent by a client; decode errors raise ValueError."""
+    codec = _binary_codec(encoding) if encoding in BINARY_ENCODINGS else None
+    if codec is None:
+        raise ValueError(f"Unsupported WebSocket encoding: {encoding}")
+    try:
+        return codec[1](data)
+    except ValueError:
+        raise
+    except Exception as exc:
+        raise ValueError(f"Malformed {encoding} frame: {exc}") from exc
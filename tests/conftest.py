@@ -2,12 +2,33 @@ import sys
 from pathlib import Path
 
 import pytest
+import yaml
 
 from ndefender_backend_aggregator import config as config_module
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
 
 
+@pytest.fixture(autouse=True)
+def _isolated_state_paths(tmp_path, monkeypatch):
+    override = tmp_path / "test_config.yaml"
+    override.write_text(
+        yaml.safe_dump(
+            {
+                "checkpoint": {"path": str(tmp_path / "checkpoint.json")},
+                "journal": {"directory": str(tmp_path / "journal")},
+            }
+        ),
+        encoding="utf-8",
+    )
+    monkeypatch.setenv("NDEFENDER_CONFIG", str(override))
+
+
+@pytest.fixture(autouse=True)
+def _strict_state_validation(monkeypatch):
+    monkeypatch.setenv("NDEFENDER_STRICT_STATE", "1")
+
+
 @pytest.fixture(autouse=True)
 def _reset_config_cache():
     config_module.get_config.cache_clear()
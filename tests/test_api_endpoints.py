@@ -3,6 +3,7 @@ from fastapi.testclient import TestClient
 from ndefender_backend_aggregator.main import create_app
 
 HTTP_OK = 200
+HTTP_BAD_REQUEST = 400
 
 
 def test_health_without_auth():
@@ -40,3 +41,27 @@ def test_command_endpoint_returns_result():
     assert response.status_code == HTTP_OK
     payload = response.json()
     assert payload["command"] == "SET_VRX_FREQ"
+
+
+def test_status_changes_long_poll():
+    client = TestClient(create_app())
+    response = client.get("/api/v1/status/changes", params={"since": 0, "timeout_ms": 0})
+    assert response.status_code == HTTP_OK
+    payload = response.json()
+    assert "contacts" in payload["sections"]
+    response = client.get(
+        "/api/v1/status/changes",
+        params={"since": payload["version"] + 5, "timeout_ms": 0, "sections": "gps,power"},
+    )
+    assert set(response.json()["sections"]) == {"gps", "power"}
+    response = client.get("/api/v1/status/changes", params={"sections": "bogus"})
+    assert response.status_code == HTTP_BAD_REQUEST
+
+
+def test_bus_metrics_endpoint_lists_named_subscribers():
+    with TestClient(create_app()) as client:
+        response = client.get("/api/v1/metrics/bus")
+        assert response.status_code == HTTP_OK
+        payload = response.json()
+        assert "publish_rate_hz" in payload
+        assert "ws_forwarder" in [entry["name"] for entry in payload["subscribers"]]
@@ -46,3 +46,213 @@ def test_event_bus_drops_oldest_when_full():
         assert received.data["seq"] == expected_seq
 
     asyncio.run(run())
+
+
+def test_event_bus_counts_missed_events_when_lapped():
+    expected_missed = 3
+    expected_last_seq = 5
+    bus = EventBus(max_queue_size=2)
+
+    async def run() -> None:
+        slow = await bus.subscribe()
+        fast = await bus.subscribe()
+        for seq in range(1, 6):
+            await bus.publish(
+                EventEnvelope(
+                    type="SYSTEM_UPDATE",
+                    timestamp_ms=seq,
+                    source="aggregator",
+                    data={"seq": seq},
+                )
+            )
+            assert (await fast.get()).data["seq"] == seq
+        assert slow.qsize() == bus.capacity
+        assert (await slow.get()).data["seq"] == expected_last_seq - 1
+        assert slow.missed == expected_missed
+        assert (await slow.get()).data["seq"] == expected_last_seq
+        assert fast.missed == 0
+
+    asyncio.run(run())
+
+
+def test_event_bus_wakes_all_waiting_subscribers():
+    bus = EventBus()
+    event = EventEnvelope(type="SYSTEM_UPDATE", timestamp_ms=1, source="aggregator", data={})
+
+    async def run() -> None:
+        subscriptions = [await bus.subscribe() for _ in range(3)]
+        readers = [asyncio.create_task(sub.get()) for sub in subscriptions]
+        await asyncio.sleep(0)
+        await bus.publish(event)
+        received = await asyncio.wait_for(asyncio.gather(*readers), timeout=1)
+        assert all(item is event for item in received)
+
+    asyncio.run(run())
+
+
+def test_event_bus_filters_by_type_source_and_predicate():
+    expected_rssi = 5
+    bus = EventBus()
+
+    def envelope(event_type: str, source: str, rssi: int = 0) -> EventEnvelope:
+        return EventEnvelope(type=event_type, timestamp_ms=1, source=source, data={"rssi": rssi})
+
+    async def run() -> None:
+        telemetry = await bus.subscribe(types="ESP32_TELEMETRY")
+        antsdr = await bus.subscribe(sources=["antsdr"])
+        strong = await bus.subscribe(
+            types={"RF_CONTACT_NEW"},
+            predicate=lambda event: event.data["rssi"] > 0,
+        )
+        waiting = asyncio.create_task(strong.get())
+        await asyncio.sleep(0)
+        await bus.publish(envelope("ESP32_TELEMETRY", "esp32"))
+        await bus.publish(envelope("RF_CONTACT_NEW", "antsdr"))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        await bus.publish(envelope("RF_CONTACT_NEW", "antsdr", rssi=expected_rssi))
+
+        assert (await telemetry.get()).source == "esp32"
+        assert telemetry.empty()
+        assert [(await antsdr.get()).data["rssi"] for _ in range(2)] == [0, expected_rssi]
+        assert (await asyncio.wait_for(waiting, timeout=1)).data["rssi"] == expected_rssi
+
+    asyncio.run(run())
+
+
+def test_event_bus_stats_report_depth_drops_and_lag():
+    expected_published = 3
+    expected_dropped = 1
+    bus = EventBus(max_queue_size=2)
+    event = EventEnvelope(type="SYSTEM_UPDATE", timestamp_ms=1, source="aggregator", data={})
+
+    async def run() -> None:
+        subscription = await bus.subscribe(name="forwarder")
+        for _ in range(expected_published):
+            await bus.publish(event)
+        stats = bus.stats()
+        assert stats["published"] == expected_published
+        assert stats["subscribers"][0]["name"] == "forwarder"
+        assert stats["subscribers"][0]["depth"] == bus.capacity
+        await subscription.get()
+        entry = bus.stats()["subscribers"][0]
+        assert entry["dropped"] == expected_dropped
+        assert entry["high_water"] == bus.capacity
+        assert entry["consumed"] == 1
+        assert entry["max_lag_ms"] >= 0
+
+    asyncio.run(run())
+
+
+def test_event_bus_stats_do_not_move_subscriber_cursors():
+    expected_depth = 3
+    bus = EventBus()
+    telemetry = EventEnvelope(type="ESP32_TELEMETRY", timestamp_ms=1, source="esp32", data={})
+    unrelated = EventEnvelope(type="RF", timestamp_ms=1, source="antsdr", data={})
+
+    async def run() -> None:
+        subscription = await bus.subscribe(types="ESP32_TELEMETRY", conflate=True)
+        for event in (unrelated, telemetry, telemetry.model_copy()):
+            await bus.publish(event)
+        cursors = list(subscription.cursors)
+        for _ in range(2):
+            entry = bus.stats()["subscribers"][0]
+        assert subscription.cursors == cursors
+        assert entry["conflated"] == 0
+        assert entry["depth"] == expected_depth
+
+    asyncio.run(run())
+
+
+def test_event_bus_delivers_high_priority_first_and_never_drops_it_for_telemetry():
+    bus = EventBus(max_queue_size=2)
+
+    def envelope(event_type: str, index: int) -> EventEnvelope:
+        return EventEnvelope(type=event_type, timestamp_ms=1, source="esp32", data={"i": index})
+
+    async def run() -> None:
+        subscription = await bus.subscribe()
+        await bus.publish(envelope("ESP32_TELEMETRY", 0))
+        await bus.publish(envelope("COMMAND_ACK", 1))
+        for index in range(2, 7):
+            await bus.publish(envelope("ESP32_TELEMETRY", index))
+        first = await subscription.get()
+        assert first.type == "COMMAND_ACK"
+        assert [(await subscription.get()).data["i"] for _ in range(2)] == [5, 6]
+        assert subscription.empty()
+
+    asyncio.run(run())
+
+
+def test_event_bus_keeps_contact_lost_after_its_older_updates():
+    bus = EventBus()
+
+    def envelope(event_type: str, contact_id: str) -> EventEnvelope:
+        return EventEnvelope(
+            type=event_type, timestamp_ms=1, source="remoteid", data={"id": contact_id}
+        )
+
+    async def run() -> None:
+        subscription = await bus.subscribe()
+        await bus.publish(envelope("CONTACT_UPDATE", "a"))
+        await bus.publish(envelope("CONTACT_UPDATE", "b"))
+        await bus.publish(envelope("CONTACT_LOST", "a"))
+        await bus.publish(envelope("CONTACT_UPDATE", "a"))
+        received = []
+        while not subscription.empty():
+            event = subscription.get_nowait()
+            received.append((event.type, event.data["id"]))
+        assert received == [
+            ("CONTACT_LOST", "a"),
+            ("CONTACT_UPDATE", "b"),
+            ("CONTACT_UPDATE", "a"),
+        ]
+        assert subscription.stats()["conflated"] == 1
+
+    asyncio.run(run())
+
+
+def test_event_bus_conflates_low_priority_events_per_source():
+    expected_conflated = 2
+    expected_published = 5
+    bus = EventBus()
+
+    def envelope(event_type: str, source: str, index: int) -> EventEnvelope:
+        return EventEnvelope(type=event_type, timestamp_ms=1, source=source, data={"i": index})
+
+    async def run() -> None:
+        conflated = await bus.subscribe(conflate=True)
+        everything = await bus.subscribe()
+        await bus.publish(envelope("ESP32_TELEMETRY", "esp32", 0))
+        await bus.publish(envelope("SYSTEM_UPDATE", "aggregator", 1))
+        await bus.publish(envelope("ESP32_TELEMETRY", "esp32", 2))
+        await bus.publish(envelope("RF", "antsdr", 3))
+        await bus.publish(envelope("ESP32_TELEMETRY", "esp32", 4))
+        received = []
+        while not conflated.empty():
+            received.append(conflated.get_nowait().data["i"])
+        assert received == [3, 1, 4]
+        assert conflated.stats()["conflated"] == expected_conflated
+        assert everything.qsize() == expected_published
+
+    asyncio.run(run())
+
+
+def test_event_bus_replays_across_lanes_in_seq_order():
+    expected_floor = 4
+    bus = EventBus(max_queue_size=2)
+
+    async def run() -> None:
+        for event_type in ("RF", "COMMAND_ACK", "ESP32_TELEMETRY", "RF"):
+            await bus.publish(
+                EventEnvelope(type=event_type, timestamp_ms=1, source="test", data={})
+            )
+        assert [event.seq for event in bus.events_since(1) or []] == [2, 3, 4]
+        for _ in range(2):
+            await bus.publish(EventEnvelope(type="RF", timestamp_ms=1, source="test", data={}))
+        assert bus.replay_floor == expected_floor
+        assert bus.events_since(1) is None
+        assert [event.seq for event in bus.events_since(expected_floor) or []] == [5, 6]
+        assert bus.events_since(bus.head + 1) is None
+
+    asyncio.run(run())
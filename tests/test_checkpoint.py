@@ -0,0 +1,138 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from ndefender_backend_aggregator.checkpoint import StateCheckpointer
+from ndefender_backend_aggregator.config import CheckpointConfig
+from ndefender_backend_aggregator.contacts import ContactStore
+from ndefender_backend_aggregator.state import StateStore
+
+
+def _config(path: Path, max_age_seconds: int = 3600) -> CheckpointConfig:
+    return CheckpointConfig(
+        enabled=True,
+        path=str(path),
+        min_interval_ms=1000,
+        max_age_seconds=max_age_seconds,
+        contact_max_age_seconds=60,
+    )
+
+
+def test_checkpoint_round_trip_restores_state_and_contacts(tmp_path: Path):
+    expected_soc = 84
+    path = tmp_path / "state" / "checkpoint.json"
+
+    async def run() -> None:
+        state_store = StateStore()
+        contact_store = ContactStore(state_store)
+        checkpointer = StateCheckpointer(_config(path), state_store, contact_store)
+        now_ms = int(time.time() * 1000)
+        await state_store.update_section("power", {"soc_percent": expected_soc})
+        await contact_store.update_remoteid("CONTACT_NEW", {"id": "r1"}, now_ms)
+        await contact_store.update_rf("RF_CONTACT_NEW", {"id": "rf1", "confidence": 0.9}, now_ms)
+        assert await checkpointer.write() is True
+        assert await checkpointer.write() is False
+        assert not path.with_name("checkpoint.json.tmp").exists()
+
+        restored_store = StateStore()
+        restored_contacts = ContactStore(restored_store)
+        restorer = StateCheckpointer(_config(path), restored_store, restored_contacts)
+        assert await restorer.load() is True
+        snapshot = await restored_store.snapshot()
+        assert snapshot.power["soc_percent"] == expected_soc
+        assert {c["id"] for c in snapshot.contacts} == {"r1", "rf1"}
+        assert await restored_contacts.remoteid_count() == 1
+
+    asyncio.run(run())
+
+
+def test_checkpoint_drops_expired_remoteid_and_stale_files(tmp_path: Path):
+    path = tmp_path / "checkpoint.json"
+    now_ms = int(time.time() * 1000)
+    payload = {
+        "format": 1,
+        "saved_at_ms": now_ms,
+        "version": 3,
+        "state": {"gps": {"fix": "3D"}, "unknown": {}},
+        "contacts": {
+            "remoteid": [{"contact": {"id": "old", "type": "REMOTE_ID"}, "expires_ms": now_ms - 1}],
+            "rf": [],
+            "fpv": [],
+            "replay": {"active": False, "source": "none"},
+        },
+    }
+    path.write_text(json.dumps(payload), encoding="utf-8")
+
+    async def run() -> None:
+        state_store = StateStore()
+        contact_store = ContactStore(state_store)
+        assert await StateCheckpointer(_config(path), state_store, contact_store).load() is True
+        snapshot = await state_store.snapshot()
+        assert snapshot.gps["fix"] == "3D"
+        assert snapshot.contacts == []
+
+        payload["saved_at_ms"] = now_ms - 7200 * 1000
+        path.write_text(json.dumps(payload), encoding="utf-8")
+        fresh = StateStore()
+        assert await StateCheckpointer(_config(path), fresh).load() is False
+
+    asyncio.run(run())
+
+
+def test_corrupt_checkpoint_starts_cold(tmp_path: Path):
+    path = tmp_path / "checkpoint.json"
+    now_ms = int(time.time() * 1000)
+    corrupt = [
+        {"format": 1, "saved_at_ms": None, "state": {"gps": {"fix": "3D"}}},
+        {"format": 1, "saved_at_ms": now_ms, "state": ["gps"]},
+        {
+            "format": 1,
+            "saved_at_ms": now_ms,
+            "state": {"gps": {"fix": "3D"}},
+            "contacts": {"remoteid": [{"contact": "r1"}], "rf": [7]},
+        },
+    ]
+
+    async def run() -> None:
+        for payload in corrupt:
+            path.write_text(json.dumps(payload), encoding="utf-8")
+            state_store = StateStore()
+            contact_store = ContactStore(state_store)
+            checkpointer = StateCheckpointer(_config(path), state_store, contact_store)
+            assert await checkpointer.load() is False
+            snapshot = await state_store.snapshot()
+            assert snapshot.gps.get("fix") != "3D"
+            assert await contact_store.remoteid_count() == 0
+
+    asyncio.run(run())
+
+
+def test_checkpoint_drops_rf_and_fpv_contacts_not_seen_recently(tmp_path: Path):
+    path = tmp_path / "checkpoint.json"
+    now_ms = int(time.time() * 1000)
+    stale_ms = now_ms - 600 * 1000
+    payload = {
+        "format": 1,
+        "saved_at_ms": now_ms,
+        "state": {},
+        "contacts": {
+            "remoteid": [],
+            "rf": [
+                {"id": "fresh", "type": "RF", "last_seen_ts": now_ms},
+                {"id": "ghost", "type": "RF", "last_seen_ts": stale_ms},
+            ],
+            "fpv": [{"id": "fpv-ghost", "type": "FPV", "last_seen_ts": stale_ms}],
+            "replay": {"active": False, "source": "none"},
+        },
+    }
+    path.write_text(json.dumps(payload), encoding="utf-8")
+
+    async def run() -> None:
+        state_store = StateStore()
+        contact_store = ContactStore(state_store)
+        assert await StateCheckpointer(_config(path), state_store, contact_store).load() is True
+        snapshot = await state_store.snapshot()
+        assert [contact["id"] for contact in snapshot.contacts] == ["fresh"]
+
+    asyncio.run(run())
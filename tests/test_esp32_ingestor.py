@@ -59,3 +59,27 @@ def test_esp32_command_ack_resolves_future():
         assert future.done()
 
     asyncio.run(run())
+
+
+def test_esp32_disconnect_patches_vrx_sys_only():
+    expected_selected = 2
+    config = get_config()
+    state_store = StateStore()
+    event_bus = EventBus()
+    ingestor = Esp32Ingestor(config, state_store, event_bus)
+
+    async def run() -> None:
+        await state_store.update_section(
+            "vrx",
+            {"selected": expected_selected, "vrx": [{"id": 2}], "sys": {"heap": 1}},
+        )
+        await ingestor._report_disconnected("serial_port_not_found")
+        snapshot = await state_store.snapshot()
+        assert snapshot.vrx["selected"] == expected_selected
+        assert snapshot.vrx["sys"] == {
+            "heap": 1,
+            "status": "DISCONNECTED",
+            "last_error": "serial_port_not_found",
+        }
+
+    asyncio.run(run())
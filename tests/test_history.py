@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from ndefender_backend_aggregator.config import HistoryConfig, HistoryTierConfig
+from ndefender_backend_aggregator.history import HistoryStore
+from ndefender_backend_aggregator.main import create_app
+from ndefender_backend_aggregator.state import StateChange, StateStore
+
+HTTP_OK = 200
+HTTP_NOT_FOUND = 404
+FINE_STEP_MS = 1000
+COARSE_STEP_MS = 10000
+
+
+def _history(fields: list[str], fine_retention_s: int = 60) -> HistoryStore:
+    config = HistoryConfig(
+        enabled=True,
+        fields=fields,
+        tiers=[
+            HistoryTierConfig(step_ms=1000, retention_seconds=fine_retention_s),
+            HistoryTierConfig(step_ms=10000, retention_seconds=600),
+        ],
+    )
+    return HistoryStore(config, StateStore())
+
+
+def test_history_downsamples_and_averages():
+    history = _history(["power.soc_percent"])
+    now_ms = int(time.time() * 1000) // 10000 * 10000
+    for second in range(20):
+        history.record("power.soc_percent", now_ms - 20000 + second * 1000, second)
+    history.record("power.soc_percent", now_ms, True)
+
+    fine = history.query("power.soc_percent", now_ms - 5000, now_ms)
+    assert fine["step_ms"] == FINE_STEP_MS
+    assert [value for _, value in fine["points"]] == [15.0, 16.0, 17.0, 18.0, 19.0]
+
+    coarse = history.query("power.soc_percent", now_ms - 20000, now_ms, step_ms=10000)
+    assert coarse["step_ms"] == COARSE_STEP_MS
+    assert coarse["points"] == [[now_ms - 20000, 4.5], [now_ms - 10000, 14.5]]
+
+    old = history.query("power.soc_percent", now_ms - 60000, now_ms)
+    assert old["step_ms"] == COARSE_STEP_MS
+
+
+def test_history_ring_overwrites_oldest():
+    history = _history(["gps.satellites"], fine_retention_s=10)
+    now_ms = int(time.time() * 1000) // 1000 * 1000
+    for second in range(30):
+        history.record("gps.satellites", now_ms - 30000 + second * 1000, 1)
+    fine = history.query("gps.satellites", now_ms - 9000, now_ms, step_ms=1000)
+    assert len(fine["points"]) == len(range(9))
+
+
+def test_history_fed_from_state_changes_including_derived_fpv():
+    history = _history(["system.cpu_temp_c", "fpv.rssi_raw"])
+    now_ms = int(time.time() * 1000)
+    history.apply_change(
+        StateChange(
+            version=1,
+            timestamp_ms=now_ms,
+            sections={
+                "system": {"cpu_temp_c": 50.5},
+                "vrx": {"selected": 1, "vrx": [{"id": 1, "rssi_raw": 210}]},
+            },
+        )
+    )
+    expected_temp = 50.5
+    expected_rssi = 210.0
+    temp = history.query("system.cpu_temp_c", now_ms - 1000, now_ms)
+    rssi = history.query("fpv.rssi_raw", now_ms - 1000, now_ms)
+    assert temp["points"][0][1] == expected_temp
+    assert rssi["points"][0][1] == expected_rssi
+
+
+def test_history_endpoint():
+    app = create_app()
+    with TestClient(app) as client:
+        client.portal.call(app.state.state_store.patch_section, "power", {"soc_percent": 80})
+        client.portal.call(asyncio.sleep, 0.05)
+        response = client.get("/api/v1/history/power/soc_percent")
+        assert response.status_code == HTTP_OK
+        expected_soc = 80.0
+        assert response.json()["points"][-1][1] == expected_soc
+        response = client.get("/api/v1/history/power/unknown")
+        assert response.status_code == HTTP_NOT_FOUND
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from pathlib import Path
+
+from ndefender_backend_aggregator.bus import EventBus
+from ndefender_backend_aggregator.config import JournalConfig
+from ndefender_backend_aggregator.journal import EventJournal
+from ndefender_backend_aggregator.models import EventEnvelope
+
+
+def _config(directory: Path, **overrides) -> JournalConfig:
+    values = {
+        "enabled": True,
+        "directory": str(directory),
+        "segment_max_bytes": 4096,
+        "segment_max_age_s": 3600,
+        "flush_interval_ms": 10,
+        "fsync_policy": "batch",
+        "fsync_interval_ms": 0,
+        "max_bytes_per_s": 1024 * 1024,
+        "max_total_mb": 16,
+    }
+    values.update(overrides)
+    return JournalConfig(**values)
+
+
+def _event(event_type: str, index: int) -> EventEnvelope:
+    return EventEnvelope(
+        type=event_type,
+        timestamp_ms=index,
+        source="esp32",
+        data={"index": index, "padding": "x" * 100},
+    )
+
+
+def test_journal_rotates_segments_and_reads_ranges(tmp_path: Path):
+    expected_events = 100
+    directory = tmp_path / "journal"
+
+    async def run() -> None:
+        bus = EventBus()
+        journal = EventJournal(_config(directory), bus)
+        await journal.start()
+        start_ms = int(time.time() * 1000)
+        for index in range(expected_events):
+            await bus.publish(_event("ESP32_TELEMETRY", index))
+        await bus.publish(_event("COMMAND_ACK", expected_events))
+        await journal.stop()
+        end_ms = int(time.time() * 1000)
+
+        assert len(list(directory.glob("segment-*.jsonl"))) > 1
+        assert journal.stats()["written"] == expected_events + 1
+        events = await journal.read_range(start_ms, end_ms, limit=1000)
+        assert [event["data"]["index"] for event in events] == list(range(expected_events + 1))
+        acks = await journal.read_range(start_ms, end_ms, types=frozenset({"COMMAND_ACK"}))
+        assert [event["seq"] for event in acks] == [expected_events + 1]
+
+        reopened = EventJournal(_config(directory), EventBus())
+        await reopened.start()
+        assert len(await reopened.read_range(start_ms, end_ms, limit=1000)) == expected_events + 1
+        await reopened.stop()
+
+    asyncio.run(run())
+
+
+def test_journal_range_read_keeps_whole_same_ms_batch(tmp_path: Path):
+    expected_events = 200
+
+    async def run() -> None:
+        bus = EventBus()
+        journal = EventJournal(_config(tmp_path, segment_max_bytes=1024 * 1024), bus)
+        await journal.start()
+        for index in range(expected_events):
+            await bus.publish(
+                EventEnvelope(
+                    type="ESP32_TELEMETRY",
+                    timestamp_ms=index,
+                    source="esp32",
+                    data={"index": index, "padding": "x" * 500},
+                )
+            )
+        await journal.stop()
+
+        events = await journal.read_range(0, int(time.time() * 1000), limit=1000)
+        batch_ms = events[0]["journal_ms"]
+        assert {event["journal_ms"] for event in events} == {batch_ms}
+        batch = await journal.read_range(batch_ms, batch_ms, limit=1000)
+        assert [event["data"]["index"] for event in batch] == list(range(expected_events))
+
+    asyncio.run(run())
+
+
+def test_journal_caps_throughput_but_keeps_high_priority(tmp_path: Path):
+    max_bytes_per_s = 1024
+    ack_line_allowance = 512
+
+    async def run() -> None:
+        bus = EventBus()
+        journal = EventJournal(_config(tmp_path, max_bytes_per_s=max_bytes_per_s), bus)
+        await journal.start()
+        for index in range(50):
+            await bus.publish(_event("ESP32_TELEMETRY", index))
+        await bus.publish(_event("COMMAND_ACK", 50))
+        await journal.stop()
+        stats = journal.stats()
+        assert stats["dropped"] > 0
+        assert stats["bytes_written"] <= max_bytes_per_s + ack_line_allowance
+        events = await journal.read_range(0, int(time.time() * 1000), limit=1000)
+        assert events[-1]["type"] == "COMMAND_ACK"
+
+    asyncio.run(run())
@@ -1,3 +1,5 @@
+import json
+
 from ndefender_backend_aggregator.models import EventEnvelope, StatusSnapshot
 
 
@@ -27,3 +29,11 @@ def test_event_envelope():
         data={"ok": True},
     )
     assert envelope.type == "SYSTEM_UPDATE"
+
+
+def test_event_envelope_encoded_is_cached_per_seq():
+    envelope = EventEnvelope(type="SYSTEM_UPDATE", timestamp_ms=1, source="aggregator", data={})
+    first = envelope.encoded()
+    assert envelope.encoded() is first
+    envelope.seq = 7
+    assert json.loads(envelope.encoded())["seq"] == envelope.seq
@@ -0,0 +1,20 @@
+from ndefender_backend_aggregator.patches import apply_patch, make_patch
+
+
+def test_make_patch_emits_minimal_ops():
+    old = {"gps": {"fix": "2D", "satellites": 5}, "contacts": [{"id": "a"}], "a/b": 1}
+    new = {"gps": {"fix": "2D", "satellites": 6}, "contacts": [], "a/b": 1, "x": None}
+    ops = make_patch(old, new)
+    assert {"op": "replace", "path": "/gps/satellites", "value": 6} in ops
+    assert {"op": "remove", "path": "/contacts/0"} in ops
+    assert {"op": "add", "path": "/x", "value": None} in ops
+    assert len(ops) == len({"satellites", "contacts", "x"})
+
+
+def test_apply_patch_round_trips():
+    old = {"list": [1, 2, 3], "nested": {"k~": {"v": True}}, "gone": 1}
+    new = {"list": [1, 5], "nested": {"k~": {"v": False, "w": [1]}}, "new": "x"}
+    patched = apply_patch(old, make_patch(old, new))
+    assert patched == new
+    assert old["list"] == [1, 2, 3]
+    assert make_patch(new, new) == []
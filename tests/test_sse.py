@@ -0,0 +1,48 @@
+import asyncio
+
+from ndefender_backend_aggregator.bus import EventBus
+from ndefender_backend_aggregator.models import EventEnvelope
+from ndefender_backend_aggregator.sse import event_stream
+
+
+def _event(event_type: str, index: int) -> EventEnvelope:
+    return EventEnvelope(type=event_type, timestamp_ms=index, source="esp32", data={"i": index})
+
+
+def test_event_stream_resumes_filters_and_keeps_alive():
+    async def run() -> None:
+        bus = EventBus()
+        for index in range(3):
+            await bus.publish(_event("LOG_EVENT" if index % 2 else "COMMAND_ACK", index))
+        stream = event_stream(
+            bus,
+            types=frozenset({"COMMAND_ACK"}),
+            last_event_id=1,
+            keepalive_s=0.01,
+        )
+        assert (await anext(stream)).startswith("retry:")
+        assert await anext(stream) == (
+            f"id: 3\nevent: COMMAND_ACK\ndata: {bus.events_since(2)[0].encoded()}\n\n"
+        )
+        await bus.publish(_event("LOG_EVENT", 3))
+        assert await anext(stream) == ": keepalive\n\n"
+        await bus.publish(_event("COMMAND_ACK", 4))
+        assert (await anext(stream)).startswith("id: 5\n")
+        await stream.aclose()
+        assert bus.stats()["subscribers"] == []
+
+    asyncio.run(run())
+
+
+def test_event_stream_reports_unreplayable_gap():
+    async def run() -> None:
+        bus = EventBus(max_queue_size=1)
+        for index in range(3):
+            await bus.publish(_event("LOG_EVENT", index))
+        stream = event_stream(bus, last_event_id=0)
+        await anext(stream)
+        frame = await anext(stream)
+        assert frame.startswith("event: RESYNC_REQUIRED\n")
+        await stream.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,214 @@
+import asyncio
+
+import pytest
+
+from ndefender_backend_aggregator.state import StateStore
+
+
+def test_patch_section_merges_fields():
+    expected_satellites = 9
+    state_store = StateStore()
+
+    async def run() -> None:
+        await state_store.update_section("gps", {"fix": "3D", "satellites": 7})
+        await state_store.patch_section("gps", {"satellites": expected_satellites})
+        snapshot = await state_store.snapshot()
+        assert snapshot.gps["fix"] == "3D"
+        assert snapshot.gps["satellites"] == expected_satellites
+
+    asyncio.run(run())
+
+
+def test_patch_section_rejects_unknown_and_list_sections():
+    state_store = StateStore()
+
+    async def run() -> None:
+        with pytest.raises(KeyError):
+            await state_store.patch_section("nope", {"a": 1})
+        with pytest.raises(TypeError):
+            await state_store.patch_section("contacts", {"a": 1})
+
+    asyncio.run(run())
+
+
+def test_modify_section_is_isolated_from_failures():
+    state_store = StateStore()
+
+    def boom(section: dict) -> dict:
+        section["status"] = "broken"
+        raise RuntimeError("boom")
+
+    async def run() -> None:
+        await state_store.update_section("audio", {"muted": False, "status": "ok"})
+        with pytest.raises(RuntimeError):
+            await state_store.modify_section("audio", boom)
+        await state_store.modify_section("audio", lambda section: {**section, "muted": True})
+        snapshot = await state_store.snapshot()
+        assert snapshot.audio["status"] == "ok"
+        assert snapshot.audio["muted"] is True
+
+    asyncio.run(run())
+
+
+def test_transaction_commits_once():
+    state_store = StateStore()
+
+    async def run() -> None:
+        start = state_store.version
+        async with state_store.transaction() as txn:
+            txn.update_section("system", {"status": "ok"})
+            txn.patch_section("network", {"connected": True})
+            txn.modify_section("services", lambda services: [*services, {"name": "x"}])
+            assert state_store.version == start
+        assert state_store.version == start + 1
+        snapshot = await state_store.snapshot()
+        assert snapshot.system["status"] == "ok"
+        assert snapshot.network["connected"] is True
+        assert snapshot.services == [{"name": "x"}]
+
+    asyncio.run(run())
+
+
+def test_transaction_discards_staged_writes_on_error():
+    state_store = StateStore()
+
+    async def run() -> None:
+        start = state_store.version
+        with pytest.raises(TypeError):
+            async with state_store.transaction() as txn:
+                txn.update_section("system", {"status": "ok"})
+                txn.patch_section("contacts", {"a": 1})
+        with pytest.raises(RuntimeError):
+            async with state_store.transaction() as txn:
+                txn.update_section("system", {"status": "ok"})
+                raise RuntimeError("abort")
+        with pytest.raises(KeyError):
+            async with state_store.transaction() as txn:
+                txn.update_section("nope", {})
+        assert state_store.version == start
+        snapshot = await state_store.snapshot()
+        assert snapshot.system["status"] == "degraded"
+
+    asyncio.run(run())
+
+
+def test_change_notifications_fire_once_per_commit():
+    state_store = StateStore()
+
+    async def run() -> None:
+        everything = state_store.subscribe_changes()
+        gps_only = state_store.subscribe_changes(["gps"])
+        async with state_store.transaction() as txn:
+            txn.update_section("system", {"status": "ok"})
+            txn.update_section("gps", {"fix": "3D"})
+        await state_store.update_section("audio", {"muted": True})
+
+        change = everything.get_nowait()
+        assert change.version == state_store.version - 1
+        assert set(change.sections) == {"system", "gps"}
+        assert everything.get_nowait().sections == {"audio": {"muted": True}}
+        assert everything.empty()
+
+        gps_change = gps_only.get_nowait()
+        assert gps_change.sections == {"gps": {"fix": "3D"}}
+        assert gps_only.empty()
+
+        state_store.unsubscribe_changes(everything)
+        await state_store.update_section("audio", {"muted": False})
+        assert everything.empty()
+
+    asyncio.run(run())
+
+
+def test_dirty_flag_is_set_by_commits_without_queueing():
+    state_store = StateStore()
+
+    async def run() -> None:
+        dirty = state_store.subscribe_dirty()
+        assert not dirty.is_set()
+        for volume in range(3):
+            await state_store.patch_section("audio", {"volume_percent": volume})
+        assert dirty.is_set()
+        dirty.clear()
+
+        state_store.unsubscribe_dirty(dirty)
+        await state_store.update_section("audio", {"muted": True})
+        assert not dirty.is_set()
+
+    asyncio.run(run())
+
+
+def test_changes_since_returns_only_changed_sections():
+    expected_freq = 5
+    state_store = StateStore()
+
+    async def run() -> None:
+        await state_store.update_section("gps", {"fix": "3D"})
+        since = state_store.version
+        await state_store.update_section(
+            "vrx",
+            {"selected": 1, "vrx": [{"id": 1, "freq_hz": expected_freq}]},
+        )
+        version, changed = await state_store.changes_since(since)
+        assert version == state_store.version
+        assert set(changed) == {"vrx", "fpv"}
+        assert changed["fpv"]["freq_hz"] == expected_freq
+        _, nothing = await state_store.changes_since(version)
+        assert nothing == {}
+        _, resync = await state_store.changes_since(version + 100, ["gps"])
+        assert resync["gps"]["fix"] == "3D"
+
+    asyncio.run(run())
+
+
+def test_wait_for_change_wakes_only_for_requested_sections():
+    state_store = StateStore()
+
+    async def run() -> None:
+        await state_store.update_section("gps", {"fix": "2D"})
+        since = state_store.version
+        gps_waiter = asyncio.create_task(state_store.wait_for_change(since, 1.0, ["gps"]))
+        await asyncio.sleep(0)
+        await state_store.update_section("audio", {"muted": True})
+        await asyncio.sleep(0)
+        assert not gps_waiter.done()
+        await state_store.update_section("gps", {"fix": "3D"})
+        assert await gps_waiter is True
+        assert await state_store.wait_for_change(state_store.version, 0.01) is False
+
+    asyncio.run(run())
+
+
+def test_snapshot_validation_is_optional():
+    async def run() -> None:
+        relaxed = await StateStore(strict_validation=False).snapshot()
+        strict = await StateStore(strict_validation=True).snapshot()
+        relaxed_dump = relaxed.model_dump()
+        strict_dump = strict.model_dump()
+        relaxed_dump.pop("timestamp_ms")
+        strict_dump.pop("timestamp_ms")
+        assert relaxed_dump == strict_dump
+
+    asyncio.run(run())
+
+
+def test_digest_hashes_change_only_with_their_section():
+    async def run() -> None:
+        store = StateStore()
+        await store.update_section("contacts", [{"id": "a", "type": "RF"}])
+        before = await store.digest()
+        await store.patch_section("audio", {"volume_percent": 3})
+        after = await store.digest()
+
+        assert after.version == before.version + 1
+        changed = {
+            name
+            for name, digest_hash in after.section_hashes.items()
+            if before.section_hashes[name] != digest_hash
+        }
+        assert changed == {"audio"}
+        assert "contacts" not in after.section_hashes
+        assert after.contact_revs == before.contact_revs
+        assert set(after.contact_revs) == {"a"}
+
+    asyncio.run(run())
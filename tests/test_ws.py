@@ -0,0 +1,196 @@
+from fastapi.testclient import TestClient
+
+from ndefender_backend_aggregator.main import create_app
+from ndefender_backend_aggregator.models import EventEnvelope
+from ndefender_backend_aggregator.patches import apply_patch
+
+
+def _receive_until(websocket, predicate, limit=50):
+    for _ in range(limit):
+        message = websocket.receive_json()
+        if predicate(message):
+            return message
+    raise AssertionError("expected message not received")
+
+
+def test_ws_state_patches_keep_snapshot_in_sync():
+    expected_volume = 37
+    app = create_app()
+    with (
+        TestClient(app) as client,
+        client.websocket_connect(
+            "/api/v1/ws?state_patches=1",
+            headers={"origin": "https://www.figma.com"},
+        ) as websocket,
+    ):
+        hello = websocket.receive_json()
+        assert hello["type"] == "HELLO"
+        version = hello["data"]["state_version"]
+        snapshot = websocket.receive_json()
+        assert snapshot["type"] == "SYSTEM_UPDATE"
+        document = snapshot["data"]
+
+        client.portal.call(
+            app.state.state_store.patch_section,
+            "audio",
+            {"volume_percent": expected_volume},
+        )
+        while document["audio"].get("volume_percent") != expected_volume:
+            message = _receive_until(websocket, lambda m: m["type"] == "STATE_PATCH")
+            if message["data"]["version"] <= version:
+                continue
+            assert message["data"]["base_version"] <= version
+            document = apply_patch(document, message["data"]["patch"])
+            version = message["data"]["version"]
+
+
+def _publish(client, app, count):
+    for index in range(count):
+        event = EventEnvelope(
+            type="ESP32_TELEMETRY",
+            timestamp_ms=index,
+            source="esp32",
+            data={"index": index},
+        )
+        client.portal.call(app.state.event_bus.publish, event)
+
+
+def test_ws_resume_replays_missed_events():
+    expected_seqs = [2, 3]
+    app = create_app()
+    with TestClient(app) as client:
+        _publish(client, app, 3)
+        with client.websocket_connect(
+            "/api/v1/ws?resume_from=1",
+            headers={"origin": "https://www.figma.com"},
+        ) as websocket:
+            hello = websocket.receive_json()
+            assert hello["type"] == "HELLO"
+            assert hello["data"]["event_seq"] == expected_seqs[-1]
+            replayed = [websocket.receive_json() for _ in expected_seqs]
+            assert [message["seq"] for message in replayed] == expected_seqs
+            assert all(message["type"] == "ESP32_TELEMETRY" for message in replayed)
+
+
+def test_ws_resume_outside_window_requires_resync():
+    app = create_app()
+    with TestClient(app) as client:
+        _publish(client, app, 1)
+        with client.websocket_connect(
+            "/api/v1/ws?resume_from=99",
+            headers={"origin": "https://www.figma.com"},
+        ) as websocket:
+            assert websocket.receive_json()["type"] == "HELLO"
+            resync = websocket.receive_json()
+            assert resync["type"] == "RESYNC_REQUIRED"
+            assert resync["data"]["latest_seq"] == 1
+            assert websocket.receive_json()["type"] == "SYSTEM_UPDATE"
+
+
+def test_ws_negotiates_json_subprotocol_and_filters():
+    expected_id = 7
+    app = create_app()
+    with (
+        TestClient(app) as client,
+        client.websocket_connect(
+            "/api/v1/ws",
+            subprotocols=["x-unknown", "json"],
+            headers={"origin": "https://www.figma.com"},
+        ) as websocket,
+    ):
+        assert websocket.accepted_subprotocol == "json"
+        websocket.send_json({"action": "subscribe", "id": expected_id, "types": ["COMMAND_ACK"]})
+        ack = _receive_until(websocket, lambda m: m["type"] == "SUBSCRIPTION_ACK")
+        assert ack["data"]["ok"] is True
+        assert ack["data"]["id"] == expected_id
+
+
+def test_ws_binary_control_frames_are_answered_not_fatal():
+    expected_id = 4
+    app = create_app()
+    with (
+        TestClient(app) as client,
+        client.websocket_connect(
+            "/api/v1/ws", headers={"origin": "https://www.figma.com"}
+        ) as websocket,
+    ):
+        websocket.send_bytes(b"\xff\x00")
+        rejected = _receive_until(websocket, lambda m: m["type"] == "SUBSCRIPTION_ACK")
+        assert rejected["data"]["ok"] is False
+        websocket.send_bytes(b'{"action": "subscribe", "id": 4, "types": ["COMMAND_ACK"]}')
+        ack = _receive_until(websocket, lambda m: m["type"] == "SUBSCRIPTION_ACK")
+        assert (ack["data"]["id"], ack["data"]["ok"]) == (expected_id, True)
+
+
+def test_ws_delta_sync_sends_only_changed_sections_and_contact_diff():
+    expected_volume = 41
+    app = create_app()
+    state_store = app.state.state_store
+    with TestClient(app) as client:
+        client.portal.call(
+            state_store.update_section,
+            "contacts",
+            [{"id": "keep", "type": "RF"}, {"id": "gone", "type": "RF"}],
+        )
+        digest = client.portal.call(state_store.digest)
+        client.portal.call(
+            state_store.update_section,
+            "contacts",
+            [{"id": "keep", "type": "RF"}, {"id": "new", "type": "REMOTE_ID"}],
+        )
+        client.portal.call(state_store.patch_section, "audio", {"volume_percent": expected_volume})
+        with client.websocket_connect(
+            "/api/v1/ws?sync=1",
+            headers={"origin": "https://www.figma.com"},
+        ) as websocket:
+            websocket.send_json(
+                {
+                    "action": "sync",
+                    "state_version": digest.version,
+                    "section_hashes": digest.section_hashes,
+                    "contact_revs": digest.contact_revs,
+                }
+            )
+            assert websocket.receive_json()["type"] == "HELLO"
+            sync = websocket.receive_json()
+        assert sync["type"] == "STATE_SYNC"
+        assert "audio" in sync["data"]["sections"]
+        assert sync["data"]["sections"]["audio"]["volume_percent"] == expected_volume
+        # Live ingestors may touch other sections meanwhile; untouched ones are omitted.
+        assert "replay" not in sync["data"]["sections"]
+        assert len(sync["data"]["sections"]) < len(digest.section_hashes)
+        contacts = sync["data"]["contacts"]
+        assert [contact["id"] for contact in contacts["upsert"]] == ["new"]
+        assert contacts["remove"] == ["gone"]
+        assert set(contacts["revs"]) == {"new"}
+
+
+def test_ws_clients_endpoint_is_local_only_and_reports_each_connection():
+    expected_forbidden = 403
+    with TestClient(create_app()) as remote:
+        assert remote.get("/api/v1/ws/clients").status_code == expected_forbidden
+    with TestClient(create_app(), client=("127.0.0.1", 50000)) as tunnelled:
+        for header in ("cf-connecting-ip", "x-forwarded-for"):
+            response = tunnelled.get("/api/v1/ws/clients", headers={header: "203.0.113.9"})
+            assert response.status_code == expected_forbidden
+    app = create_app()
+    with (
+        TestClient(app, client=("127.0.0.1", 50000)) as client,
+        client.websocket_connect(
+            "/api/v1/ws", headers={"origin": "https://www.figma.com"}
+        ) as websocket,
+    ):
+        websocket.send_json({"action": "subscribe", "id": 1, "sources": ["esp32"]})
+        _receive_until(websocket, lambda m: m["type"] == "SUBSCRIPTION_ACK")
+        clients = client.get("/api/v1/ws/clients").json()["clients"]
+        metrics = client.get("/api/v1/metrics/ws").json()
+
+    assert len(clients) == 1
+    stats = clients[0]
+    assert stats["address"] == "127.0.0.1"
+    assert stats["origin"] == "https://www.figma.com"
+    assert stats["sent"] > 0
+    assert stats["bytes_sent"] > stats["sent"]
+    assert stats["subscription"]["sources"]["include"] == ["esp32"]
+    assert metrics["connections"] == 1
+    assert "clients" not in metrics
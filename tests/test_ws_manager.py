@@ -0,0 +1,492 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from ndefender_backend_aggregator import ws_codecs
+from ndefender_backend_aggregator.main import _stream_state_patches
+from ndefender_backend_aggregator.models import EventEnvelope
+from ndefender_backend_aggregator.state import StateStore
+from ndefender_backend_aggregator.ws import (
+    CLOSE_HEARTBEAT_TIMEOUT,
+    CLOSE_OVER_CAPACITY,
+    CLOSE_RATE_LIMITED,
+    CLOSE_SLOW_CONSUMER,
+    AdmissionControl,
+    WebSocketManager,
+    client_host,
+)
+
+
+class FakeWebSocket:
+    def __init__(self, blocked: bool = False, host: str | None = None) -> None:
+        self.client = SimpleNamespace(host=host, port=0) if host else None
+        self.headers: dict[str, str] = {}
+        self.frames: list[str] = []
+        self.binary_frames: list[bytes] = []
+        self.subprotocol: str | None = None
+        self.closed_with: int | None = None
+        self.close_reason = ""
+        self.unblock = asyncio.Event()
+        if not blocked:
+            self.unblock.set()
+
+    async def accept(self, subprotocol: str | None = None) -> None:
+        self.subprotocol = subprotocol
+
+    async def send_text(self, data: str) -> None:
+        await self.unblock.wait()
+        self.frames.append(data)
+
+    async def send_bytes(self, data: bytes) -> None:
+        await self.unblock.wait()
+        self.binary_frames.append(data)
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        self.closed_with = code
+        self.close_reason = reason
+
+
+def _event(event_type: str, seq: int, source: str = "esp32") -> EventEnvelope:
+    return EventEnvelope(type=event_type, timestamp_ms=seq, source=source, data={}, seq=seq)
+
+
+async def _connected(manager: WebSocketManager, websocket: FakeWebSocket) -> None:
+    await manager.connect(websocket)  # type: ignore[arg-type]
+    await manager.send_preamble(websocket)  # type: ignore[arg-type]
+
+
+def test_slow_client_does_not_delay_others_and_conflates():
+    expected_queue = 2
+    expected_fast_frames = 8  # HELLO, SYSTEM_UPDATE, 5 telemetry, COMMAND_ACK
+
+    async def run() -> None:
+        manager = WebSocketManager(StateStore(), send_queue_size=expected_queue)
+        fast, slow = FakeWebSocket(), FakeWebSocket(blocked=True)
+        await _connected(manager, fast)
+        await _connected(manager, slow)
+        await asyncio.sleep(0)
+        for seq in range(1, 6):
+            await manager.broadcast(_event("ESP32_TELEMETRY", seq))
+            await asyncio.sleep(0)
+        await manager.broadcast(_event("COMMAND_ACK", 6))
+        await asyncio.sleep(0.01)
+
+        assert len(fast.frames) == expected_fast_frames
+        slow_stats = manager.clients()[1]
+        assert slow_stats["sent"] == 0
+        assert slow_stats["conflated"] > 0
+        assert slow_stats["queued"] <= expected_queue + 1
+        slow.unblock.set()
+        await asyncio.sleep(0.01)
+        assert '"COMMAND_ACK"' in slow.frames[2]
+        for websocket in (fast, slow):
+            await manager.disconnect(websocket)  # type: ignore[arg-type]
+
+    asyncio.run(run())
+
+
+def test_ack_overtakes_queued_updates():
+    async def run() -> None:
+        manager = WebSocketManager(StateStore())
+        slow = FakeWebSocket(blocked=True)
+        await _connected(manager, slow)
+        for seq in range(1, 4):
+            await manager.broadcast(_event("ESP32_TELEMETRY", seq))
+        await manager.broadcast(_contact("RF_CONTACT_UPDATE", 4, "a"))
+        await manager.broadcast(_event("COMMAND_ACK", 5))
+        await manager.broadcast(_contact("RF_CONTACT_LOST", 6, "a"))
+        slow.unblock.set()
+        await asyncio.sleep(0.01)
+
+        received = [json.loads(frame)["type"] for frame in slow.frames]
+        assert received == [
+            "HELLO",
+            "SYSTEM_UPDATE",
+            "COMMAND_ACK",
+            "RF_CONTACT_UPDATE",
+            "RF_CONTACT_LOST",
+            "ESP32_TELEMETRY",
+            "ESP32_TELEMETRY",
+            "ESP32_TELEMETRY",
+        ]
+        await manager.disconnect(slow)  # type: ignore[arg-type]
+
+    asyncio.run(run())
+
+
+def test_disconnect_policy_evicts_slow_client():
+    async def run() -> None:
+        manager = WebSocketManager(
+            StateStore(),
+            send_queue_size=1,
+            slow_consumer_policy="disconnect",
+        )
+        slow = FakeWebSocket(blocked=True)
+        await _connected(manager, slow)
+        for seq in range(1, 4):
+            await manager.broadcast(_event("RF", seq))
+        slow.unblock.set()
+        await asyncio.sleep(0.01)
+        assert slow.closed_with == CLOSE_SLOW_CONSUMER
+        assert manager.stats()["evicted"] == 1
+        assert manager.stats()["connections"] == 0
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("policy", ["conflate", "drop", "disconnect"])
+def test_stalled_client_still_gets_the_preamble(policy: str):
+    queue_size = 2
+
+    async def run() -> None:
+        manager = WebSocketManager(
+            StateStore(), send_queue_size=queue_size, slow_consumer_policy=policy
+        )
+        stalled = FakeWebSocket(blocked=True)
+        await _connected(manager, stalled)
+        for seq in range(1, queue_size + 2):
+            if policy == "disconnect" and seq > queue_size:
+                break
+            await manager.broadcast(_contact("RF_CONTACT_UPDATE", seq, f"rf{seq}"))
+        stalled.unblock.set()
+        await asyncio.sleep(0.01)
+
+        received = [json.loads(frame)["type"] for frame in stalled.frames]
+        assert received[:2] == ["HELLO", "SYSTEM_UPDATE"]
+        assert received[2:] == ["RF_CONTACT_UPDATE"] * queue_size
+        assert stalled.closed_with is None
+        await manager.disconnect(stalled)  # type: ignore[arg-type]
+
+    asyncio.run(run())
+
+
+def test_control_messages_filter_broadcasts_and_ack():
+    async def run() -> None:
+        manager = WebSocketManager(StateStore())
+        websocket = FakeWebSocket()
+        await _connected(manager, websocket)
+        await manager.handle_control(  # type: ignore[arg-type]
+            websocket,
+            json.dumps(
+                {"action": "subscribe", "id": "map", "types": ["CONTACT_NEW", "RF_CONTACT_NEW"]}
+            ),
+        )
+        await manager.handle_control(  # type: ignore[arg-type]
+            websocket, json.dumps({"action": "unsubscribe", "contact_types": ["RF"]})
+        )
+        await manager.handle_control(websocket, '{"action": "jump"}')  # type: ignore[arg-type]
+        await manager.broadcast(_event("ESP32_TELEMETRY", 1))
+        await manager.broadcast(_event("RF_CONTACT_NEW", 2, source="antsdr"))
+        await manager.broadcast(_event("CONTACT_NEW", 3, source="remoteid"))
+        await asyncio.sleep(0.01)
+
+        frames = [json.loads(frame) for frame in websocket.frames[2:]]
+        assert [frame["type"] for frame in frames] == [
+            "SUBSCRIPTION_ACK",
+            "SUBSCRIPTION_ACK",
+            "SUBSCRIPTION_ACK",
+            "CONTACT_NEW",
+        ]
+        assert frames[0]["data"]["id"] == "map"
+        assert frames[1]["data"]["filter"]["contact_types"]["exclude"] == ["RF"]
+        assert frames[2]["data"]["ok"] is False
+
+        await manager.handle_control(websocket, '{"action": "reset"}')  # type: ignore[arg-type]
+        await manager.broadcast(_event("ESP32_TELEMETRY", 4))
+        await asyncio.sleep(0.01)
+        assert json.loads(websocket.frames[-1])["type"] == "ESP32_TELEMETRY"
+        await manager.disconnect(websocket)  # type: ignore[arg-type]
+
+    asyncio.run(run())
+
+
+def test_negotiate_prefers_client_order_and_falls_back():
+    assert ws_codecs.negotiate(["v2.proto", "JSON"]) == "JSON"
+    assert ws_codecs.encoding_for("JSON") == ws_codecs.JSON
+    assert ws_codecs.encoding_for(None) == ws_codecs.JSON
+    assert ws_codecs.negotiate(["v2.proto"]) is None
+    assert ws_codecs.negotiate([]) is None
+
+
+def test_connect_echoes_the_offered_subprotocol_token():
+    async def run() -> None:
+        manager = WebSocketManager(StateStore())
+        websocket = FakeWebSocket()
+        subprotocol = ws_codecs.negotiate(["JSON"])
+        await manager.connect(websocket, subprotocol=subprotocol)  # type: ignore[arg-type]
+        await manager.send_preamble(websocket)  # type: ignore[arg-type]
+        await asyncio.sleep(0.01)
+
+        assert websocket.subprotocol == "JSON"
+        assert manager.clients()[0]["encoding"] == ws_codecs.JSON
+        assert json.loads(websocket.frames[0])["type"] == "HELLO"
+        await manager.disconnect(websocket)  # type: ignore[arg-type]
+
+    asyncio.run(run())
+
+
+def test_binary_subprotocol_sends_bytes_frames():
+    msgpack = pytest.importorskip("msgpack")
+
+    async def run() -> None:
+        manager = WebSocketManager(StateStore())
+        websocket = FakeWebSocket()
+        subprotocol = ws_codecs.negotiate(["msgpack", "json"])
+        await manager.connect(websocket, subprotocol=subprotocol)  # type: ignore[arg-type]
+        await manager.send_preamble(websocket)  # type: ignore[arg-type]
+        await manager.broadcast(_event("ESP32_TELEMETRY", 1))
+        await asyncio.sleep(0.01)
+
+        assert websocket.subprotocol == "msgpack"
+        assert websocket.frames == []
+        decoded = [msgpack.unpackb(frame) for frame in websocket.binary_frames]
+        assert [frame["type"] for frame in decoded] == ["HELLO", "SYSTEM_UPDATE", "ESP32_TELEMETRY"]
+
+        control = msgpack.packb({"action": "subscribe", "id": 2, "types": ["COMMAND_ACK"]})
+        await manager.handle_control(websocket, control)  # type: ignore[arg-type]
+        await manager.handle_control(websocket, b"\xc1")  # type: ignore[arg-type]
+        await asyncio.sleep(0.01)
+        acks = [msgpack.unpackb(frame)["data"] for frame in websocket.binary_frames[3:]]
+        assert [(ack["id"], ack["ok"]) for ack in acks] == [(2, True), (None, False)]
+        await manager.disconnect(websocket)  # type: ignore[arg-type]
+
+    asyncio.run(run())
+
+
+def _contact(event_type: str, seq: int, contact_id: str) -> EventEnvelope:
+    return EventEnvelope(
+        type=event_type,
+        timestamp_ms=seq,
+        source="antsdr",
+        data={"id": contact_id},
+        seq=seq,
+    )
+
+
+def test_throttle_conflates_per_contact_and_keeps_lost_order():
+    expected_cap_hz = 20.0
+
+    async def run() -> None:
+        manager = WebSocketManager(
+            StateStore(),
+            conflate_types=["RF_CONTACT_UPDATE", "RF_CONTACT_LOST"],
+            conflate_max_hz=expected_cap_hz,
+        )
+        websocket = FakeWebSocket()
+        await _connected(manager, websocket)
+        for seq in range(1, 5):
+            await manager.broadcast(_contact("RF_CONTACT_UPDATE", seq, "a"))
+            await manager.broadcast(_contact("RF_CONTACT_UPDATE", seq + 10, "b"))
+        await manager.broadcast(_contact("RF_CONTACT_LOST", 20, "a"))
+        await asyncio.sleep(0.1)
+
+        frames = [json.loads(frame) for frame in websocket.frames[2:]]
+        contact_a = [(f["type"], f["seq"]) for f in frames if f["data"].get("id") == "a"]
+        contact_b = [f["seq"] for f in frames if f["data"].get("id") == "b"]
+        assert contact_a == [
+            ("RF_CONTACT_UPDATE", 1),
+            ("RF_CONTACT_UPDATE", 4),
+            ("RF_CONTACT_LOST", 20),
+        ]
+        assert contact_b == [11, 14]
+
+        await manager.handle_control(  # type: ignore[arg-type]
+            websocket, json.dumps({"action": "throttle", "max_hz": 100})
+        )
+        await asyncio.sleep(0.01)
+        ack = json.loads(websocket.frames[-1])
+        assert ack["data"]["throttle"]["max_hz"] == expected_cap_hz
+        assert ack["data"]["throttle"]["types"] == ["RF_CONTACT_UPDATE"]
+        await manager.disconnect(websocket)  # type: ignore[arg-type]
+
+    asyncio.run(run())
+
+
+def test_shared_heartbeat_reaps_clients_that_stop_ponging():
+    async def run() -> None:
+        manager = WebSocketManager(
+            StateStore(),
+            heartbeat_interval_s=0.01,
+            heartbeat_timeout_s=0.03,
+        )
+        silent, ponging = FakeWebSocket(), FakeWebSocket()
+        await _connected(manager, silent)
+        await _connected(manager, ponging)
+        await manager.handle_control(ponging, '{"action": "pong"}')  # type: ignore[arg-type]
+        await manager.start()
+        await asyncio.sleep(0.1)
+        await manager.stop()
+
+        assert ponging.closed_with == CLOSE_HEARTBEAT_TIMEOUT
+        assert silent.closed_with is None
+        heartbeats = [frame for frame in silent.frames if '"HEARTBEAT"' in frame]
+        assert len(heartbeats) > 1
+        assert manager.stats()["reaped"] == 1
+        await manager.disconnect(silent)  # type: ignore[arg-type]
+
+    asyncio.run(run())
+
+
+def test_connect_storm_shares_one_snapshot_build():
+    clients = 20
+    expected_builds = 2  # the storm, then one after the state changed
+
+    async def run() -> None:
+        state_store = StateStore()
+        manager = WebSocketManager(state_store)
+        sockets = [FakeWebSocket() for _ in range(clients)]
+        await asyncio.gather(*(_connected(manager, websocket) for websocket in sockets))
+        await asyncio.sleep(0.01)
+        assert manager.snapshot_builds == 1
+        assert len({websocket.frames[1] for websocket in sockets}) == 1
+
+        await state_store.update_section("audio", {"volume_percent": 5})
+        late = FakeWebSocket()
+        await _connected(manager, late)
+        await asyncio.sleep(0.01)
+        assert manager.snapshot_builds == expected_builds
+        assert '"volume_percent":5' in late.frames[1]
+        for websocket in [*sockets, late]:
+            await manager.disconnect(websocket)  # type: ignore[arg-type]
+
+    asyncio.run(run())
+
+
+def test_admission_caps_connections_and_reconnect_rate():
+    async def run() -> None:
+        manager = WebSocketManager(
+            StateStore(),
+            admission=AdmissionControl(max_connections=3, max_connections_per_ip=2),
+        )
+        first, second = FakeWebSocket(host="10.0.0.1"), FakeWebSocket(host="10.0.0.1")
+        other = FakeWebSocket(host="10.0.0.2")
+        for websocket in (first, second):
+            assert await manager.connect(websocket)  # type: ignore[arg-type]
+
+        third = FakeWebSocket(host="10.0.0.1")
+        assert not await manager.connect(third)  # type: ignore[arg-type]
+        assert (third.closed_with, third.close_reason) == (CLOSE_OVER_CAPACITY, "ip_limit")
+        assert await manager.connect(other)  # type: ignore[arg-type]
+        full = FakeWebSocket(host="10.0.0.3")
+        assert not await manager.connect(full)  # type: ignore[arg-type]
+        assert full.close_reason == "server_full"
+
+        await manager.disconnect(first)  # type: ignore[arg-type]
+        assert await manager.connect(third)  # type: ignore[arg-type]
+        admission = manager.stats()["admission"]
+        assert admission["rejected"] == {"server_full": 1, "ip_limit": 1, "rate_limited": 0}
+        for websocket in (second, other, third):
+            await manager.disconnect(websocket)  # type: ignore[arg-type]
+        assert manager.admission.per_ip == {}
+
+        limited = WebSocketManager(
+            StateStore(), admission=AdmissionControl(connect_rate_per_s=0.01, connect_burst=2)
+        )
+        sockets = [FakeWebSocket(host="10.0.0.4") for _ in range(3)]
+        results = [await limited.connect(websocket) for websocket in sockets]  # type: ignore[arg-type]
+        assert results == [True, True, False]
+        assert sockets[2].closed_with == CLOSE_RATE_LIMITED
+        assert await limited.connect(FakeWebSocket(host="10.0.0.5"))  # type: ignore[arg-type]
+
+    asyncio.run(run())
+
+
+def test_capacity_rejects_do_not_spend_connect_rate():
+    host = "10.0.0.6"
+    admission = AdmissionControl(max_connections_per_ip=1, connect_rate_per_s=0.01, connect_burst=2)
+    assert admission.check(host) is None
+    assert [admission.check(host) for _ in range(3)] == ["ip_limit"] * 3
+    admission.release(host)
+    assert admission.check(host) is None
+    assert admission.rejected["rate_limited"] == 0
+
+
+class SlowHandshakeWebSocket(FakeWebSocket):
+    def __init__(self, host: str, fail: bool = False) -> None:
+        super().__init__(host=host)
+        self.fail = fail
+
+    async def accept(self, subprotocol: str | None = None) -> None:
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("handshake failed")
+        await super().accept(subprotocol)
+
+
+def test_admission_caps_hold_for_concurrent_handshakes():
+    expected_admitted = 2
+    clients = 10
+
+    async def run() -> None:
+        manager = WebSocketManager(
+            StateStore(),
+            admission=AdmissionControl(max_connections=expected_admitted, max_connections_per_ip=1),
+        )
+        spread = [SlowHandshakeWebSocket(f"10.0.1.{index}") for index in range(clients)]
+        admitted = await asyncio.gather(*(manager.connect(ws) for ws in spread))  # type: ignore[arg-type]
+        assert sum(admitted) == expected_admitted
+        rejected = manager.stats()["admission"]["rejected"]
+        assert rejected["server_full"] == clients - expected_admitted
+
+        same = [SlowHandshakeWebSocket("10.0.2.1") for _ in range(clients)]
+        for websocket in spread:
+            await manager.disconnect(websocket)  # type: ignore[arg-type]
+        admitted = await asyncio.gather(*(manager.connect(ws) for ws in same))  # type: ignore[arg-type]
+        assert sum(admitted) == 1
+        for websocket in same:
+            await manager.disconnect(websocket)  # type: ignore[arg-type]
+
+        failing = SlowHandshakeWebSocket("10.0.3.1", fail=True)
+        with pytest.raises(RuntimeError):
+            await manager.connect(failing)  # type: ignore[arg-type]
+        assert manager.admission.open == 0
+        assert manager.admission.per_ip == {}
+
+    asyncio.run(run())
+
+
+def test_client_host_trusts_tunnel_header_only_from_loopback():
+    tunnelled = FakeWebSocket(host="127.0.0.1")
+    tunnelled.headers["cf-connecting-ip"] = "203.0.113.7"
+    direct = FakeWebSocket(host="192.0.2.1")
+    direct.headers["cf-connecting-ip"] = "203.0.113.7"
+
+    assert client_host(tunnelled) == "203.0.113.7"  # type: ignore[arg-type]
+    assert client_host(direct) == "192.0.2.1"  # type: ignore[arg-type]
+
+
+def test_state_patch_base_version_skips_noop_commits():
+    expected_last_offset = 3  # change, no-op, change
+
+    async def run() -> None:
+        state_store = StateStore()
+        manager = WebSocketManager(state_store)
+        streamer = asyncio.create_task(_stream_state_patches(state_store, manager))
+        await state_store.patch_section("audio", {"volume_percent": 1})
+        await asyncio.sleep(0.01)
+        assert not manager.wants_state_patches()
+
+        websocket = FakeWebSocket()
+        await manager.connect(websocket)  # type: ignore[arg-type]
+        await manager.send_preamble(websocket, state_patches=True)  # type: ignore[arg-type]
+        snapshot_version = state_store.version
+        await state_store.patch_section("audio", {"volume_percent": 2})
+        await state_store.patch_section("audio", {"volume_percent": 2})
+        await state_store.patch_section("audio", {"volume_percent": 3})
+        await asyncio.sleep(0.01)
+        streamer.cancel()
+
+        patches = [
+            message["data"]
+            for message in map(json.loads, websocket.frames)
+            if message["type"] == "STATE_PATCH"
+        ]
+        assert [(patch["base_version"], patch["version"]) for patch in patches] == [
+            (snapshot_version, snapshot_version + 1),
+            (snapshot_version + 1, snapshot_version + expected_last_offset),
+        ]
+        await manager.disconnect(websocket)  # type: ignore[arg-type]
+
+    asyncio.run(run())
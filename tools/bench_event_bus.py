@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Measure EventBus publish and fan-out cost for 1, 10 and 100 subscribers."""
+
+import argparse
+import asyncio
+import time
+
+from ndefender_backend_aggregator.bus import EventBus
+from ndefender_backend_aggregator.models import EventEnvelope
+
+
+class QueueFanoutBus:
+    """The previous design: one asyncio.Queue per subscriber, filled under a lock."""
+
+    def __init__(self, max_queue_size: int) -> None:
+        self._max_queue_size = max_queue_size
+        self._subscribers: set[asyncio.Queue[EventEnvelope]] = set()
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self) -> asyncio.Queue[EventEnvelope]:
+        queue: asyncio.Queue[EventEnvelope] = asyncio.Queue(maxsize=self._max_queue_size)
+        async with self._lock:
+            self._subscribers.add(queue)
+        return queue
+
+    async def publish(self, event: EventEnvelope) -> None:
+        async with self._lock:
+            subscribers = list(self._subscribers)
+        for queue in subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                queue.get_nowait()
+                queue.put_nowait(event)
+
+
+async def _measure(
+    bus_cls: type,
+    subscribers: int,
+    events: int,
+    filtered: bool = False,
+) -> tuple[float, float]:
+    """Publish ``events`` envelopes; with ``filtered`` subscribers want 1 in 10."""
+    bus = bus_cls(max_queue_size=events)
+    if filtered:
+        readers = [await bus.subscribe(types="RF_CONTACT_NEW") for _ in range(subscribers)]
+    else:
+        readers = [await bus.subscribe() for _ in range(subscribers)]
+    telemetry = EventEnvelope(type="ESP32_TELEMETRY", timestamp_ms=0, source="esp32", data={})
+    contact = EventEnvelope(type="RF_CONTACT_NEW", timestamp_ms=0, source="antsdr", data={})
+    stream = [contact if index % 10 == 0 else telemetry for index in range(events)]
+    expected = sum(1 for event in stream if event is contact) if filtered else events
+
+    async def drain(reader) -> None:
+        for _ in range(expected):
+            await reader.get()
+
+    tasks = [asyncio.create_task(drain(reader)) for reader in readers]
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    for event in stream:
+        await bus.publish(event)
+    publish_us = (time.perf_counter() - start) / events * 1e6
+    await asyncio.gather(*tasks)
+    total_us = (time.perf_counter() - start) / events * 1e6
+    return publish_us, total_us
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+    for subscribers in args.subscribers:
+        for label, bus_cls, filtered in (
+            ("queues", QueueFanoutBus, False),
+            ("ring", EventBus, False),
+            ("ring/1:10", EventBus, True),
+        ):
+            publish_us, total_us = asyncio.run(
+                _measure(bus_cls, subscribers, args.events, filtered)
+            )
+            print(
+                f"{label:9s} subscribers={subscribers:4d} "
+                f"publish={publish_us:7.2f}us publish+deliver={total_us:8.2f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Measure StateStore.snapshot() cost with and without pydantic validation."""
+
+import argparse
+import asyncio
+import time
+
+from ndefender_backend_aggregator.state import StateStore
+
+
+async def _populate(store: StateStore, contacts: int) -> None:
+    async with store.transaction() as txn:
+        txn.update_section(
+            "system",
+            {"cpu_temp_c": 51.2, "cpu_usage_percent": 12.5, "ram_used_mb": 812, "status": "ok"},
+        )
+        txn.update_section("power", {"pack_voltage_v": 16.1, "current_a": 1.2, "soc_percent": 84})
+        txn.update_section(
+            "vrx",
+            {
+                "selected": 1,
+                "vrx": [
+                    {"id": i, "freq_hz": 5740000000 + i, "rssi_raw": 200 + i} for i in range(3)
+                ],
+                "led": {"r": 0, "y": 1, "g": 0},
+                "sys": {"status": "CONNECTED", "uptime_ms": 1000},
+            },
+        )
+        txn.update_section(
+            "contacts",
+            [
+                {
+                    "id": f"rf:{i}",
+                    "type": "RF",
+                    "source": "antsdr",
+                    "last_seen_ts": 1700000000000 + i,
+                    "severity": "medium",
+                    "freq_hz": 5658000000 + i,
+                    "confidence": 0.6,
+                }
+                for i in range(contacts)
+            ],
+        )
+
+
+async def _measure(strict: bool, iterations: int, contacts: int) -> tuple[float, float]:
+    store = StateStore(strict_validation=strict)
+    await _populate(store, contacts)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await store.snapshot()
+    snapshot_us = (time.perf_counter() - start) / iterations * 1e6
+    start = time.perf_counter()
+    for _ in range(iterations):
+        (await store.snapshot()).model_dump_json()
+    route_us = (time.perf_counter() - start) / iterations * 1e6
+    return snapshot_us, route_us
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--contacts", type=int, default=20)
+    args = parser.parse_args()
+    results = {}
+    for strict in (True, False):
+        results[strict] = asyncio.run(_measure(strict, args.iterations, args.contacts))
+        label = "validated" if strict else "constructed"
+        snapshot_us, route_us = results[strict]
+        print(f"{label:12s} snapshot={snapshot_us:8.1f}us snapshot+json={route_us:8.1f}us")
+    saving = 1 - results[False][1] / results[True][1]
+    print(f"per-request saving: {saving:.0%}")
+
+
+if __name__ == "__main__":
+    main()
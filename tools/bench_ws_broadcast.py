@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Measure per-event broadcast CPU as WebSocket clients are added.
+
+Compares the previous path (``send_json(event.model_dump())`` per client,
+which re-serializes for every connection) with ``WebSocketManager.broadcast``
+(serialize once, send the same text to every client). Clients are in-process
+stand-ins, so the numbers isolate serialization and fan-out cost.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any
+
+from ndefender_backend_aggregator.models import EventEnvelope
+from ndefender_backend_aggregator.state import StateStore
+from ndefender_backend_aggregator.ws import WebSocketManager
+
+PREAMBLE_FRAMES = 2  # HELLO + SYSTEM_UPDATE
+
+
+class NullWebSocket:
+    """Accepts frames and discards them; send_json mirrors Starlette's encoding."""
+
+    def __init__(self) -> None:
+        self.client = None
+        self.headers: dict[str, str] = {}
+        self.frames = 0
+        self.target = 0
+        self.reached = asyncio.Event()
+
+    async def accept(self, subprotocol: str | None = None) -> None:
+        return None
+
+    async def send_text(self, data: str) -> None:
+        self.frames += 1
+        if self.frames >= self.target:
+            self.reached.set()
+
+    async def send_json(self, data: Any) -> None:
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+
+def _event(index: int) -> EventEnvelope:
+    return EventEnvelope(
+        type="ESP32_TELEMETRY",
+        timestamp_ms=1700000000000 + index,
+        source="esp32",
+        data={
+            "vrx": [{"id": i, "freq_hz": 5740000000 + i, "rssi_raw": 200 + i} for i in range(3)],
+            "led": {"r": 0, "y": 1, "g": 0},
+            "sys": {"status": "CONNECTED", "uptime_ms": 1000 + index},
+        },
+        seq=index + 1,
+    )
+
+
+async def _drained(sockets: list[NullWebSocket], frames: int) -> None:
+    """Wait until every socket has received ``frames`` frames in total."""
+    for websocket in sockets:
+        websocket.target = frames
+        if websocket.frames < frames:
+            websocket.reached.clear()
+    await asyncio.gather(*(websocket.reached.wait() for websocket in sockets))
+
+
+async def _measure(clients: int, events: int, legacy: bool) -> float:
+    manager = WebSocketManager(StateStore(), send_queue_size=events)
+    sockets = [NullWebSocket() for _ in range(clients)]
+    for websocket in sockets:
+        await manager.connect(websocket)  # type: ignore[arg-type]
+        await manager.send_preamble(websocket)  # type: ignore[arg-type]
+    await _drained(sockets, PREAMBLE_FRAMES)
+    batch = [_event(index) for index in range(events)]
+    start = time.process_time()
+    for event in batch:
+        if legacy:
+            message = event.model_dump()
+            for websocket in sockets:
+                await websocket.send_json(message)
+        else:
+            await manager.broadcast(event)
+    # Include the per-connection writer tasks draining their queues.
+    await _drained(sockets, PREAMBLE_FRAMES + events)
+    elapsed = time.process_time() - start
+    for websocket in sockets:
+        await manager.disconnect(websocket)  # type: ignore[arg-type]
+    return elapsed / events * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 5, 20, 50])
+    args = parser.parse_args()
+    for clients in args.clients:
+        legacy_us = asyncio.run(_measure(clients, args.events, legacy=True))
+        shared_us = asyncio.run(_measure(clients, args.events, legacy=False))
+        print(
+            f"clients={clients:3d} per-client-json={legacy_us:8.1f}us "
+            f"encode-once={shared_us:8.1f}us per event"
+        )
+
+
+if __name__ == "__main__":
+    main()
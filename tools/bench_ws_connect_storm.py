@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Measure the CPU cost of many WebSocket clients connecting at once.
+
+Compares building and encoding a snapshot per connect (the previous
+preamble) with ``WebSocketManager.send_preamble``, where concurrent connects
+share one pre-encoded SYSTEM_UPDATE per state version. The state is seeded
+with contacts so the snapshot is representative of a busy field unit.
+"""
+
+import argparse
+import asyncio
+import time
+
+from ndefender_backend_aggregator.state import StateStore
+from ndefender_backend_aggregator.ws import WebSocketManager
+
+PREAMBLE_FRAMES = 2  # HELLO + SYSTEM_UPDATE
+
+
+class NullWebSocket:
+    def __init__(self) -> None:
+        self.client = None
+        self.headers: dict[str, str] = {}
+        self.frames = 0
+        self.reached = asyncio.Event()
+
+    async def accept(self, subprotocol: str | None = None) -> None:
+        return None
+
+    async def send_text(self, data: str) -> None:
+        self.frames += 1
+        if self.frames >= PREAMBLE_FRAMES:
+            self.reached.set()
+
+    async def close(self, code: int = 1000) -> None:
+        return None
+
+
+async def _seeded_store(contacts: int) -> StateStore:
+    state_store = StateStore()
+    await state_store.update_section(
+        "contacts",
+        [
+            {
+                "id": f"contact-{index}",
+                "type": "REMOTE_ID" if index % 2 else "RF",
+                "source": "remoteid" if index % 2 else "antsdr",
+                "last_seen_ts": 1700000000000 + index,
+                "severity": "medium",
+                "lat": 37.77 + index / 1e4,
+                "lon": -122.41 - index / 1e4,
+                "rssi_dbm": -60 - index % 30,
+            }
+            for index in range(contacts)
+        ],
+    )
+    return state_store
+
+
+async def _legacy_preamble(state_store: StateStore, websocket: NullWebSocket) -> None:
+    version, snapshot = await state_store.versioned_snapshot()
+    await websocket.send_text(f'{{"type":"HELLO","data":{{"state_version":{version}}}}}')
+    await websocket.send_text(snapshot.model_dump_json())
+
+
+async def _measure(clients: int, contacts: int, cached: bool) -> tuple[float, int]:
+    state_store = await _seeded_store(contacts)
+    manager = WebSocketManager(state_store)
+    sockets = [NullWebSocket() for _ in range(clients)]
+    start = time.process_time()
+    if cached:
+
+        async def connect(websocket: NullWebSocket) -> None:
+            await manager.connect(websocket)  # type: ignore[arg-type]
+            await manager.send_preamble(websocket)  # type: ignore[arg-type]
+
+        await asyncio.gather(*(connect(websocket) for websocket in sockets))
+        await asyncio.gather(*(websocket.reached.wait() for websocket in sockets))
+    else:
+        await asyncio.gather(*(_legacy_preamble(state_store, websocket) for websocket in sockets))
+    elapsed = time.process_time() - start
+    builds = manager.snapshot_builds if cached else clients
+    for websocket in sockets:
+        await manager.disconnect(websocket)  # type: ignore[arg-type]
+    return elapsed * 1000, builds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 100, 300])
+    parser.add_argument("--contacts", type=int, default=200)
+    args = parser.parse_args()
+    for clients in args.clients:
+        legacy_ms, legacy_builds = asyncio.run(_measure(clients, args.contacts, cached=False))
+        cached_ms, cached_builds = asyncio.run(_measure(clients, args.contacts, cached=True))
+        print(
+            f"clients={clients:4d} per-connect={legacy_ms:8.1f}ms ({legacy_builds} builds) "
+            f"shared={cached_ms:8.1f}ms ({cached_builds} builds)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Compare WebSocket frame size and encode cost per negotiated encoding.
+
+For a typical ``ESP32_TELEMETRY`` and ``CONTACT_NEW`` envelope, reports the
+payload bytes for each available encoding, the size after raw DEFLATE (what
+permessage-deflate puts on the wire without context takeover), and the mean
+encode time. Binary encodings need ``pip install .[binary]``; unavailable
+ones are listed as skipped.
+"""
+
+import argparse
+import time
+import zlib
+
+from ndefender_backend_aggregator import ws_codecs
+from ndefender_backend_aggregator.models import EventEnvelope
+
+
+def _telemetry() -> EventEnvelope:
+    return EventEnvelope(
+        type="ESP32_TELEMETRY",
+        timestamp_ms=1700000000000,
+        source="esp32",
+        data={
+            "timestamp_ms": 1700000000000,
+            "connected": True,
+            "vrx": [
+                {"id": i, "freq_hz": 5740000000 + i * 20000000, "rssi_raw": 200 + i}
+                for i in range(3)
+            ],
+            "led": {"r": 0, "y": 1, "g": 0},
+            "sys": {"status": "CONNECTED", "uptime_ms": 123456, "heap": 187000},
+            "video": {"selected": 1},
+        },
+        seq=1,
+    )
+
+
+def _contact() -> EventEnvelope:
+    return EventEnvelope(
+        type="CONTACT_NEW",
+        timestamp_ms=1700000000000,
+        source="remoteid",
+        data={
+            "id": "1581F5FJD228400D0000",
+            "model": "DJI Mini 3",
+            "lat": 37.774929,
+            "lon": -122.419416,
+            "alt_m": 87.5,
+            "speed_mps": 6.2,
+            "heading_deg": 271.0,
+            "operator_lat": 37.7741,
+            "operator_lon": -122.4188,
+            "confidence": 0.92,
+            "last_seen_ts": 1700000000000,
+        },
+        seq=2,
+    )
+
+
+def _measure(envelope: EventEnvelope, encoding: str, iterations: int) -> tuple[int, int, float]:
+    payload = envelope.encoded_frame(encoding)
+    raw = payload if isinstance(payload, bytes) else payload.encode("utf-8")
+    deflate = zlib.compressobj(wbits=-15)
+    compressed = deflate.compress(raw) + deflate.flush(zlib.Z_SYNC_FLUSH)
+    # Reset the per-envelope cache so every iteration pays the full encode.
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fresh = envelope.model_copy()
+        fresh.encoded_frame(encoding)
+    elapsed_us = (time.perf_counter() - started) / iterations * 1_000_000
+    return len(raw), len(compressed), elapsed_us
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    skipped = [name for name in ws_codecs.ENCODINGS if not ws_codecs.is_available(name)]
+    print(f"{'event':<16} {'encoding':<9} {'bytes':>6} {'deflated':>9} {'encode_us':>10}")
+    for envelope in (_telemetry(), _contact()):
+        for encoding in ws_codecs.available_encodings():
+            size, deflated, encode_us = _measure(envelope, encoding, args.iterations)
+            print(f"{envelope.type:<16} {encoding:<9} {size:>6} {deflated:>9} {encode_us:>10.2f}")
+    if skipped:
+        print(f"skipped (not installed): {', '.join(skipped)}")
+
+
+if __name__ == "__main__":
+    main()
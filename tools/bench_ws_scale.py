@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""WebSocket scale and latency benchmark.
+
+Starts the app in-process (uvicorn on a background thread, publishing
+synthetic ``BENCH_EVENT`` envelopes onto its EventBus) or targets a running
+server with ``--url``. For each client count it opens that many concurrent
+``/api/v1/ws`` clients, a share of them deliberately slow, and reports:
+
+- delivery latency percentiles (publish to client receive, fast clients),
+- delivered throughput and per-client received/missing counts (missing is
+  published but not received by the end of the drain period), plus the
+  server's own per-client ``dropped``/``conflated`` from ``/api/v1/ws/clients``
+  (local only, so ``--url`` must point at this host),
+- server CPU and RSS (the server thread in-process; ``--server-pid`` with
+  ``--url`` on the same host).
+
+Results are written as JSON to ``reports/ws_bench_<timestamp>.json``.
+Against ``--url`` only events already flowing through the server are seen;
+latency uses ``timestamp_ms`` and assumes the clocks agree.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import resource
+import statistics
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+import uvicorn
+from websockets.asyncio.client import connect
+
+from ndefender_backend_aggregator.models import EventEnvelope
+from ndefender_backend_aggregator.ws import AdmissionControl
+
+REPORTS_DIR = Path(__file__).resolve().parent.parent / "reports"
+BENCH_TYPE = "BENCH_EVENT"
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+class InProcessServer:
+    """The real app served by uvicorn on its own thread and event loop."""
+
+    def __init__(self) -> None:
+        from ndefender_backend_aggregator.main import create_app  # noqa: PLC0415
+
+        self.app = create_app()
+        # Hundreds of clients from one loopback address: lift admission limits.
+        self.app.state.ws_manager.admission = AdmissionControl()
+        self._server = uvicorn.Server(
+            uvicorn.Config(self.app, host="127.0.0.1", port=0, log_level="warning")
+        )
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.native_id: int | None = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        self.native_id = threading.get_native_id()
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self._server.serve())
+
+    def start(self) -> str:
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.05)
+        port = self._server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+    async def publish(self, rate_hz: float, seconds: float) -> int:
+        """Publish synthetic events on the server loop; returns how many."""
+        assert self.loop is not None
+        future = asyncio.run_coroutine_threadsafe(self._publish(rate_hz, seconds), self.loop)
+        return await asyncio.wrap_future(future)
+
+    async def _publish(self, rate_hz: float, seconds: float) -> int:
+        bus = self.app.state.event_bus
+        interval = 1 / rate_hz
+        started = time.monotonic()
+        count = 0
+        while time.monotonic() - started < seconds:
+            bus.publish_nowait(
+                EventEnvelope(
+                    type=BENCH_TYPE,
+                    timestamp_ms=int(time.time() * 1000),
+                    source="bench",
+                    data={"n": count, "sent_ns": time.time_ns()},
+                )
+            )
+            count += 1
+            next_at = started + count * interval
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+        return count
+
+    def cpu_seconds(self) -> float | None:
+        if self.native_id is None:
+            return None
+        return _cpu_seconds(Path(f"/proc/self/task/{self.native_id}/stat"))
+
+
+def _cpu_seconds(stat_path: Path) -> float | None:
+    try:
+        fields = stat_path.read_text().rpartition(")")[2].split()
+    except OSError:
+        return None
+    # utime and stime are fields 14 and 15; fields[0] here is field 3.
+    return (int(fields[11]) + int(fields[12])) / CLK_TCK
+
+
+def _rss_mb(pid: int | str) -> float | None:
+    try:
+        pages = int(Path(f"/proc/{pid}/statm").read_text().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(pages * PAGE_KB / 1024, 1)
+
+
+class BenchClient:
+    def __init__(self, index: int, slow_delay_s: float, count_all: bool) -> None:
+        self.index = index
+        self.slow_delay_s = slow_delay_s
+        # Against a live server every bus event counts; in-process only ours.
+        self.count_all = count_all
+        self.received = 0
+        self.latencies_ms: list[float] = []
+        self.counting = False
+        self.error: str | None = None
+
+    async def run(self, url: str, origin: str, ready: asyncio.Event, stop: asyncio.Event) -> None:
+        try:
+            async with connect(url, origin=origin, max_queue=16, compression=None) as websocket:
+                ready.set()
+                while not stop.is_set():
+                    try:
+                        raw = await asyncio.wait_for(websocket.recv(), timeout=0.5)
+                    except TimeoutError:
+                        continue
+                    self._record(raw)
+                    if self.slow_delay_s:
+                        await asyncio.sleep(self.slow_delay_s)
+        except Exception as exc:
+            self.error = str(exc)
+            ready.set()
+
+    def _record(self, raw: str | bytes) -> None:
+        now_ns = time.time_ns()
+        if not self.counting:
+            return
+        message = json.loads(raw)
+        if message.get("type") == BENCH_TYPE:
+            self.received += 1
+            sent_ns = message["data"]["sent_ns"]
+            self.latencies_ms.append((now_ns - sent_ns) / 1e6)
+        elif self.count_all and message.get("seq") is not None:
+            self.received += 1
+            self.latencies_ms.append(now_ns / 1e6 - message.get("timestamp_ms", now_ns / 1e6))
+
+
+def _percentile(values: list[float], fraction: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+    return round(ordered[index], 3)
+
+
+async def _server_clients(base_url: str) -> list[dict[str, Any]]:
+    async with httpx.AsyncClient(base_url=base_url, timeout=5) as http:
+        try:
+            response = await http.get("/api/v1/ws/clients")
+            return response.json().get("clients", [])
+        except (httpx.HTTPError, ValueError):
+            return []
+
+
+async def _run_step(
+    args: argparse.Namespace,
+    base_url: str,
+    ws_url: str,
+    clients: int,
+    server: InProcessServer | None,
+) -> dict[str, Any]:
+    slow = int(clients * args.slow_fraction)
+    bench_clients = [
+        BenchClient(index, args.slow_delay_ms / 1000 if index < slow else 0.0, server is None)
+        for index in range(clients)
+    ]
+    stop = asyncio.Event()
+    readies = [asyncio.Event() for _ in bench_clients]
+    tasks = []
+    connect_started = time.monotonic()
+    for client, ready in zip(bench_clients, readies, strict=True):
+        tasks.append(asyncio.create_task(client.run(ws_url, args.origin, ready, stop)))
+        if len(tasks) % args.connect_batch == 0:
+            await asyncio.sleep(0)
+    await asyncio.gather(*(ready.wait() for ready in readies))
+    connect_s = time.monotonic() - connect_started
+    await asyncio.sleep(args.warmup)
+
+    for client in bench_clients:
+        client.counting = True
+    server_pid = args.server_pid or (os.getpid() if server else None)
+    cpu_before = server.cpu_seconds() if server else _proc_cpu(args.server_pid)
+    started = time.monotonic()
+    if server is not None:
+        published = await server.publish(args.rate, args.seconds)
+    else:
+        await asyncio.sleep(args.seconds)
+        published = None
+    await asyncio.sleep(args.drain)
+    elapsed = time.monotonic() - started
+    cpu_after = server.cpu_seconds() if server else _proc_cpu(args.server_pid)
+    server_stats = await _server_clients(base_url)
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    fast = [client for client in bench_clients if not client.slow_delay_s]
+    latencies = [value for client in fast for value in client.latencies_ms]
+    delivered = sum(client.received for client in bench_clients)
+    cpu_percent = None
+    if cpu_before is not None and cpu_after is not None:
+        cpu_percent = round((cpu_after - cpu_before) / elapsed * 100, 1)
+    return {
+        "clients": clients,
+        "slow_clients": slow,
+        "connect_s": round(connect_s, 3),
+        "published": published,
+        "delivered": delivered,
+        "throughput_msgs_per_s": round(delivered / elapsed, 1),
+        "latency_ms": {
+            "p50": _percentile(latencies, 0.50),
+            "p90": _percentile(latencies, 0.90),
+            "p99": _percentile(latencies, 0.99),
+            "max": round(max(latencies), 3) if latencies else None,
+            "mean": round(statistics.fmean(latencies), 3) if latencies else None,
+        },
+        "server_cpu_percent": cpu_percent,
+        "server_rss_mb": _rss_mb(server_pid) if server_pid else None,
+        "errors": sum(1 for client in bench_clients if client.error),
+        "per_client": [
+            {
+                "client": client.index,
+                "slow": bool(client.slow_delay_s),
+                "received": client.received,
+                "missing": (published - client.received) if published is not None else None,
+            }
+            for client in bench_clients
+        ],
+        "server_clients": server_stats,
+    }
+
+
+def _proc_cpu(pid: int | None) -> float | None:
+    return _cpu_seconds(Path(f"/proc/{pid}/stat")) if pid else None
+
+
+def _ws_url(base_url: str) -> str:
+    parts = urlsplit(base_url)
+    scheme = "wss" if parts.scheme in {"https", "wss"} else "ws"
+    return f"{scheme}://{parts.netloc}/api/v1/ws"
+
+
+async def _main(args: argparse.Namespace) -> dict[str, Any]:
+    server = None if args.url else InProcessServer()
+    base_url = args.url.rstrip("/") if args.url else server.start()  # type: ignore[union-attr]
+    base_url = base_url.replace("ws://", "http://").replace("wss://", "https://")
+    base_url = base_url.removesuffix("/api/v1/ws")
+    steps = []
+    try:
+        for clients in args.clients:
+            step = await _run_step(args, base_url, _ws_url(base_url), clients, server)
+            latency = step["latency_ms"]
+            print(
+                f"clients={clients:4d} slow={step['slow_clients']:3d} "
+                f"delivered={step['delivered']:7d} "
+                f"p50={latency['p50']}ms p99={latency['p99']}ms "
+                f"cpu={step['server_cpu_percent']}% rss={step['server_rss_mb']}MB "
+                f"errors={step['errors']}"
+            )
+            steps.append(step)
+    finally:
+        if server is not None:
+            server.stop()
+    return {
+        "generated_at_ms": int(time.time() * 1000),
+        "target": args.url or "in-process",
+        "rate_hz": args.rate if server else None,
+        "seconds": args.seconds,
+        "slow_fraction": args.slow_fraction,
+        "slow_delay_ms": args.slow_delay_ms,
+        "steps": steps,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="Server base URL; omit to start the app in-process")
+    parser.add_argument("--origin", default="https://www.figma.com")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--rate", type=float, default=50.0, help="Synthetic events per second")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--warmup", type=float, default=0.5)
+    parser.add_argument("--drain", type=float, default=1.0)
+    parser.add_argument("--slow-fraction", type=float, default=0.1)
+    parser.add_argument("--slow-delay-ms", type=float, default=200.0)
+    parser.add_argument("--connect-batch", type=int, default=50)
+    parser.add_argument("--server-pid", type=int, help="Sample CPU/RSS of a local --url server")
+    parser.add_argument("--output", type=Path, help="Report path (default: reports/)")
+    args = parser.parse_args()
+
+    # Each in-process client needs two descriptors (client and server side).
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    with contextlib.suppress(ValueError, OSError):
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    report = asyncio.run(_main(args))
+    output = args.output or REPORTS_DIR / time.strftime("ws_bench_%Y%m%d_%H%M%S.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"report: {output}")
+
+
+if __name__ == "__main__":
+    main()